@@ -31,13 +31,18 @@ def _glymurrc_fname():
 
 
 def _config():
-    """Read configuration file.
+    """Read configuration file and load the OpenJPEG library.
 
-    Based on matplotlib.
+    Based on matplotlib.  Only called when the library is first used, see
+    glymur.lib.openjp2.
     """
     filename = _glymurrc_fname()
     if filename is not None:
         # Read the configuration file for the library location.
+        if sys.hexversion <= 0x03000000:
+            from ConfigParser import SafeConfigParser as ConfigParser
+        else:
+            from configparser import ConfigParser
         parser = ConfigParser()
         parser.read(filename)
         libopenjp2_path = parser.get('library', 'openjp2')
@@ -74,18 +79,14 @@ def _get_configdir():
 
 import warnings
 import sys
-if sys.hexversion <= 0x03000000:
-    from ConfigParser import SafeConfigParser as ConfigParser
-    from ConfigParser import NoOptionError
-else:
-    from configparser import ConfigParser
-    from configparser import NoOptionError
 import ctypes
 import os
 
-_OPENJP2 = _config()
-
-from .jp2k import Jp2k
+from .cache import set_tile_cache, get_tile_cache
+from .headercache import set_header_cache, get_header_cache
+from .tracing import set_tracer, get_tracer
+from . import metrics
+from .jp2k import Jp2k, encode, set_num_threads, get_num_threads
+from .batch import read_many, write_many
 from .jp2dump import jp2dump
-
-from . import test
+from .probe import probe
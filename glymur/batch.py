@@ -0,0 +1,415 @@
+"""Reading and writing many JPEG 2000 files with a pool of processes.
+
+Decoding and encoding are CPU bound, so converting a directory of images in
+a Python loop uses a single core.  The functions here spread the files over
+a pool of worker processes.  Image data travels between the processes
+through shared memory where available (Python 3.8 and later) instead of
+being pickled through the pool's pipes.
+
+License:  MIT
+"""
+import collections
+import os
+import pickle
+import threading
+
+import numpy as np
+
+from .jp2k import Jp2k
+
+
+class BatchResult(collections.namedtuple('BatchResult',
+                                         ['index', 'path', 'data', 'error'])):
+    """Outcome of processing one file in a batch.
+
+    Attributes
+    ----------
+    index : int
+        Position of the file in the input sequence.
+    path : str
+        Path to the file.
+    data : array or None
+        The decoded image for read_many, always None for write_many and for
+        files that failed.
+    error : Exception or None
+        The exception raised while processing the file, or None on success.
+    """
+    __slots__ = ()
+
+
+def _shared_memory():
+    """Return the multiprocessing.shared_memory module, or None if it is
+    unavailable, in which case image data is pickled instead.
+
+    Like multiprocessing itself, it is only imported once a batch runs, to
+    keep importing glymur cheap.
+    """
+    try:
+        from multiprocessing import shared_memory
+    except ImportError:
+        return None
+    return shared_memory
+
+
+def _start_resource_tracker():
+    """Start the resource tracker of this process before forking workers.
+
+    Otherwise each worker starts a tracker of its own upon creating or
+    attaching a shared memory block, which warns about, or even unlinks,
+    blocks that this process has already released or not yet picked up
+    when the worker exits.
+    """
+    try:
+        from multiprocessing import resource_tracker
+    except ImportError:
+        # No shared memory either.
+        return
+    resource_tracker.ensure_running()
+
+
+def _cpu_count():
+    """Default number of worker processes."""
+    import multiprocessing
+    return multiprocessing.cpu_count()
+
+
+def _share(data, name=None):
+    """Describe an array so that another process can pick it up.
+
+    Parameters
+    ----------
+    data : array
+        The array.
+    name : str, optional
+        Name of the shared memory block, chosen by the system by default.
+
+    Returns
+    -------
+    descriptor : tuple
+        Either ('shm', name, shape, dtype) naming a shared memory block
+        holding a copy of the array, or ('array', data) if shared memory is
+        unavailable or the array is empty.
+    """
+    shared_memory = _shared_memory()
+    if shared_memory is None or data.nbytes == 0:
+        return ('array', data)
+    shm = shared_memory.SharedMemory(name=name, create=True,
+                                     size=data.nbytes)
+    try:
+        view = np.ndarray(data.shape, dtype=data.dtype, buffer=shm.buf)
+        view[...] = data
+        del view
+    finally:
+        shm.close()
+    return ('shm', shm.name, data.shape, data.dtype.str)
+
+
+def _attach(descriptor):
+    """Open the shared memory block behind a descriptor.
+
+    Returns
+    -------
+    shm : SharedMemory or None
+        The shared memory block, to be closed by the caller, or None if the
+        array was sent directly.
+    data : array
+        The array.  If it is backed by shared memory, it must be released
+        before the block is closed.
+    """
+    if descriptor[0] == 'array':
+        return None, descriptor[1]
+    _, name, shape, dtype = descriptor
+    shm = _shared_memory().SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _unshare(descriptor):
+    """Copy an array out of shared memory and release the block.
+
+    Parameters
+    ----------
+    descriptor : tuple
+        As returned by _share.
+
+    Returns
+    -------
+    data : array
+        The array.
+    """
+    shm, data = _attach(descriptor)
+    if shm is None:
+        return data
+    try:
+        data = data.copy()
+    finally:
+        shm.close()
+        shm.unlink()
+    return data
+
+
+def _release(descriptor):
+    """Release the shared memory block behind a descriptor, if any."""
+    if descriptor[0] == 'shm':
+        shm = _shared_memory().SharedMemory(name=descriptor[1])
+        shm.close()
+        shm.unlink()
+
+
+def _discard(name):
+    """Release a shared memory block by name, if it exists."""
+    try:
+        shm = _shared_memory().SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    shm.close()
+    shm.unlink()
+
+
+def _portable_error(exc):
+    """Make sure an exception can be sent back from a worker process."""
+    try:
+        pickle.loads(pickle.dumps(exc))
+    except Exception:
+        msg = '{0}: {1}'.format(type(exc).__name__, exc)
+        exc = RuntimeError(msg)
+    return exc
+
+
+def _read_task(task):
+    """Decode one file in a worker process.
+
+    The image is returned in a shared memory block of the given name, or
+    directly if no name is given.
+    """
+    index, path, kwargs, name = task
+    try:
+        data = Jp2k(path).read(**kwargs)
+    except Exception as exc:
+        return index, path, None, _portable_error(exc)
+    if name is not None:
+        return index, path, _share(data, name), None
+    return index, path, ('array', data), None
+
+
+def _write_task(task):
+    """Encode one file in a worker process."""
+    index, path, descriptor, kwargs = task
+    try:
+        shm, data = _attach(descriptor)
+        try:
+            Jp2k(path, mode='wb').write(data, **kwargs)
+        finally:
+            del data
+            if shm is not None:
+                shm.close()
+    except Exception as exc:
+        return index, path, None, _portable_error(exc)
+    return index, path, None, None
+
+
+def _chunksize(items, workers, chunksize):
+    """Choose how many tasks are handed to a worker at a time.
+
+    Batching tasks amortizes the interprocess communication, while leaving
+    enough chunks for the load to balance across the workers.
+    """
+    if chunksize is not None:
+        return chunksize
+    try:
+        num_items = len(items)
+    except TypeError:
+        return 1
+    return max(1, num_items // (4 * workers))
+
+
+def _run(worker, tasks, workers, ordered, chunksize):
+    """Run tasks through a pool of processes, yielding the raw results.
+
+    With a single worker the tasks are run in this process.
+    """
+    if workers == 1:
+        for task in tasks:
+            yield worker(task)
+        return
+
+    import multiprocessing
+    _start_resource_tracker()
+    pool = multiprocessing.Pool(workers)
+    try:
+        if ordered:
+            results = pool.imap(worker, tasks, chunksize)
+        else:
+            results = pool.imap_unordered(worker, tasks, chunksize)
+        for result in results:
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def read_many(paths, reduce=0, layer=0, area=None, workers=None,
+              ordered=True, chunksize=None):
+    """Read many JPEG 2000 images in parallel worker processes.
+
+    Parameters
+    ----------
+    paths : iterable
+        Paths to the JPEG 2000 files.
+    reduce : int, optional
+        Factor by which to reduce output resolution.  Use -1 to get the
+        lowest resolution thumbnail.
+    layer : int, optional
+        Number of quality layer to decode.
+    area : tuple, optional
+        Specifies decoding image area,
+        (first_row, first_col, last_row, last_col)
+    workers : int, optional
+        Number of worker processes, defaults to the number of CPUs.  With a
+        single worker the files are read in this process.
+    ordered : bool, optional
+        If true, results are yielded in the order of the paths, otherwise
+        as soon as each file is done.
+    chunksize : int, optional
+        Number of files handed to a worker at a time.  By default the files
+        are split into about four chunks per worker.
+
+    Yields
+    ------
+    result : BatchResult
+        The decoded image of each file.  Errors are captured per file rather
+        than raised, so that one bad file does not abort the batch.
+
+    Examples
+    --------
+    >>> import glymur
+    >>> import pkg_resources as pkg
+    >>> jfile = pkg.resource_filename(glymur.__name__, "data/nemo.jp2")
+    >>> for result in glymur.read_many([jfile, jfile], reduce=3):
+    ...     print(result.index, result.data.shape)
+    0 (182, 324, 3)
+    1 (182, 324, 3)
+    """
+    if workers is None:
+        workers = _cpu_count()
+    kwargs = {'reduce': reduce, 'layer': layer, 'area': area}
+    chunksize = _chunksize(paths, workers, chunksize)
+
+    # The workers put each image in a shared memory block named after its
+    # index, so that blocks of results never picked up, because the caller
+    # stopped early, can still be found and released once the pool is
+    # shut down.
+    prefix = 'gly{0}_'.format(os.urandom(4).hex())
+    pending = set()
+
+    def tasks():
+        for index, path in enumerate(paths):
+            if workers == 1:
+                name = None
+            else:
+                pending.add(index)
+                name = prefix + str(index)
+            yield index, path, kwargs, name
+
+    results = _run(_read_task, tasks(), workers, ordered, chunksize)
+    try:
+        for index, path, descriptor, error in results:
+            data = None if descriptor is None else _unshare(descriptor)
+            pending.discard(index)
+            yield BatchResult(index, path, data, error)
+    finally:
+        results.close()
+        if _shared_memory() is not None:
+            for index in pending:
+                _discard(prefix + str(index))
+
+
+def write_many(items, workers=None, ordered=True, chunksize=None, **kwargs):
+    """Write many JPEG 2000 images in parallel worker processes.
+
+    Parameters
+    ----------
+    items : iterable
+        Either (path, data) or (path, data, params) tuples, where params is
+        a dictionary of encoding parameters for that file only.  The
+        extension of each path chooses between JP2 and J2K.
+    workers : int, optional
+        Number of worker processes, defaults to the number of CPUs.  With a
+        single worker the files are written in this process.
+    ordered : bool, optional
+        If true, results are yielded in the order of the items, otherwise as
+        soon as each file is done.
+    chunksize : int, optional
+        Number of files handed to a worker at a time, one by default.  Up to
+        two chunks per worker are staged in memory at any time.
+    kwargs : optional
+        Encoding parameters of Jp2k.write shared by all of the files.
+
+    Yields
+    ------
+    result : BatchResult
+        The outcome of each file.  Errors are captured per file rather than
+        raised, so that one bad file does not abort the batch.
+
+    Examples
+    --------
+    >>> import glymur
+    >>> import numpy as np
+    >>> import tempfile, os
+    >>> tdir = tempfile.mkdtemp()
+    >>> items = [(os.path.join(tdir, '{0}.jp2'.format(j)),
+    ...           np.zeros((64, 64), dtype=np.uint8)) for j in range(4)]
+    >>> errors = [r.error for r in glymur.write_many(items, cratios=[20])]
+    """
+    if workers is None:
+        workers = _cpu_count()
+    if chunksize is None:
+        # Each image is a large unit of work already, and a whole chunk has
+        # to be staged before it is handed out, so the default must not grow
+        # with the number of items.
+        chunksize = 1
+
+    # Image data staged for the workers, released once their file is done.
+    # The pool consumes the tasks from a thread of its own as fast as it
+    # can, so the number of staged images is bounded to keep the copies in
+    # shared memory from piling up ahead of the encoders.
+    staged = {}
+    lock = threading.Lock()
+    slots = threading.Semaphore(2 * workers * chunksize)
+    stopped = []
+
+    def tasks():
+        for index, item in enumerate(items):
+            slots.acquire()
+            if stopped:
+                return
+            path, data = item[0], np.asarray(item[1])
+            params = dict(kwargs)
+            if len(item) > 2:
+                params.update(item[2])
+            if workers == 1:
+                descriptor = ('array', data)
+            else:
+                descriptor = _share(data)
+            with lock:
+                staged[index] = descriptor
+            yield index, path, descriptor, params
+
+    results = _run(_write_task, tasks(), workers, ordered, chunksize)
+    try:
+        for index, path, _, error in results:
+            with lock:
+                descriptor = staged.pop(index)
+            _release(descriptor)
+            slots.release()
+            yield BatchResult(index, path, None, error)
+    finally:
+        # Let a task producer blocked on a slot finish before the pool
+        # shuts down.
+        stopped.append(True)
+        slots.release()
+        results.close()
+        with lock:
+            for descriptor in staged.values():
+                _release(descriptor)
+            staged.clear()
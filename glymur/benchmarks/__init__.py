@@ -0,0 +1,22 @@
+"""Performance benchmarks for importing, parsing, decoding and encoding.
+
+The benchmarks time importing glymur, opening files, parsing the
+codestream, reading whole images, reduced resolutions, areas and tiles,
+reading individual bands, and writing.  They run over synthetic images
+generated with Jp2k.write, varying tile size, number of resolutions, number
+of layers, bit depth and number of components (see
+glymur.benchmarks.corpus).  Generating the images and all
+decoding and encoding benchmarks need the OpenJPEG library.
+
+Run them with
+
+    python -m glymur.benchmarks [-k PATTERN] [--json FILE]
+
+which reports the best time, the throughput in MPix/s and the peak resident
+set size of each benchmark.  The benchmark classes also follow the
+conventions of airspeed velocity, so asv can run them by pointing its
+benchmark_dir at this package.
+
+License:  MIT
+"""
+from .runner import run, save
@@ -0,0 +1,28 @@
+"""Command line entry point, see glymur.benchmarks.
+
+License:  MIT
+"""
+import argparse
+
+from .runner import run, save
+
+
+def main():
+    description = 'Run the glymur performance benchmarks.'
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('-k', dest='pattern', default=None,
+                        help='Only run benchmarks matching this regular '
+                             'expression, e.g. "Parse|Read.time".')
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help='Report the best of this many runs.')
+    parser.add_argument('--json', dest='filename', default=None,
+                        help='Also save the results to this JSON file.')
+    args = parser.parse_args()
+
+    results = run(pattern=args.pattern, repeat=args.repeat)
+    if args.filename is not None:
+        save(results, args.filename)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Benchmarks for decoding.
+
+License:  MIT
+"""
+from ..jp2k import Jp2k
+from . import corpus
+
+
+def _read_full(jp2):
+    return jp2.read()
+
+
+def _read_reduce2(jp2):
+    return jp2.read(reduce=2)
+
+
+def _read_area(jp2):
+    # A window straddling several tiles.
+    return jp2.read(area=(300, 300, 1324, 1324))
+
+
+def _read_tile(jp2):
+    return jp2.read(tile=0)
+
+
+_READS = {'full': _read_full,
+          'reduce2': _read_reduce2,
+          'area': _read_area,
+          'tile': _read_tile}
+
+
+class Read:
+    """Decoding the whole image, a reduced resolution, an area or a tile."""
+    params = [sorted(corpus.CONFIGS), sorted(_READS)]
+    param_names = ['image', 'region']
+
+    def setup(self, image, region):
+        self.jp2 = Jp2k(corpus.build(image))
+
+    def pixels(self, image, region):
+        """Number of pixels decoded by each call."""
+        data = _READS[region](self.jp2)
+        return data.shape[0] * data.shape[1]
+
+    def time_read(self, image, region):
+        _READS[region](self.jp2)
+
+    def peakmem_read(self, image, region):
+        _READS[region](self.jp2)
+
+
+class ReadBands:
+    """Decoding the image as a list of components."""
+    params = [['baseline', 'uint16']]
+    param_names = ['image']
+
+    def setup(self, image):
+        self.jp2 = Jp2k(corpus.build(image))
+
+    def pixels(self, image):
+        shape = self.jp2.shape
+        return shape[0] * shape[1]
+
+    def time_read_bands(self, image):
+        self.jp2.read_bands()
@@ -0,0 +1,34 @@
+"""Benchmarks for encoding.
+
+License:  MIT
+"""
+import os
+import shutil
+import tempfile
+
+from ..jp2k import Jp2k
+from . import corpus
+
+
+class Write:
+    """Encoding the synthetic images with their encoding parameters."""
+    params = [sorted(corpus.CONFIGS)]
+    param_names = ['image']
+
+    def setup(self, image):
+        self.data = corpus.image_data(image)
+        self.kwargs = corpus.write_parameters(image)
+        self.tdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tdir, 'out.jp2')
+
+    def teardown(self, image):
+        shutil.rmtree(self.tdir)
+
+    def pixels(self, image):
+        return self.data.shape[0] * self.data.shape[1]
+
+    def time_write(self, image):
+        Jp2k(self.path, mode='wb').write(self.data, **self.kwargs)
+
+    def peakmem_write(self, image):
+        Jp2k(self.path, mode='wb').write(self.data, **self.kwargs)
@@ -0,0 +1,30 @@
+"""Benchmark for importing glymur.
+
+Command line tools and short-lived workers pay for the import on every
+start, so it should stay close to the cost of importing numpy, which glymur
+cannot do without.
+
+License:  MIT
+"""
+import os
+import subprocess
+import sys
+
+import glymur
+
+
+class Import:
+    """Importing a module in a fresh interpreter."""
+    params = [['numpy', 'glymur']]
+    param_names = ['module']
+
+    def setup(self, module):
+        # Make sure the interpreter picks up this copy of glymur.
+        root = os.path.dirname(os.path.dirname(glymur.__file__))
+        path = os.environ.get('PYTHONPATH')
+        self.env = dict(os.environ)
+        self.env['PYTHONPATH'] = root if not path else root + os.pathsep + path
+
+    def time_import(self, module):
+        subprocess.check_call([sys.executable, '-c', 'import ' + module],
+                              env=self.env)
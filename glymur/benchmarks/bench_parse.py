@@ -0,0 +1,31 @@
+"""Benchmarks for parsing file structure and codestream headers.
+
+License:  MIT
+"""
+from ..jp2k import Jp2k
+from ..probe import probe
+from . import corpus
+
+
+class Parse:
+    """Opening files and parsing their headers."""
+    params = [['nemo'] + sorted(corpus.CONFIGS)]
+    param_names = ['image']
+
+    def setup(self, image):
+        self.path = corpus.build(image)
+
+    def time_open(self, image):
+        Jp2k(self.path)
+
+    def time_main_header(self, image):
+        Jp2k(self.path).get_codestream(header_only=True)
+
+    def time_full_codestream(self, image):
+        Jp2k(self.path).get_codestream(header_only=False)
+
+    def time_compact_codestream(self, image):
+        Jp2k(self.path).get_codestream(header_only=False, compact=True)
+
+    def time_probe(self, image):
+        probe(self.path)
@@ -0,0 +1,165 @@
+"""Synthetic images for the benchmarks.
+
+Each image is described by a configuration varying one encoding parameter
+at a time from a common baseline, so that the effect of tile size, number
+of resolutions, number of layers, bit depth and number of components can be
+compared directly.  Images are written with Jp2k.write on first use and
+reused afterwards.
+
+License:  MIT
+"""
+import os
+import tempfile
+
+import numpy as np
+import pkg_resources
+
+from ..jp2k import Jp2k
+from ..lib import openjp2 as opj2
+
+# Rows and columns of the synthetic images.  Override with the
+# GLYMUR_BENCHMARK_SIZE environment variable.
+SIZE = int(os.environ.get('GLYMUR_BENCHMARK_SIZE', 2048))
+
+_BASELINE = {'components': 3,
+             'dtype': 'uint8',
+             'tilesize': (512, 512),
+             'numres': 6,
+             'cratios': None}
+
+# Name of each configuration mapped onto its departures from the baseline.
+_VARIATIONS = {'baseline': {},
+               'untiled': {'tilesize': None},
+               'tile256': {'tilesize': (256, 256)},
+               'tile1024': {'tilesize': (1024, 1024)},
+               'res3': {'numres': 3},
+               'layers4': {'cratios': [80, 40, 20, 1]},
+               'uint16': {'dtype': 'uint16'},
+               'gray': {'components': 1}}
+
+CONFIGS = dict((name, dict(_BASELINE, **variation))
+               for name, variation in _VARIATIONS.items())
+
+
+def directory():
+    """Directory holding the generated images.
+
+    Set the GLYMUR_BENCHMARK_DIR environment variable to keep the images
+    between runs, otherwise they go into the system temporary directory.
+    """
+    path = os.environ.get('GLYMUR_BENCHMARK_DIR')
+    if path is None:
+        path = os.path.join(tempfile.gettempdir(), 'glymur-benchmarks')
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    return path
+
+
+def make_image(shape, dtype, seed=0):
+    """Generate image data that compresses like natural imagery.
+
+    Smooth gradients carry most of the energy, with a little noise on top
+    so that the code blocks are not trivially empty.
+
+    Parameters
+    ----------
+    shape : tuple
+        Image dimensions, (rows, columns) or (rows, columns, components).
+    dtype : numpy datatype
+        Either uint8 or uint16.
+    seed : int, optional
+        Seed of the noise.
+
+    Returns
+    -------
+    data : array
+        The image.
+    """
+    dtype = np.dtype(dtype)
+    peak = np.iinfo(dtype).max
+    rows = np.linspace(0, 4 * np.pi, shape[0])[:, np.newaxis]
+    cols = np.linspace(0, 6 * np.pi, shape[1])[np.newaxis, :]
+    base = 0.5 + 0.25 * np.sin(rows) * np.cos(cols)
+
+    rng = np.random.RandomState(seed)
+    num_comps = shape[2] if len(shape) > 2 else 1
+    planes = []
+    for k in range(num_comps):
+        noise = rng.standard_normal(shape[0:2]) * 0.02
+        planes.append(np.roll(base, 64 * k, axis=1) + noise)
+    data = np.clip(np.dstack(planes), 0, 1) * peak
+    data = data.astype(dtype)
+    if len(shape) == 2:
+        data = data[:, :, 0]
+    return data
+
+
+def image_data(name):
+    """Generate the image data of a configuration.
+
+    Parameters
+    ----------
+    name : str
+        One of the keys of CONFIGS.
+    """
+    config = CONFIGS[name]
+    shape = (SIZE, SIZE)
+    if config['components'] > 1:
+        shape += (config['components'],)
+    return make_image(shape, config['dtype'])
+
+
+def write_parameters(name):
+    """Jp2k.write parameters of a configuration.
+
+    Parameters
+    ----------
+    name : str
+        One of the keys of CONFIGS.
+    """
+    config = CONFIGS[name]
+    kwargs = {'numres': config['numres']}
+    if config['tilesize'] is not None:
+        kwargs['tilesize'] = config['tilesize']
+    if config['cratios'] is not None:
+        kwargs['cratios'] = config['cratios']
+    return kwargs
+
+
+def build(name):
+    """Write the image of a configuration unless it already exists.
+
+    Parameters
+    ----------
+    name : str
+        One of the keys of CONFIGS, or 'nemo' for the image shipped with
+        glymur, which can be used without the OpenJPEG library.
+
+    Returns
+    -------
+    path : str
+        Path to the JP2 file.
+
+    Raises
+    ------
+    RuntimeError
+        If the image must be generated but the OpenJPEG library is missing.
+    """
+    if name == 'nemo':
+        return pkg_resources.resource_filename('glymur', 'data/nemo.jp2')
+
+    path = os.path.join(directory(), '{0}-{1}.jp2'.format(name, SIZE))
+    if os.path.exists(path):
+        return path
+
+    if opj2._library() is None:
+        msg = "Generating benchmark images needs the OpenJPEG library."
+        raise RuntimeError(msg)
+
+    # Write to a temporary name first so that an interrupted run does not
+    # leave a truncated image behind.
+    partial = path + '.partial.jp2'
+    jp2 = Jp2k(partial, mode='wb')
+    jp2.write(image_data(name), **write_parameters(name))
+    os.rename(partial, path)
+    return path
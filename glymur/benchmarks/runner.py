@@ -0,0 +1,202 @@
+"""Minimal runner for the benchmarks.
+
+The benchmark classes follow the conventions of airspeed velocity (asv),
+which can run them as they are.  This runner covers the common case of a
+quick comparison without asv, and adds throughput and peak memory.
+
+License:  MIT
+"""
+import collections
+import importlib
+import itertools
+import json
+import platform
+import re
+import sys
+import timeit
+import traceback
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows.
+    resource = None
+
+from ..lib import openjp2 as opj2
+from . import corpus
+
+MODULES = ['bench_import', 'bench_parse', 'bench_decode',
+           'bench_encode']
+
+Result = collections.namedtuple('Result', ['name', 'params', 'seconds',
+                                           'mpix_per_s', 'peak_rss',
+                                           'error'])
+
+
+def _reset_peak_rss():
+    """Reset the peak resident set size where the platform allows it."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except (IOError, OSError):
+        pass
+
+
+def _peak_rss():
+    """Peak resident set size of this process in bytes, or None."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (IOError, OSError):
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes everywhere but on macOS.
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def discover(pattern=None):
+    """Find the benchmarks.
+
+    Parameters
+    ----------
+    pattern : str, optional
+        Regular expression selecting benchmarks by their name, i.e.
+        'Class.method'.
+
+    Returns
+    -------
+    benchmarks : list
+        (name, class, method name) tuples.
+    """
+    benchmarks = []
+    for module_name in MODULES:
+        module = importlib.import_module('.' + module_name, __package__)
+        for cls_name in sorted(dir(module)):
+            cls = getattr(module, cls_name)
+            if not isinstance(cls, type) or not hasattr(cls, 'params'):
+                continue
+            for method in sorted(dir(cls)):
+                if not method.startswith(('time_', 'peakmem_')):
+                    continue
+                name = '{0}.{1}'.format(cls_name, method)
+                if pattern is None or re.search(pattern, name):
+                    benchmarks.append((name, cls, method))
+    return benchmarks
+
+
+def _measure(obj, method, params, repeat):
+    """Time a benchmark and record the peak memory of its first call.
+
+    Calls shorter than about a millisecond are repeated in a loop so that
+    the timer resolution does not dominate.
+    """
+    fcn = getattr(obj, method)
+    _reset_peak_rss()
+    start = timeit.default_timer()
+    fcn(*params)
+    first = timeit.default_timer() - start
+    peak_rss = _peak_rss()
+    if not method.startswith('time_'):
+        return None, None, peak_rss
+
+    number = max(1, min(10000, int(0.1 / max(first, 1e-6))))
+    timer = timeit.Timer(lambda: fcn(*params))
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+
+    mpix_per_s = None
+    if hasattr(obj, 'pixels'):
+        mpix_per_s = obj.pixels(*params) / best / 1e6
+    return best, mpix_per_s, peak_rss
+
+
+def run(pattern=None, repeat=3, stream=sys.stdout):
+    """Run the benchmarks and print a report.
+
+    Parameters
+    ----------
+    pattern : str, optional
+        Regular expression selecting benchmarks by their name, i.e.
+        'Class.method'.
+    repeat : int, optional
+        Each timing benchmark is run this many times and the best time is
+        reported.
+    stream : file, optional
+        Where the report is printed, or None for no report.
+
+    Returns
+    -------
+    results : list
+        A Result for each combination of benchmark and parameters.  Errors,
+        e.g. from missing the OpenJPEG library, are recorded rather than
+        raised.
+    """
+    results = []
+    for name, cls, method in discover(pattern):
+        for params in itertools.product(*cls.params):
+            obj = cls()
+            try:
+                obj.setup(*params)
+                try:
+                    seconds, mpix_per_s, peak_rss = _measure(obj, method,
+                                                             params, repeat)
+                finally:
+                    if hasattr(obj, 'teardown'):
+                        obj.teardown(*params)
+            except Exception:
+                error = traceback.format_exc().strip().split('\n')[-1]
+                result = Result(name, params, None, None, None, error)
+            else:
+                result = Result(name, params, seconds, mpix_per_s, peak_rss,
+                                None)
+            results.append(result)
+            if stream is not None:
+                stream.write(_format(result) + '\n')
+                stream.flush()
+    return results
+
+
+def _format(result):
+    """One line of the report."""
+    label = '{0}({1})'.format(result.name, ', '.join(result.params))
+    if result.error is not None:
+        return '{0:50s} failed: {1}'.format(label, result.error)
+    fields = [label]
+    if result.seconds is not None:
+        fields.append('{0:10.2f} ms'.format(result.seconds * 1e3))
+    if result.mpix_per_s is not None:
+        fields.append('{0:8.1f} MPix/s'.format(result.mpix_per_s))
+    if result.peak_rss is not None:
+        fields.append('{0:8.1f} MB peak RSS'.format(result.peak_rss / 2**20))
+    return '{0:50s} '.format(fields[0]) + '  '.join(fields[1:])
+
+
+def environment():
+    """Describe what the results were measured with."""
+    if opj2._library() is None:
+        opj_version = None
+    else:
+        opj_version = opj2._version()
+    return {'python': platform.python_version(),
+            'platform': platform.platform(),
+            'openjpeg': opj_version,
+            'image_size': corpus.SIZE}
+
+
+def save(results, filename):
+    """Save results as JSON, e.g. to compare library versions.
+
+    Parameters
+    ----------
+    results : list
+        As returned by run.
+    filename : str
+        Output file.
+    """
+    document = {'environment': environment(),
+                'results': [result._asdict() for result in results]}
+    with open(filename, 'w') as f:
+        json.dump(document, f, indent=2)
@@ -0,0 +1,140 @@
+"""Cache of decoded tiles.
+
+The cache is opt-in.  Once enabled with set_tile_cache, Jp2k.read assembles
+its result from previously decoded tiles where possible and only decodes the
+tiles that are missing.
+
+License:  MIT
+"""
+import collections
+import threading
+
+
+class TileCache:
+    """Least-recently-used cache of decoded tiles with a memory budget.
+
+    Attributes
+    ----------
+    max_bytes : int
+        Memory budget.  The least recently used tiles are evicted once the
+        cached tiles exceed this size.
+    nbytes : int
+        Total size of the cached tiles.
+    hits, misses, evictions : int
+        Counters for lookups that were found, lookups that were not found,
+        and tiles that were dropped to stay within the budget.
+    """
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._tiles = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._tiles)
+
+    def __str__(self):
+        msg = 'Tile cache:  {0} tiles, {1} of {2} bytes, '
+        msg += '{3} hits, {4} misses, {5} evictions'
+        return msg.format(len(self), self.nbytes, self.max_bytes,
+                          self.hits, self.misses, self.evictions)
+
+    def get(self, key):
+        """Look up a decoded tile.
+
+        Parameters
+        ----------
+        key : tuple
+            Identifies the file, tile, reduction level and quality layer.
+
+        Returns
+        -------
+        tile : array or None
+            The read-only tile data, or None if it is not cached.
+        """
+        with self._lock:
+            try:
+                tile = self._tiles.pop(key)
+            except KeyError:
+                self.misses += 1
+                return None
+            # Re-insert to mark the tile as most recently used.
+            self._tiles[key] = tile
+            self.hits += 1
+            return tile
+
+    def put(self, key, tile):
+        """Store a decoded tile, evicting older tiles if necessary.
+
+        Tiles larger than the whole budget are not stored.
+
+        Parameters
+        ----------
+        key : tuple
+            Identifies the file, tile, reduction level and quality layer.
+        tile : array
+            Decoded tile data.  It is marked read-only.
+        """
+        if tile.nbytes > self.max_bytes:
+            return
+        tile.flags.writeable = False
+        with self._lock:
+            if key in self._tiles:
+                self.nbytes -= self._tiles.pop(key).nbytes
+            self._tiles[key] = tile
+            self.nbytes += tile.nbytes
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._tiles.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all tiles and reset the counters."""
+        with self._lock:
+            self._tiles.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+
+_TILE_CACHE = None
+
+
+def set_tile_cache(max_bytes):
+    """Enable or disable the process-wide decoded tile cache.
+
+    Parameters
+    ----------
+    max_bytes : int or None
+        Memory budget in bytes.  Use None or 0 to disable the cache.  Only
+        images opened from files are cached, since tiles of images in memory
+        could never be looked up again once their Jp2k object is gone.
+
+    Returns
+    -------
+    cache : TileCache or None
+        The new cache.
+
+    Examples
+    --------
+    >>> import glymur
+    >>> cache = glymur.set_tile_cache(64 * 1024 * 1024)
+    >>> cache.max_bytes
+    67108864
+    >>> glymur.set_tile_cache(None)
+    """
+    global _TILE_CACHE
+    if max_bytes:
+        _TILE_CACHE = TileCache(max_bytes)
+    else:
+        _TILE_CACHE = None
+    return _TILE_CACHE
+
+
+def get_tile_cache():
+    """Return the process-wide decoded tile cache, or None if disabled."""
+    return _TILE_CACHE
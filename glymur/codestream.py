@@ -6,7 +6,6 @@ codestreams.
 
 import math
 import struct
-import sys
 import warnings
 
 import numpy as np
@@ -15,6 +14,34 @@ from .core import _progression_order_display
 from .core import _wavelet_transform_display
 from .core import _capabilities_display
 from .lib import openjp2 as opj2
+from .mappedfile import open_source, read_array, read_struct
+
+# Precompiled structures for the fixed-size fields of marker segments.
+_UINT8 = struct.Struct('>B')
+_UINT16 = struct.Struct('>H')
+_UINT16_UINT8 = struct.Struct('>HB')
+_UINT8_UINT8 = struct.Struct('>BB')
+_CME = struct.Struct('>HH')
+_COD_PARAMS = struct.Struct('>BHBBBBBB')
+_RGN = struct.Struct('>BBB')
+_RGN_16 = struct.Struct('>HBB')
+_SIZ = struct.Struct('>HHIIIIIIIIH')
+_SOT = struct.Struct('>HHIBB')
+
+# Record layout of the compact table of packet markers.  Nsop is -1 for EPH
+# markers.
+PACKET_MARKER_DTYPE = np.dtype([('offset', np.int64),
+                                ('Nsop', np.int32),
+                                ('marker', np.uint16)])
+
+# Record layout of the tile index.
+TILE_INDEX_DTYPE = np.dtype([('tile', np.uint16),
+                             ('tile_part', np.uint8),
+                             ('offset', np.int64),
+                             ('length', np.int64)])
+
+# Packets are indexed with the same record layout as tile-parts.
+PACKET_INDEX_DTYPE = TILE_INDEX_DTYPE
 
 # Need a catch-all list of valid markers.
 # See table A-1 in ISO/IEC FCD15444-1.
@@ -29,12 +56,179 @@ for _marker in range(0xff90, 0xff94):
     _valid_markers.append(_marker)
 
 
+def _find_packet_markers(data, base_offset):
+    """Locate SOP and EPH markers in a tile part bit stream.
+
+    Parameters
+    ----------
+    data : ndarray
+        Bytes of the tile part bit stream as uint8.
+    base_offset : int
+        File offset of the first byte of data.
+
+    Returns
+    -------
+    packets : ndarray
+        Table of the packet markers, see PACKET_MARKER_DTYPE, ordered by
+        offset.
+    """
+    n = len(data)
+    idx = np.flatnonzero(data[:-1] == 0xff)
+    second = data[idx + 1]
+
+    # An SOP marker segment needs room for Lsop and Nsop.
+    sop = idx[(second == 0x91) & (idx < n - 5)]
+    eph = idx[second == 0x92]
+
+    packets = np.zeros(len(sop) + len(eph), dtype=PACKET_MARKER_DTYPE)
+    positions = np.concatenate((sop, eph))
+    packets['offset'] = positions + base_offset
+    packets['Nsop'][:len(sop)] = ((data[sop + 4].astype(np.int32) << 8) |
+                                  data[sop + 5])
+    packets['Nsop'][len(sop):] = -1
+    packets['marker'][:len(sop)] = 0xff91
+    packets['marker'][len(sop):] = 0xff92
+    return packets[np.argsort(positions, kind='mergesort')]
+
+
+# Most bytes a packet length of a PLT segment may span, at seven bits each.
+_PLT_MAX_BYTES = 5
+
+
+def _decode_plt(iplt):
+    """Decode the variable-length packet lengths of a PLT segment.
+
+    Each length is stored seven bits per byte, most significant first, with
+    the high bit set on every byte except the last.
+
+    Parameters
+    ----------
+    iplt : ndarray
+        Iplt bytes as uint8.
+
+    Returns
+    -------
+    lengths : ndarray
+        Packet lengths as int64.  Trailing bytes of an unterminated length
+        are ignored, as is everything from a length spanning more bytes
+        than a 32-bit length needs.
+    """
+    ends = np.flatnonzero((iplt & 0x80) == 0)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    too_long = np.flatnonzero(ends - starts + 1 > _PLT_MAX_BYTES)
+    if len(too_long) > 0:
+        msg = "Packet length {0} of a PLT segment spans more than {1} bytes.  "
+        msg += "Decoding of the PLT segment terminated."
+        warnings.warn(msg.format(too_long[0], _PLT_MAX_BYTES))
+        ends = ends[:too_long[0]]
+        starts = starts[:too_long[0]]
+    if len(ends) == 0:
+        return np.zeros(0, dtype=np.int64)
+    iplt = iplt[:ends[-1] + 1]
+
+    # Shift each byte by seven bits for every byte that follows it in the
+    # same length, then sum the bytes of each length.
+    group = np.searchsorted(ends, np.arange(len(iplt)))
+    shift = 7 * (ends[group] - np.arange(len(iplt)))
+    values = (iplt & 0x7f).astype(np.int64) << shift
+    return np.add.reduceat(values, starts)
+
+
+def _tile_index_from_tlm(tlm, first_sot):
+    """Build the tile index from TLM marker segments.
+
+    Parameters
+    ----------
+    tlm : list of TLMsegment
+        TLM marker segments of the main header.
+    first_sot : int
+        Offset of the first SOT marker segment.
+
+    Returns
+    -------
+    index : ndarray
+        See TILE_INDEX_DTYPE.
+    """
+    tlm = sorted(tlm, key=lambda x: x.Ztlm)
+    length = np.concatenate([np.asarray(x.Ptlm, dtype=np.int64)
+                             for x in tlm])
+    index = np.zeros(len(length), dtype=TILE_INDEX_DTYPE)
+    index['length'] = length
+    index['offset'] = first_sot + np.cumsum(length) - length
+
+    if any(x.Ttlm is None for x in tlm):
+        # Tiles are in order with one tile-part each.
+        index['tile'] = np.arange(len(length))
+        return index
+
+    tile = np.concatenate([np.asarray(x.Ttlm, dtype=np.int64) for x in tlm])
+    index['tile'] = tile
+
+    # Number the tile-parts of each tile in codestream order.
+    order = np.argsort(tile, kind='mergesort')
+    sorted_tile = tile[order]
+    starts = np.flatnonzero(np.r_[True, sorted_tile[1:] != sorted_tile[:-1]])
+    group_start = np.repeat(starts, np.diff(np.r_[starts, len(tile)]))
+    index['tile_part'][order] = np.arange(len(tile)) - group_start
+    return index
+
+
+def _tile_index_from_sot_chain(f, offset):
+    """Build the tile index by skipping from one SOT segment to the next.
+
+    Only the SOT marker segments are read, the tile-part data is skipped.
+
+    Parameters
+    ----------
+    f : file
+        Open file object.
+    offset : int
+        Offset of the first SOT marker segment.
+
+    Returns
+    -------
+    index : ndarray
+        See TILE_INDEX_DTYPE.
+    """
+    records = []
+    while True:
+        f.seek(offset)
+        try:
+            marker_id, = read_struct(f, _UINT16)
+            if marker_id != 0xff90:
+                break
+            _, isot, psot, tpsot, _ = read_struct(f, _SOT)
+        except struct.error:
+            msg = "The tile-part at byte {0} is truncated.  "
+            msg += "Tile indexing terminated."
+            warnings.warn(msg.format(offset))
+            break
+        records.append((isot, tpsot, offset, psot))
+        if psot == 0:
+            # The last tile-part, it extends to the end of the codestream.
+            break
+        offset += psot
+    return np.array(records, dtype=TILE_INDEX_DTYPE)
+
+
 class Codestream:
     """Container for codestream information.
 
     Attributes
     ----------
     segment : list of marker segments
+    packets : ndarray or None
+        Compact table of the SOP and EPH packet markers found in the tile
+        part bit streams, with fields offset, Nsop and marker, ordered by
+        offset.  Only available from a full parse in compact mode, otherwise
+        the packet markers (if any) are listed as segments.
+    tile_index : ndarray
+        Table with fields tile, tile_part, offset and length, one record per
+        tile-part in codestream order.  The offset is that of the SOT marker
+        and the length is Psot, so zero means that the tile-part extends to
+        the end of the codestream.  Built from TLM marker segments when
+        present, otherwise by skipping from one SOT marker segment to the
+        next.  Computed upon first access.
 
     Raises
     ------
@@ -47,7 +241,7 @@ class Codestream:
        15444-1:2004 - Information technology -- JPEG 2000 image coding system:
        Core coding system
     """
-    def __init__(self, f, header_only=True):
+    def __init__(self, f, header_only=True, compact=False):
         """
         Parameters
         ----------
@@ -56,15 +250,23 @@ class Codestream:
         header_only : bool, optional
             If True, only marker segments in the main header are parsed.
             Supplying False may impose a large performance penalty.
+        compact : bool, optional
+            If True, SOP and EPH packet markers are collected into the
+            packets table instead of into one segment object per marker.
         """
 
         self._parse_tile_part_bit_stream_flag = False
 
         self.segment = []
+        self.packets = None
+        self._compact = compact
+        self._header_only = header_only
+        self._tile_index = None
+        self._tile_source = None
+        packet_chunks = []
 
         # First two bytes are the SOC marker
-        buffer = f.read(2)
-        marker_id, = struct.unpack('>H', buffer)
+        marker_id, = read_struct(f, _UINT16)
         segment = SOCsegment(offset=f.tell() - 2, length=0)
         self.segment.append(segment)
 
@@ -73,8 +275,7 @@ class Codestream:
 
         while True:
             offset = f.tell()
-            buffer = f.read(2)
-            marker_id, = struct.unpack('>H', buffer)
+            marker_id, = read_struct(f, _UINT16)
 
             if marker_id >= 0xff30 and marker_id <= 0xff3f:
                 the_id = '0x{0:x}'.format(marker_id)
@@ -126,7 +327,15 @@ class Codestream:
                 # Need to keep easy access to tile offsets and lengths for when
                 # we encounter start-of-data marker segments.
                 if header_only:
-                    # Stop parsing as soon as we hit the first Start Of Tile.
+                    # Stop parsing as soon as we hit the first Start Of Tile,
+                    # but remember where the tile-parts start so that the
+                    # tile index can be built later.
+                    if hasattr(f, 'source'):
+                        self._tile_source = (f.source, offset)
+                    elif isinstance(getattr(f, 'name', None), str):
+                        self._tile_source = (('file', f.name), offset)
+                    else:
+                        self._tile_source = (f, offset)
                     return
 
                 segment = self._parseSOTsegment(f)
@@ -139,7 +348,7 @@ class Codestream:
                     msg += "Codestream parsing terminated."
                     msg = msg.format(segment.Isot)
                     warnings.warn(msg)
-                    return
+                    break
 
             elif marker_id == 0xff93:
                 # start of data.  Need to seek past the current tile part.
@@ -163,8 +372,7 @@ class Codestream:
                 msg = "Unrecognized marker id:  0x{0:x}".format(marker_id)
                 warnings.warn(msg)
                 cpos = f.tell()
-                buffer = f.read(2)
-                next_item, = struct.unpack('>H', buffer)
+                next_item, = read_struct(f, _UINT16)
                 f.seek(cpos)
                 if ((next_item & 0xff00) >> 8) == 255:
                     # No segment associated with this marker, so reset
@@ -188,40 +396,191 @@ class Codestream:
                 if self._parse_tile_part_bit_stream_flag:
                     # But first parse the tile part bit stream for SOP and
                     # EPH segments.
-                    self._parse_tile_part_bit_stream(f, segment,
-                                                     tile_length[-1])
+                    packets = self._parse_tile_part_bit_stream(
+                        f, segment, tile_length[-1])
+                    packet_chunks.append(packets)
 
                 f.seek(tile_offset[-1] + tile_length[-1])
 
+        if compact:
+            self.packets = np.concatenate(
+                [np.zeros(0, dtype=PACKET_MARKER_DTYPE)] + packet_chunks)
+
     def _parse_tile_part_bit_stream(self, f, sod_marker, tile_length):
-        """Parse the tile part bit stream for SOP, EPH marker segments."""
-        buffer = f.read(tile_length)
+        """Parse the tile part bit stream for SOP, EPH marker segments.
+
+        Returns
+        -------
+        packets : ndarray
+            Table of the packet markers, see PACKET_MARKER_DTYPE.  In compact
+            mode the markers are not also added as segments.
+        """
         # The tile length could possibly be too large and extend past
         # the end of file.  We need to be a bit resilient.
-        count = min(tile_length, len(buffer))
-        packet = np.frombuffer(buffer, dtype=np.uint8, count=count)
-
-        indices = np.where(packet == 0xff)
-        for idx in indices[0]:
-            try:
-                if packet[idx+1] == 0x91 and (idx < (len(packet) - 5)):
-                    kwargs = {}
-                    kwargs['offset'] = sod_marker.offset + 2 + idx
-                    kwargs['length'] = 4
-                    nsop = packet[(idx + 4):(idx+6)].view('uint16')[0]
-                    if sys.byteorder == 'little':
-                        nsop = nsop.byteswap()
-                    kwargs['Nsop'] = nsop
-                    segment = SOPsegment(**kwargs)
-                    self.segment.append(segment)
-                elif packet[idx + 1] == 0x92:
-                    kwargs = {}
-                    kwargs['offset'] = sod_marker.offset + 2 + idx
-                    kwargs['length'] = 0
-                    segment = EPHsegment(**kwargs)
-                    self.segment.append(segment)
-            except IndexError:
-                continue
+        data = read_array(f, tile_length)
+        packets = _find_packet_markers(data, sod_marker.offset + 2)
+        del data
+
+        if self._compact:
+            return packets
+
+        for offset, nsop, marker in packets.tolist():
+            if marker == 0xff91:
+                segment = SOPsegment(offset=offset, length=4, Nsop=nsop)
+            else:
+                segment = EPHsegment(offset=offset, length=0)
+            self.segment.append(segment)
+        return packets
+
+    def packet_index(self):
+        """Index the packets of every tile-part.
+
+        Packet lengths are taken from the PLT marker segments of each
+        tile-part.  If a tile-part has no PLT segments, packets are instead
+        delimited by their SOP markers.  Tile-parts with neither are left out
+        of the index.
+
+        Returns
+        -------
+        index : ndarray
+            Table with fields tile, tile_part, offset and length, one record
+            per packet in codestream order.  Offsets are in bytes from the
+            beginning of the file.
+
+        Raises
+        ------
+        RuntimeError
+            If only the main header was parsed.
+
+        Examples
+        --------
+        >>> import glymur
+        >>> import pkg_resources as pkg
+        >>> jfile = pkg.resource_filename(glymur.__name__, "data/nemo.jp2")
+        >>> c = glymur.Jp2k(jfile).get_codestream(header_only=False)
+        >>> len(c.packet_index())
+        0
+        """
+        if self._header_only:
+            msg = "The packet index requires a full codestream parse."
+            raise RuntimeError(msg)
+
+        if self.packets is not None:
+            sop = self.packets['offset'][self.packets['marker'] == 0xff91]
+        else:
+            sop = np.array([x.offset for x in self.segment if x.id == 'SOP'],
+                           dtype=np.int64)
+        eoc = [x.offset for x in self.segment if x.id == 'EOC']
+
+        chunks = [np.zeros(0, dtype=PACKET_INDEX_DTYPE)]
+        sot = None
+        plt = []
+        for segment in self.segment:
+            if segment.id == 'SOT':
+                sot = segment
+                plt = []
+            elif segment.id == 'PLT':
+                plt.append(segment.Iplt)
+            elif segment.id == 'SOD' and sot is not None:
+                start = segment.offset + 2
+                if sot.Psot == 0 and len(eoc) > 0:
+                    # The last tile-part extends to the end of codestream.
+                    stop = eoc[0]
+                else:
+                    stop = sot.offset + sot.Psot
+
+                if len(plt) > 0:
+                    length = np.concatenate(plt).astype(np.int64)
+                    offset = start + np.cumsum(length) - length
+                else:
+                    lo, hi = np.searchsorted(sop, [start, stop])
+                    offset = sop[lo:hi]
+                    length = np.diff(np.append(offset, stop))
+
+                chunk = np.zeros(len(offset), dtype=PACKET_INDEX_DTYPE)
+                chunk['tile'] = sot.Isot
+                chunk['tile_part'] = sot.TPsot
+                chunk['offset'] = offset
+                chunk['length'] = length
+                chunks.append(chunk)
+
+        return np.concatenate(chunks)
+
+    @property
+    def tile_index(self):
+        """Index of the tile-parts.
+
+        The index is taken from the TLM marker segments of the main header
+        if there are any.  Otherwise it is built by following the chain of
+        SOT marker segments, each of which gives the length of its
+        tile-part, unless the tile-parts were already parsed.  It is only
+        built once.
+
+        Returns
+        -------
+        index : ndarray
+            Table with fields tile, tile_part, offset and length, see
+            TILE_INDEX_DTYPE, one record per tile-part in codestream order.
+            Offsets are those of the SOT marker segments, in bytes from the
+            beginning of the file, and lengths span the whole tile-part.
+
+        Examples
+        --------
+        >>> import glymur
+        >>> import pkg_resources as pkg
+        >>> jfile = pkg.resource_filename(glymur.__name__, "data/nemo.jp2")
+        >>> c = glymur.Jp2k(jfile).get_codestream()
+        >>> len(c.tile_index)
+        18
+        """
+        if self._tile_index is None:
+            if self._tile_source is None:
+                self._tile_index = self._build_tile_index(None, None)
+            elif isinstance(self._tile_source[0], tuple):
+                source, offset = self._tile_source
+                with open_source(source) as f:
+                    self._tile_index = self._build_tile_index(f, offset)
+            else:
+                # A file object that could not be reopened, read it in place.
+                f, offset = self._tile_source
+                pos = f.tell()
+                try:
+                    self._tile_index = self._build_tile_index(f, offset)
+                finally:
+                    f.seek(pos)
+        return self._tile_index
+
+    def _build_tile_index(self, f, first_sot):
+        """Build the tile index.
+
+        Parameters
+        ----------
+        f : file or None
+            Open file object, only needed if the tile-parts were not parsed.
+        first_sot : int or None
+            Offset of the first SOT marker segment.
+
+        Returns
+        -------
+        index : ndarray
+            See TILE_INDEX_DTYPE.
+        """
+        sot = [x for x in self.segment if x.id == 'SOT']
+        tlm = [x for x in self.segment if x.id == 'TLM']
+        if len(sot) > 0:
+            # Full parse, so everything is already at hand.
+            index = np.zeros(len(sot), dtype=TILE_INDEX_DTYPE)
+            index['tile'] = [x.Isot for x in sot]
+            index['tile_part'] = [x.TPsot for x in sot]
+            index['offset'] = [x.offset for x in sot]
+            index['length'] = [x.Psot for x in sot]
+        elif len(tlm) > 0 and first_sot is not None:
+            index = _tile_index_from_tlm(tlm, first_sot)
+        elif f is not None:
+            index = _tile_index_from_sot_chain(f, first_sot)
+        else:
+            index = np.zeros(0, dtype=TILE_INDEX_DTYPE)
+        return index
 
     def __str__(self):
         msg = 'Codestream:\n'
@@ -248,8 +607,7 @@ class Codestream:
         kwargs = {}
         kwargs['offset'] = f.tell() - 2
 
-        buffer = f.read(38)
-        data = struct.unpack('>HHIIIIIIIIH', buffer)
+        data = read_struct(f, _SIZ)
 
         kwargs['length'] = data[0]
         kwargs['Rsiz'] = data[1]
@@ -281,7 +639,7 @@ class Codestream:
 
         num_components = data[10]
         buffer = f.read(num_components * 3)
-        data = struct.unpack('>' + 'B' * num_components * 3, buffer)
+        data = tuple(bytearray(buffer))
 
         Ssiz = data[0::3]
         kwargs['Ssiz'] = Ssiz
@@ -315,8 +673,7 @@ class Codestream:
         kwargs = {}
         offset = f.tell() - 2
 
-        buffer = f.read(2)
-        length, = struct.unpack('>H', buffer)
+        length, = read_struct(f, _UINT16)
         data = f.read(length-2)
 
         segment = Segment(id='0x{0:x}'.format(marker_id),
@@ -339,8 +696,7 @@ class Codestream:
         kwargs = {}
         kwargs['offset'] = f.tell() - 2
 
-        buffer = f.read(4)
-        data = struct.unpack('>HH', buffer)
+        data = read_struct(f, _CME)
         kwargs['length'] = data[0]
         kwargs['Rcme'] = data[1]
         kwargs['Ccme'] = f.read(kwargs['length'] - 4)
@@ -362,12 +718,11 @@ class Codestream:
         kwargs = {}
         kwargs['offset'] = f.tell() - 2
 
-        buffer = f.read(2)
-        length, = struct.unpack('>H', buffer)
+        length, = read_struct(f, _UINT16)
         kwargs['length'] = length
 
         buffer = f.read(4 * self._Csiz)
-        data = struct.unpack('>' + 'HH' * self._Csiz, buffer)
+        data = tuple(np.frombuffer(buffer, dtype='>u2').tolist())
         kwargs['Xcrg'] = data[0::2]
         kwargs['Ycrg'] = data[1::2]
 
@@ -407,20 +762,16 @@ class Codestream:
         offset = f.tell() - 2
         kwargs['offset'] = offset
 
-        buffer = f.read(2)
-        length, = struct.unpack('>H', buffer)
+        length, = read_struct(f, _UINT16)
         kwargs['length'] = length
 
         if self._Csiz <= 255:
-            buffer = f.read(1)
-            component, = struct.unpack('>B', buffer)
+            component, = read_struct(f, _UINT8)
         else:
-            buffer = f.read(2)
-            component, = struct.unpack('>H', buffer)
+            component, = read_struct(f, _UINT16)
         kwargs['Ccoc'] = component
 
-        buffer = f.read(1)
-        kwargs['Scoc'], = struct.unpack('>B', buffer)
+        kwargs['Scoc'], = read_struct(f, _UINT8)
 
         n = offset + 2 + length - f.tell()
         buffer = f.read(n)
@@ -455,8 +806,7 @@ class Codestream:
         offset = f.tell() - 2
         kwargs['offset'] = f.tell() - 2
 
-        buffer = f.read(3)
-        length, Scod = struct.unpack('>HB', buffer)
+        length, Scod = read_struct(f, _UINT16_UINT8)
         kwargs['length'] = length
         kwargs['Scod'] = Scod
 
@@ -472,7 +822,7 @@ class Codestream:
         SPcod = f.read(n)
         kwargs['SPcod'] = np.frombuffer(SPcod, dtype=np.uint8)
 
-        params = struct.unpack('>BHBBBBBB', SPcod[0:9])
+        params = _COD_PARAMS.unpack_from(SPcod)
         kwargs['_layers'] = params[1]
         kwargs['_numresolutions'] = params[3]
 
@@ -508,8 +858,7 @@ class Codestream:
         kwargs = {}
         kwargs['offset'] = f.tell() - 2
 
-        buffer = f.read(2)
-        length, = struct.unpack('>H', buffer)
+        length, = read_struct(f, _UINT16)
 
         if self._Csiz < 257:
             n = int((length - 2) / 7)
@@ -547,8 +896,7 @@ class Codestream:
         kwargs = {}
         kwargs['offset'] = f.tell() - 2
 
-        buffer = f.read(3)
-        length, zppm = struct.unpack('>HB', buffer)
+        length, zppm = read_struct(f, _UINT16_UINT8)
         kwargs['length'] = length
         kwargs['Zppm'] = zppm
 
@@ -575,8 +923,7 @@ class Codestream:
         kwargs = {}
         kwargs['offset'] = f.tell() - 2
 
-        buffer = f.read(3)
-        length, zplt = struct.unpack('>HB', buffer)
+        length, zplt = read_struct(f, _UINT16_UINT8)
         kwargs['length'] = length
         kwargs['Zplt'] = zplt
 
@@ -584,18 +931,7 @@ class Codestream:
         buffer = f.read(n)
         iplt = np.frombuffer(buffer, dtype=np.uint8)
 
-        packet_len = []
-        plen = 0
-        for x in iplt:
-            plen |= (x & 0x7f)
-            if x & 0x80:
-                # Continue by or-ing in the next byte.
-                plen <<= 7
-            else:
-                packet_len.append(plen)
-                plen = 0
-
-        kwargs['Iplt'] = packet_len
+        kwargs['Iplt'] = _decode_plt(iplt).tolist()
 
         return PLTsegment(**kwargs)
 
@@ -617,8 +953,7 @@ class Codestream:
         kwargs = {}
         kwargs['offset'] = f.tell() - 2
 
-        buffer = f.read(3)
-        length, zppt = struct.unpack('>HB', buffer)
+        length, zppt = read_struct(f, _UINT16_UINT8)
         kwargs['length'] = length
         kwargs['Zppt'] = zppt
 
@@ -639,16 +974,13 @@ class Codestream:
         mantissa = []
 
         if sqcd & 0x1f == 0:  # no quantization
-            data = struct.unpack('>' + 'B' * n, buffer)
-            for j in range(len(data)):
-                exponent.append(data[j] >> 3)
-                mantissa.append(0)
+            data = np.frombuffer(buffer, dtype=np.uint8)
+            exponent = (data >> 3).tolist()
+            mantissa = [0] * len(data)
         else:
-            fmt = '>' + 'H' * int(n / 2)
-            data = struct.unpack(fmt, buffer)
-            for j in range(len(data)):
-                exponent.append(data[j] >> 11)
-                mantissa.append(data[j] & 0x07ff)
+            data = np.frombuffer(buffer, dtype='>u2', count=int(n / 2))
+            exponent = (data >> 11).tolist()
+            mantissa = (data & 0x07ff).tolist()
 
         return mantissa, exponent
 
@@ -668,19 +1000,16 @@ class Codestream:
         offset = f.tell() - 2
         kwargs['offset'] = offset
 
-        buffer = f.read(2)
-        length, = struct.unpack('>H', buffer)
+        length, = read_struct(f, _UINT16)
         kwargs['length'] = length
 
         if self._Csiz > 256:
-            buffer = f.read(3)
-            fmt = '>HB'
+            fmt = _UINT16_UINT8
             n = length - 5
         else:
-            buffer = f.read(2)
-            fmt = '>BB'
+            fmt = _UINT8_UINT8
             n = length - 4
-        Cqcc, Sqcc = struct.unpack(fmt, buffer)
+        Cqcc, Sqcc = read_struct(f, fmt)
         if Cqcc >= self._Csiz:
             msg = "Invalid component number (%d), "
             msg += "number of components is only %d."
@@ -716,8 +1045,7 @@ class Codestream:
         kwargs = {}
         kwargs['offset'] = f.tell() - 2
 
-        buffer = f.read(3)
-        length, sqcd = struct.unpack('>HB', buffer)
+        length, sqcd = read_struct(f, _UINT16_UINT8)
         kwargs['length'] = length
         kwargs['Sqcd'] = sqcd
 
@@ -748,15 +1076,12 @@ class Codestream:
         kwargs = {}
         kwargs['offset'] = f.tell() - 2
 
-        buffer = f.read(2)
-        length, = struct.unpack('>H', buffer)
+        length, = read_struct(f, _UINT16)
 
         if self._Csiz < 257:
-            buffer = f.read(3)
-            data = struct.unpack('>BBB', buffer)
+            data = read_struct(f, _RGN)
         else:
-            buffer = f.read(4)
-            data = struct.unpack('>HBB', buffer)
+            data = read_struct(f, _RGN_16)
 
         kwargs['length'] = length
         kwargs['Crgn'] = data[0]
@@ -798,8 +1123,7 @@ class Codestream:
         kwargs = {}
         kwargs['offset'] = f.tell() - 2
 
-        buffer = f.read(10)
-        data = struct.unpack('>HHIBB', buffer)
+        data = read_struct(f, _SOT)
 
         kwargs['length'] = data[0]
         kwargs['Isot'] = data[1]
@@ -825,12 +1149,10 @@ class Codestream:
         offset = f.tell() - 2
         kwargs['offset'] = offset
 
-        buffer = f.read(2)
-        length, = struct.unpack('>H', buffer)
+        length, = read_struct(f, _UINT16)
         kwargs['length'] = length
 
-        buffer = f.read(2)
-        Ztlm, Stlm = struct.unpack('>BB', buffer)
+        Ztlm, Stlm = read_struct(f, _UINT8_UINT8)
         st = (Stlm >> 4) & 0x3
         sp = (Stlm >> 6) & 0x1
 
@@ -0,0 +1,245 @@
+"""Persistent cache of parsed JPEG 2000 headers.
+
+The cache is opt-in.  Once enabled with set_header_cache, opening a file
+with Jp2k restores the codestream main header, the location of the
+codestream and the tile index from a SQLite database instead of parsing
+the file.  Entries are keyed on the absolute path of the file and are only
+used while its size and modification time are unchanged, and only by the
+version of glymur that stored them.
+
+License:  MIT
+"""
+import hashlib
+import os
+import pickle
+import threading
+
+from . import _get_configdir
+from . import codestream
+
+
+# Bump whenever the layout of the cached state changes.
+_FORMAT_VERSION = 1
+
+_VERSION = None
+
+
+def _version():
+    """Identify the layout of the cached state.
+
+    The state holds pickled Codestream and marker segment objects, so
+    besides the format version, entries are tied to the source of the
+    codestream module.  Any change to glymur that touches those classes
+    thereby invalidates the cache.
+    """
+    global _VERSION
+    if _VERSION is None:
+        digest = hashlib.sha1()
+        try:
+            with open(codestream.__file__, 'rb') as f:
+                digest.update(f.read())
+        except (IOError, OSError):
+            # No source to go by, e.g. an installation from bytecode only.
+            digest.update(codestream.__file__.encode())
+        _VERSION = '{0}-{1}'.format(_FORMAT_VERSION, digest.hexdigest())
+    return _VERSION
+
+
+class HeaderCache:
+    """SQLite database of parsed headers.
+
+    The database may be shared by any number of processes.
+
+    Attributes
+    ----------
+    filename : str
+        Path to the database.
+    hits, misses, stale : int
+        Counters for lookups that were found, lookups that were not found,
+        and entries that were found but no longer matched their file.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+
+    def __str__(self):
+        msg = 'Header cache:  {0}, {1} hits, {2} misses, {3} stale'
+        return msg.format(self.filename, self.hits, self.misses, self.stale)
+
+    def _connect(self):
+        """Return a connection owned by the current process.
+
+        Connections must not be shared with forked processes, so a new one
+        is made whenever the process changes.
+        """
+        if self._connection is None or self._pid != os.getpid():
+            # Imported here to keep importing glymur cheap.
+            import sqlite3
+            self._connection = sqlite3.connect(self.filename, timeout=30,
+                                               check_same_thread=False)
+            self._connection.execute('CREATE TABLE IF NOT EXISTS headers '
+                                     '(path TEXT PRIMARY KEY, '
+                                     'size INTEGER, mtime REAL, '
+                                     'version TEXT, state BLOB)')
+            self._connection.commit()
+            self._pid = os.getpid()
+        return self._connection
+
+    def get(self, path, stat):
+        """Look up the parsed header of a file.
+
+        Parameters
+        ----------
+        path : str
+            Absolute path to the file.
+        stat : tuple
+            The current (mtime, size) of the file.
+
+        Returns
+        -------
+        state : dict or None
+            The cached state, or None if there is no entry matching the
+            current version of the file.
+        """
+        mtime, size = stat
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute('SELECT size, mtime, version, state '
+                               'FROM headers WHERE path = ?',
+                               (path,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            state = None
+            if tuple(row[0:3]) == (size, mtime, _version()):
+                try:
+                    state = pickle.loads(bytes(row[3]))
+                except Exception:
+                    # Written by a version whose classes no longer load.
+                    pass
+            if state is None:
+                # The file has changed, or was cached by another version.
+                self._discard(conn, path)
+                return None
+            self.hits += 1
+            return state
+
+    def discard(self, path):
+        """Drop the entry of a file that turned out to be unusable.
+
+        The lookup that returned the entry counts as stale rather than as a
+        hit.
+
+        Parameters
+        ----------
+        path : str
+            Absolute path to the file.
+        """
+        with self._lock:
+            self._discard(self._connect(), path)
+            self.hits -= 1
+
+    def _discard(self, conn, path):
+        conn.execute('DELETE FROM headers WHERE path = ?', (path,))
+        conn.commit()
+        self.stale += 1
+
+    def put(self, path, stat, state):
+        """Store the parsed header of a file, replacing any older entry.
+
+        Parameters
+        ----------
+        path : str
+            Absolute path to the file.
+        stat : tuple
+            The (mtime, size) of the file when it was parsed.
+        state : dict
+            The parsed header.
+        """
+        import sqlite3
+        mtime, size = stat
+        blob = sqlite3.Binary(pickle.dumps(state, protocol=2))
+        with self._lock:
+            conn = self._connect()
+            conn.execute('INSERT OR REPLACE INTO headers '
+                         '(path, size, mtime, version, state) '
+                         'VALUES (?, ?, ?, ?, ?)',
+                         (path, size, mtime, _version(), blob))
+            conn.commit()
+
+    def clear(self):
+        """Drop all entries and reset the counters."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute('DELETE FROM headers')
+            conn.commit()
+            self.hits = 0
+            self.misses = 0
+            self.stale = 0
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+_HEADER_CACHE = None
+
+
+def set_header_cache(filename):
+    """Enable or disable the persistent header cache.
+
+    Parameters
+    ----------
+    filename : str, bool or None
+        Path to the cache database.  Use True for headers.db in the
+        configuration directory (GLYMURCONFIGDIR, or HOME/.glymur), and None
+        or False to disable the cache.
+
+    Returns
+    -------
+    cache : HeaderCache or None
+        The new cache.
+
+    Raises
+    ------
+    IOError
+        If the default location is requested but there is no configuration
+        directory.
+
+    Examples
+    --------
+    >>> import glymur, os, tempfile
+    >>> dbfile = os.path.join(tempfile.mkdtemp(), 'headers.db')
+    >>> cache = glymur.set_header_cache(dbfile)
+    >>> glymur.set_header_cache(None)
+    """
+    global _HEADER_CACHE
+    if _HEADER_CACHE is not None:
+        _HEADER_CACHE.close()
+        _HEADER_CACHE = None
+
+    if filename is True:
+        confdir = _get_configdir()
+        if confdir is None:
+            msg = "There is no configuration directory for the header cache."
+            raise IOError(msg)
+        if not os.path.isdir(confdir):
+            os.makedirs(confdir)
+        filename = os.path.join(confdir, 'headers.db')
+
+    if filename:
+        _HEADER_CACHE = HeaderCache(filename)
+    return _HEADER_CACHE
+
+
+def get_header_cache():
+    """Return the persistent header cache, or None if disabled."""
+    return _HEADER_CACHE
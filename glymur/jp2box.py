@@ -17,18 +17,37 @@ import os
 import pprint
 import struct
 import sys
+import threading
 import uuid
 import warnings
 import xml.etree.cElementTree as ET
 
 import numpy as np
 
+from . import metrics
 from .codestream import Codestream
 from .core import _approximation_display
 from .core import _colorspace_map_display
 from .core import _color_type_map_display
 from .core import _method_display
 from .core import _reader_requirements_display
+from .mappedfile import open_source, read_struct
+
+# Precompiled structures for box headers and fixed-size box fields.
+_BOX_HEADER = struct.Struct('>I4s')
+_XL = struct.Struct('>Q')
+_IHDR = struct.Struct('>IIHBBBB')
+_COLR = struct.Struct('>BBB')
+_UINT8_UINT8 = struct.Struct('>BB')
+_UINT16 = struct.Struct('>H')
+_UINT16_UINT8 = struct.Struct('>HB')
+_UINT32 = struct.Struct('>I')
+
+
+# Boxes whose payloads are only parsed upon first access of their attributes,
+# i.e. the codestream header, XML, UUID (XMP and Exif) and palette boxes.
+_LAZY_BOXES = ('jp2c', 'pclr', 'uuid', 'xml ')
+_LAZY_LOCK = threading.RLock()
 
 
 class Jp2kBox:
@@ -57,6 +76,32 @@ class Jp2kBox:
         msg += " @ ({0}, {1})".format(self.offset, self.length)
         return msg
 
+    def __getattr__(self, name):
+        """Parse a lazily loaded box payload upon first attribute access.
+
+        Only invoked when normal attribute lookup fails.
+        """
+        if name.startswith('__') or '_lazy_source' not in self.__dict__:
+            msg = "'{0}' object has no attribute '{1}'"
+            raise AttributeError(msg.format(type(self).__name__, name))
+        with _LAZY_LOCK:
+            if '_lazy_source' in self.__dict__:
+                self._load_payload()
+        return getattr(self, name)
+
+    def _load_payload(self):
+        """Read and parse the payload of a lazily loaded box."""
+        source, payload_offset = self._lazy_source
+        with open_source(source) as f:
+            f.seek(payload_offset)
+            box = type(self)._parse(f, self.id, self.offset, self.length)
+            nbytes = f.tell() - payload_offset
+        # Only the main header of a codestream box is read.
+        kind = 'codestream' if self.id == 'jp2c' else 'boxes'
+        metrics.BYTES_PARSED.inc(nbytes, kind=kind)
+        self.__dict__.update(box.__dict__)
+        del self._lazy_source
+
     def _parse_superbox(self, f):
         """Parse a superbox (box consisting of nothing but other boxes.
 
@@ -74,14 +119,18 @@ class Jp2kBox:
 
         start = f.tell()
 
+        # Bytes actually read, i.e. not those of deferred payloads, nor those
+        # of the codestream, nor those of child boxes, which are accounted
+        # for when the child superbox is parsed.
+        nbytes = 0
+
         while True:
 
             # Are we at the end of the superbox?
             if start >= self.offset + self.length:
                 break
 
-            buffer = f.read(8)
-            (L, T) = struct.unpack('>I4s', buffer)
+            (L, T) = read_struct(f, _BOX_HEADER)
             if sys.hexversion >= 0x03000000:
                 T = T.decode('utf-8')
 
@@ -92,15 +141,23 @@ class Jp2kBox:
 
             elif L == 1:
                 # The length of the box is in the XL field, a 64-bit value.
-                buffer = f.read(8)
-                num_bytes, = struct.unpack('>Q', buffer)
+                num_bytes, = read_struct(f, _XL)
 
             else:
                 num_bytes = L
 
-            # Call the proper parser for the given box with ID "T".
+            header_bytes = f.tell() - start
+
+            # Call the proper parser for the given box with ID "T".  Boxes
+            # whose payloads are expensive to interpret only have their
+            # position recorded for now.
             try:
-                box = _box_with_id[T]._parse(f, T, start, num_bytes)
+                if T in _LAZY_BOXES and hasattr(f, 'source'):
+                    box = _box_with_id[T](id=T, offset=start,
+                                          length=num_bytes)
+                    box._lazy_source = (f.source, f.tell())
+                else:
+                    box = _box_with_id[T]._parse(f, T, start, num_bytes)
             except KeyError:
                 msg = 'Unrecognized box ({0}) encountered.'.format(T)
                 warnings.warn(msg)
@@ -109,6 +166,12 @@ class Jp2kBox:
 
             superbox.append(box)
 
+            if (T == 'jp2c' or '_lazy_source' in box.__dict__ or
+                    'box' in box.__dict__):
+                nbytes += header_bytes
+            else:
+                nbytes += num_bytes
+
             # Position to the start of the next box.
             if num_bytes > self.length:
                 # Length of the current box goes past the end of the
@@ -127,6 +190,7 @@ class Jp2kBox:
 
             start += num_bytes
 
+        metrics.BYTES_PARSED.inc(nbytes, kind='boxes')
         return superbox
 
 
@@ -205,16 +269,14 @@ class ColourSpecificationBox(Jp2kBox):
         kwargs['offset'] = offset
 
         # Read the brand, minor version.
-        buffer = f.read(3)
-        (method, precedence, approximation) = struct.unpack('>BBB', buffer)
+        (method, precedence, approximation) = read_struct(f, _COLR)
         kwargs['method'] = method
         kwargs['precedence'] = precedence
         kwargs['approximation'] = approximation
 
         if method == 1:
             # enumerated colour space
-            buffer = f.read(4)
-            kwargs['colorspace'], = struct.unpack('>I', buffer)
+            kwargs['colorspace'], = read_struct(f, _UINT32)
             kwargs['icc_profile'] = None
 
         else:
@@ -288,8 +350,7 @@ class ComponentDefinitionBox(Jp2kBox):
         kwargs['offset'] = offset
 
         # Read the number of components.
-        buffer = f.read(2)
-        N, = struct.unpack('>H', buffer)
+        N, = read_struct(f, _UINT16)
 
         component_number = []
         component_type = []
@@ -595,8 +656,7 @@ class ImageHeaderBox(Jp2kBox):
         kwargs['offset'] = offset
 
         # Read the box information
-        buffer = f.read(14)
-        params = struct.unpack('>IIHBBBB', buffer)
+        params = read_struct(f, _IHDR)
         kwargs['height'] = params[0]
         kwargs['width'] = params[1]
         kwargs['num_components'] = params[2]
@@ -846,50 +906,39 @@ class PaletteBox(Jp2kBox):
         kwargs['offset'] = offset
 
         # Get the size of the palette.
-        buffer = f.read(3)
-        (NE, NC) = struct.unpack('>HB', buffer)
+        (NE, NC) = read_struct(f, _UINT16_UINT8)
 
         # Need to determine bps and signed or not
         buffer = f.read(NC)
-        data = struct.unpack('>' + 'B' * NC, buffer)
+        data = tuple(bytearray(buffer))
         bps = [((x & 0x07f) + 1) for x in data]
         signed = [((x & 0x80) > 1) for x in data]
         kwargs['bits_per_component'] = bps
         kwargs['signed'] = signed
 
-        # Form the format string so that we can intelligently unpack the
-        # colormap.  We have to do this because it is possible that the
-        # colormap columns could have different datatypes.
+        # Form a record datatype so that we can intelligently unpack the
+        # colormap all at once.  We have to do this because it is possible
+        # that the colormap columns could have different datatypes.
         #
         # This means that we store the palette as a list of 1D arrays,
         # which reverses the usual indexing scheme.
-        palette = []
-        fmt = '>'
-        bytes_per_row = 0
+        formats = []
         for j in range(NC):
             if bps[j] <= 8:
-                fmt += 'B'
-                bytes_per_row += 1
-                palette.append(np.zeros(NE, dtype=np.uint8))
+                formats.append('>u1')
             elif bps[j] <= 16:
-                fmt += 'H'
-                bytes_per_row += 2
-                palette.append(np.zeros(NE, dtype=np.uint16))
+                formats.append('>u2')
             elif bps[j] <= 32:
-                fmt += 'I'
-                bytes_per_row += 4
-                palette.append(np.zeros(NE, dtype=np.uint32))
+                formats.append('>u4')
             else:
                 msg = 'Unsupported palette bitdepth (%d).'
                 raise IOError(msg)
-        n = NE * bytes_per_row
-        buffer = f.read(n)
-
-        for j in range(NE):
-            row_buffer = buffer[(bytes_per_row * j):(bytes_per_row * (j + 1))]
-            row = struct.unpack(fmt, row_buffer)
-            for k in range(NC):
-                palette[k][j] = row[k]
+        dtype = np.dtype({'names': ['f{0}'.format(k) for k in range(NC)],
+                          'formats': formats})
+        buffer = f.read(NE * dtype.itemsize)
+        rows = np.frombuffer(buffer, dtype=dtype, count=NE)
+        palette = [rows[name].astype(rows[name].dtype.newbyteorder('='))
+                   for name in dtype.names]
 
         kwargs['palette'] = palette
         box = PaletteBox(**kwargs)
@@ -7,17 +7,26 @@ if sys.hexversion >= 0x03030000:
     from contextlib import ExitStack
 else:
     from contextlib2 import ExitStack
+import collections
+import copy
 import ctypes
 import math
 import os
 import struct
+import timeit
 import warnings
 
 import numpy as np
 
+from . import metrics
+from .cache import get_tile_cache
+from .headercache import get_header_cache
 from .codestream import Codestream
 from .core import progression_order
 from .jp2box import Jp2kBox
+from .mappedfile import open_source
+from .memstream import MemoryStream
+from .tracing import span
 from .lib import openjp2 as opj2
 
 _cspace_map = {'rgb': opj2._CLRSPC_SRGB,
@@ -33,7 +42,9 @@ _CMPFUNC = ctypes.CFUNCTYPE(ctypes.c_void_p, ctypes.c_char_p, ctypes.c_void_p)
 
 def _default_error_handler(msg, client_data):
     msg = "OpenJPEG library error:  {0}".format(msg.decode('utf-8').rstrip())
-    opj2._set_error_message(msg)
+    metrics.OPENJPEG_MESSAGES.inc(level='error')
+    # The client data is the codec, which keeps the message with it.
+    opj2._set_error_message(msg, client_data)
 
 
 def _default_info_handler(msg, client_data):
@@ -43,26 +54,786 @@ def _default_info_handler(msg, client_data):
 def _default_warning_handler(library_msg, client_data):
     library_msg = library_msg.decode('utf-8').rstrip()
     msg = "OpenJPEG library warning:  {0}".format(library_msg)
+    metrics.OPENJPEG_MESSAGES.inc(level='warning')
     warnings.warn(msg)
 
 _error_callback = _CMPFUNC(_default_error_handler)
 _info_callback = _CMPFUNC(_default_info_handler)
 _warning_callback = _CMPFUNC(_default_warning_handler)
 
+# Number of threads each codec uses internally unless told otherwise.
+_NUM_THREADS = 1
+
+
+def set_num_threads(num_threads):
+    """Set the default number of threads used inside each OpenJPEG codec.
+
+    Only takes effect with versions of the OpenJPEG library that provide
+    opj_codec_set_threads.  Older versions silently decode and encode with a
+    single thread.
+
+    Parameters
+    ----------
+    num_threads : int
+        Number of threads, at least 1.
+
+    Raises
+    ------
+    IOError
+        If num_threads is less than 1.
+
+    Examples
+    --------
+    >>> import glymur
+    >>> glymur.set_num_threads(4)
+    >>> glymur.get_num_threads()
+    4
+    >>> glymur.set_num_threads(1)
+    """
+    global _NUM_THREADS
+    if num_threads < 1:
+        msg = "The number of threads must be at least 1, got {0}."
+        raise IOError(msg.format(num_threads))
+    _NUM_THREADS = int(num_threads)
+
+
+def get_num_threads():
+    """Return the default number of threads used inside each codec."""
+    return _NUM_THREADS
+
+
+def _set_codec_threads(codec, num_threads=None):
+    """Enable multithreading inside a codec if the library supports it.
+
+    Parameters
+    ----------
+    codec : _codec_t_p
+        A codec that has been set up but not yet used.
+    num_threads : int, optional
+        Number of threads, defaults to the value of get_num_threads.
+    """
+    if num_threads is None:
+        num_threads = _NUM_THREADS
+    if num_threads > 1:
+        # Falls back to a single thread if unsupported.
+        opj2._codec_set_threads(codec, num_threads)
+
+
+def _set_handlers(codec, verbose=False):
+    """Register the message handlers of a codec.
+
+    The codec is passed to the handlers as their client data, so that its
+    errors are kept apart from those of codecs in other threads.
+
+    Parameters
+    ----------
+    codec : _codec_t_p
+        A newly created codec.
+    verbose : bool, optional
+        Print informational messages produced by the OpenJPEG library.
+    """
+    if verbose:
+        opj2._set_info_handler(codec, _info_callback, codec)
+    else:
+        opj2._set_info_handler(codec, None)
+    opj2._set_warning_handler(codec, _warning_callback, codec)
+    opj2._set_error_handler(codec, _error_callback, codec)
+
+
+def _record_decode(start, reduce, num_pixels):
+    """Update the decode metrics.
+
+    Parameters
+    ----------
+    start : float
+        Start of the decode, from timeit.default_timer.
+    reduce : int
+        Reduction level.
+    num_pixels : int
+        Number of pixels produced.
+    """
+    metrics.DECODE_SECONDS.observe(timeit.default_timer() - start)
+    metrics.DECODES.inc(reduce=reduce)
+    metrics.DECODED_MEGAPIXELS.inc(num_pixels / 1e6)
+
+
+def _record_encode(start, num_pixels):
+    """Update the encode metrics.
+
+    Parameters
+    ----------
+    start : float
+        Start of the encode, from timeit.default_timer.
+    num_pixels : int
+        Number of pixels encoded.
+    """
+    metrics.ENCODE_SECONDS.observe(timeit.default_timer() - start)
+    metrics.ENCODES.inc()
+    metrics.ENCODED_MEGAPIXELS.inc(num_pixels / 1e6)
+
+
+def _component2dtype(component):
+    """Determine the numpy datatype matching an OpenJPEG image component.
+
+    Parameters
+    ----------
+    component : _image_comp_t
+        OpenJPEG image component.
+
+    Returns
+    -------
+    dtype : numpy datatype
+        Datatype matching the precision and signedness of the component.
+
+    Raises
+    ------
+    RuntimeError
+        If the precision exceeds 16 bits.
+    """
+    if component.sgnd:
+        if component.prec <= 8:
+            dtype = np.int8
+        elif component.prec <= 16:
+            dtype = np.int16
+        else:
+            raise RuntimeError("Unhandled precision, datatype")
+    else:
+        if component.prec <= 8:
+            dtype = np.uint8
+        elif component.prec <= 16:
+            dtype = np.uint16
+        else:
+            raise RuntimeError("Unhandled precision, datatype")
+    return dtype
+
+
+def _component_array(component):
+    """View the data buffer of an OpenJPEG image component as an array.
+
+    Parameters
+    ----------
+    component : _image_comp_t
+        Image component with an allocated data buffer.
+
+    Returns
+    -------
+    data : array
+        Writable int32 view of shape (h, w), valid for as long as the image.
+    """
+    nrows, ncols = component.h, component.w
+    addr = ctypes.addressof(component.data.contents)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        x = np.ctypeslib.as_array(
+            (ctypes.c_int32 * (nrows * ncols)).from_address(addr))
+    return x.reshape(nrows, ncols)
+
+
+def _ceildiv(numerator, denominator):
+    """Integer division rounding up, as used for reference grid mappings."""
+    return -(-numerator // denominator)
+
+
+def _image_shape(siz):
+    """Full resolution image dimensions (rows, columns, components).
+
+    Parameters
+    ----------
+    siz : SIZsegment
+        Image and tile size marker segment.
+
+    Returns
+    -------
+    shape : tuple
+        Dimensions of the first component, and the number of components.
+    """
+    nrows = _ceildiv(siz.Ysiz, siz.YRsiz[0]) - _ceildiv(siz.YOsiz,
+                                                        siz.YRsiz[0])
+    ncols = _ceildiv(siz.Xsiz, siz.XRsiz[0]) - _ceildiv(siz.XOsiz,
+                                                        siz.XRsiz[0])
+    return (nrows, ncols, len(siz.XRsiz))
+
+
+def _validate_output(out, shape, dtype):
+    """Verify that a caller-supplied output array can receive image data.
+
+    Parameters
+    ----------
+    out : array
+        Destination array.
+    shape : tuple
+        Shape of the decoded image data.
+    dtype : numpy datatype
+        Datatype of the decoded image data.
+
+    Raises
+    ------
+    IOError
+        If the shapes differ or the data cannot be safely cast.
+    """
+    if out.shape != shape:
+        msg = "Output array has shape {0}, but the image has shape {1}."
+        raise IOError(msg.format(out.shape, shape))
+    if not np.can_cast(dtype, out.dtype):
+        msg = "Cannot safely cast image datatype {0} to output datatype {1}."
+        raise IOError(msg.format(np.dtype(dtype), out.dtype))
+
+
+def _validate_area(area):
+    """Check the corner coordinates of a decoding area.
+
+    Parameters
+    ----------
+    area : tuple
+        Decoding image area, (first_row, first_col, last_row, last_col)
+
+    Raises
+    ------
+    IOError
+        If the coordinates are invalid.
+    """
+    if area[0] < 0 or area[1] < 0:
+        msg = "Upper left corner coordinates must be nonnegative:  {0}"
+        msg = msg.format(area)
+        raise IOError(msg)
+    if area[2] <= 0 or area[3] <= 0:
+        msg = "Lower right corner coordinates must be positive:  {0}"
+        msg = msg.format(area)
+        raise IOError(msg)
+
+
+def _tile_bounds(siz, tile):
+    """Extent of a tile on the reference grid.
+
+    Parameters
+    ----------
+    siz : SIZsegment
+        Image and tile size marker segment.
+    tile : int
+        Tile index.
+
+    Returns
+    -------
+    bounds : tuple
+        (first_row, first_col, last_row, last_col), clipped to the image.
+    """
+    num_tiles_x = _ceildiv(siz.Xsiz - siz.XTOsiz, siz.XTsiz)
+    num_tiles_y = _ceildiv(siz.Ysiz - siz.YTOsiz, siz.YTsiz)
+    if tile < 0 or tile >= num_tiles_x * num_tiles_y:
+        msg = "Tile index {0} is out of range, there are {1} tiles."
+        raise IOError(msg.format(tile, num_tiles_x * num_tiles_y))
+    p, q = tile % num_tiles_x, tile // num_tiles_x
+    return (max(siz.YTOsiz + q * siz.YTsiz, siz.YOsiz),
+            max(siz.XTOsiz + p * siz.XTsiz, siz.XOsiz),
+            min(siz.YTOsiz + (q + 1) * siz.YTsiz, siz.Ysiz),
+            min(siz.XTOsiz + (p + 1) * siz.XTsiz, siz.Xsiz))
+
+
+# Just enough of a SIZ segment to lay out the tiles of an image being written.
+_TileGrid = collections.namedtuple('_TileGrid', ['Xsiz', 'Ysiz',
+                                                 'XOsiz', 'YOsiz',
+                                                 'XTsiz', 'YTsiz',
+                                                 'XTOsiz', 'YTOsiz'])
+
+
+def _planar_tile(tile, bounds, num_comps, dtype):
+    """Arrange tile data component by component, as opj_write_tile expects.
+
+    Parameters
+    ----------
+    tile : array
+        Tile data, (rows, columns) or (rows, columns, components).
+    bounds : tuple
+        Extent of the tile in the image, (r0, c0, r1, c1).
+    num_comps : int
+        Number of image components.
+    dtype : numpy datatype
+        Image datatype.
+
+    Returns
+    -------
+    planar : array
+        Contiguous (components, rows, columns) copy of the tile.
+
+    Raises
+    ------
+    IOError
+        If the tile has the wrong shape.
+    """
+    tile = np.asarray(tile)
+    if tile.ndim == 2:
+        tile = tile[:, :, np.newaxis]
+    expected = (bounds[2] - bounds[0], bounds[3] - bounds[1], num_comps)
+    if tile.shape != expected:
+        msg = "Tile at {0} has shape {1}, expected {2}."
+        raise IOError(msg.format(bounds, tile.shape, expected))
+    return np.ascontiguousarray(tile.transpose(2, 0, 1), dtype=dtype)
+
+
+class _AreaPartition:
+    """Partition of a decoding area along the tile grid.
+
+    Reference grid coordinates are mapped onto the output array of a read at
+    a given reduction level the same way OpenJPEG does, so the pieces of the
+    partition exactly tile the output.
+
+    Attributes
+    ----------
+    area : tuple
+        Decoding area on the reference grid.
+    pieces : list
+        Pairs of tile index and the part of the area covered by that tile,
+        omitting parts that vanish at this reduction level.
+    shape : tuple
+        Number of output rows and columns.
+    """
+    def __init__(self, siz, area, reduce):
+        self._siz = siz
+        self._scale = 1 << reduce
+
+        if area is None:
+            area = (siz.YOsiz, siz.XOsiz, siz.Ysiz, siz.Xsiz)
+        else:
+            _validate_area(area)
+            if area[2] <= area[0] or area[3] <= area[1]:
+                msg = "Lower right corner must be below and to the right of "
+                msg += "the upper left corner:  {0}".format(area)
+                raise IOError(msg)
+            if (((area[0] < siz.YOsiz) or (area[1] < siz.XOsiz) or
+                 (area[2] > siz.Ysiz) or (area[3] > siz.Xsiz))):
+                msg = "Decode area {0} lies outside of the image area."
+                raise IOError(msg.format(area))
+        self.area = area
+
+        num_tiles_x = _ceildiv(siz.Xsiz - siz.XTOsiz, siz.XTsiz)
+        row_edges = _tile_edges(area[0], area[2], siz.YTOsiz, siz.YTsiz)
+        col_edges = _tile_edges(area[1], area[3], siz.XTOsiz, siz.XTsiz)
+        self.pieces = []
+        for y0, y1 in zip(row_edges[:-1], row_edges[1:]):
+            for x0, x1 in zip(col_edges[:-1], col_edges[1:]):
+                if self.row(y1) == self.row(y0):
+                    continue
+                if self.col(x1) == self.col(x0):
+                    continue
+                q = (y0 - siz.YTOsiz) // siz.YTsiz
+                p = (x0 - siz.XTOsiz) // siz.XTsiz
+                self.pieces.append((q * num_tiles_x + p, (y0, x0, y1, x1)))
+
+        if len(self.pieces) == 0:
+            msg = "Decode area {0} is empty at reduction level {1}."
+            raise IOError(msg.format(area, reduce))
+
+        self.shape = (self.row(area[2]) - self.row(area[0]),
+                      self.col(area[3]) - self.col(area[1]))
+
+    def row(self, y):
+        """Map a reference grid row onto the reduced resolution."""
+        return _ceildiv(_ceildiv(y, self._siz.YRsiz[0]), self._scale)
+
+    def col(self, x):
+        """Map a reference grid column onto the reduced resolution."""
+        return _ceildiv(_ceildiv(x, self._siz.XRsiz[0]), self._scale)
+
+    def _slice(self, piece, origin):
+        return (slice(self.row(piece[0]) - self.row(origin[0]),
+                      self.row(piece[2]) - self.row(origin[0])),
+                slice(self.col(piece[1]) - self.col(origin[1]),
+                      self.col(piece[3]) - self.col(origin[1])))
+
+    def output_slice(self, piece):
+        """Index of the output array covered by a piece."""
+        return self._slice(piece, self.area)
+
+    def tile_slice(self, piece):
+        """Index of a piece within its decoded tile."""
+        tile_origin = (max(piece[0] - (piece[0] - self._siz.YTOsiz) %
+                           self._siz.YTsiz, self._siz.YOsiz),
+                       max(piece[1] - (piece[1] - self._siz.XTOsiz) %
+                           self._siz.XTsiz, self._siz.XOsiz))
+        return self._slice(piece, tile_origin)
+
+    def tile_area(self):
+        """Smallest area on the reference grid made of whole tiles that
+        covers every piece."""
+        bounds = [_tile_bounds(self._siz, tidx) for tidx, _ in self.pieces]
+        return (min(x[0] for x in bounds), min(x[1] for x in bounds),
+                max(x[2] for x in bounds), max(x[3] for x in bounds))
+
+    def allocate(self, data):
+        """Allocate the output array like some decoded 3D data."""
+        return np.zeros(self.shape + data.shape[2:], dtype=data.dtype)
+
+    def check_output(self, out):
+        """Verify the rows and columns of a caller-supplied output array."""
+        if out.shape[0:2] != self.shape:
+            msg = "Output array has shape {0}, but the image has {1} rows "
+            msg += "and {2} columns."
+            raise IOError(msg.format(out.shape, self.shape[0], self.shape[1]))
+
+
+def _tile_edges(start, stop, tile_offset, tile_size):
+    """Split [start, stop) along the tile boundaries of one grid dimension.
+
+    Parameters
+    ----------
+    start, stop : int
+        Extent along the reference grid.
+    tile_offset : int
+        Tile grid offset (XTOsiz or YTOsiz).
+    tile_size : int
+        Tile size (XTsiz or YTsiz).
+
+    Returns
+    -------
+    edges : list
+        Sorted boundaries, beginning with start and ending with stop.
+    """
+    first = (start - tile_offset) // tile_size + 1
+    last = _ceildiv(stop - tile_offset, tile_size)
+    inner = [tile_offset + k * tile_size for k in range(first, last)]
+    return [start] + inner + [stop]
+
+
+def _encoder_parameters(codec_fmt, cratios=None, eph=False, psnr=None,
+                        numres=None, cbsize=None, psizes=None,
+                        grid_offset=None, sop=False, subsam=None,
+                        tilesize=None, prog=None, modesw=None):
+    """Construct the OpenJPEG compression parameters.
+
+    See Jp2k.write for a description of the parameters.
+
+    Returns
+    -------
+    cparams : _cparameters_t
+        Compression parameters.
+
+    Raises
+    ------
+    IOError, RuntimeError
+        If the parameters are invalid.
+    """
+    cparams = opj2._set_default_encoder_parameters()
+    cparams.cod_format = codec_fmt
+
+    # Set defaults to lossless to begin.
+    cparams.tcp_rates[0] = 0
+    cparams.tcp_numlayers = 1
+    cparams.cp_disto_alloc = 1
+
+    if cbsize is not None:
+        w = cbsize[1]
+        h = cbsize[0]
+        if h * w > 4096 or h < 4 or w < 4:
+            msg = "Code block area cannot exceed 4096.  "
+            msg += "Code block height and width must be larger than 4."
+            raise RuntimeError(msg)
+        if ((math.log(h, 2) != math.floor(math.log(h, 2)) or
+             math.log(w, 2) != math.floor(math.log(w, 2)))):
+            msg = "Bad code block size ({0}, {1}), "
+            msg += "must be powers of 2."
+            raise IOError(msg.format(h, w))
+        cparams.cblockw_init = w
+        cparams.cblockh_init = h
+
+    if cratios is not None:
+        cparams.tcp_numlayers = len(cratios)
+        for j, cratio in enumerate(cratios):
+            cparams.tcp_rates[j] = cratio
+        cparams.cp_disto_alloc = 1
+
+    if eph:
+        cparams.csty |= 0x04
+
+    if grid_offset is not None:
+        cparams.image_offset_x0 = grid_offset[1]
+        cparams.image_offset_y0 = grid_offset[0]
+
+    if modesw is not None:
+        for x in range(6):
+            if modesw & (1 << x):
+                cparams.mode |= (1 << x)
+
+    if numres is not None:
+        cparams.numresolution = numres
+
+    if prog is not None:
+        prog = prog.upper()
+        cparams.prog_order = progression_order[prog]
+
+    if psnr is not None:
+        cparams.tcp_numlayers = len(psnr)
+        for j, snr_layer in enumerate(psnr):
+            cparams.tcp_distoratio[j] = snr_layer
+        cparams.cp_fixed_quality = 1
+
+    if psizes is not None:
+        for j, (prch, prcw) in enumerate(psizes):
+            if j == 0 and cbsize is not None:
+                cblkh, cblkw = cbsize
+                if cblkh * 2 > prch or cblkw * 2 > prcw:
+                    msg = "Highest Resolution precinct size must be at "
+                    msg += "least twice that of the code block dimensions."
+                    raise IOError(msg)
+            if ((math.log(prch, 2) != math.floor(math.log(prch, 2)) or
+                 math.log(prcw, 2) != math.floor(math.log(prcw, 2)))):
+                msg = "Bad precinct sizes ({0}, {1}), "
+                msg += "must be powers of 2."
+                raise IOError(msg.format(prch, prcw))
+
+            cparams.prcw_init[j] = prcw
+            cparams.prch_init[j] = prch
+        cparams.csty |= 0x01
+        cparams.res_spec = len(psizes)
+
+    if sop:
+        cparams.csty |= 0x02
+
+    if subsam is not None:
+        cparams.subsampling_dy = subsam[0]
+        cparams.subsampling_dx = subsam[1]
+
+    if tilesize is not None:
+        cparams.cp_tdx = tilesize[1]
+        cparams.cp_tdy = tilesize[0]
+        cparams.tile_size_on = opj2._TRUE
+
+    if cratios is not None and psnr is not None:
+        msg = "Cannot specify cratios and psnr together."
+        raise RuntimeError(msg)
+
+    return cparams
+
+
+def _component_parameters(shape, dtype, cparams, codec_fmt, colorspace=None):
+    """Describe the image components to OpenJPEG.
+
+    Parameters
+    ----------
+    shape : tuple
+        Image dimensions, (rows, columns) or (rows, columns, components).
+    dtype : numpy datatype
+        Image datatype, either uint8 or uint16.
+    cparams : _cparameters_t
+        Compression parameters.
+    codec_fmt : int
+        Either opj2._CODEC_J2K or opj2._CODEC_JP2.
+    colorspace : str, optional
+        Either 'rgb' or 'gray'.
+
+    Returns
+    -------
+    comptparms : array of _image_comptparm_t
+        Component parameters.
+    colorspace : int
+        OpenJPEG colorspace.
+
+    Raises
+    ------
+    IOError, RuntimeError
+        If the image dimensions, datatype or colorspace is invalid.
+    """
+    if len(shape) == 2:
+        shape = (shape[0], shape[1], 1)
+    elif len(shape) != 3:
+        msg = "{0}D imagery is not allowed.".format(len(shape))
+        raise IOError(msg)
+
+    numrows, numcols, num_comps = shape
+
+    if colorspace is None:
+        if num_comps == 1 or num_comps == 2:
+            colorspace = opj2._CLRSPC_GRAY
+        else:
+            # No YCC unless specifically told to do so.
+            colorspace = opj2._CLRSPC_SRGB
+    else:
+        if codec_fmt == opj2._CODEC_J2K:
+            raise IOError('Do not specify a colorspace with J2K.')
+        colorspace = colorspace.lower()
+        if colorspace not in ('rgb', 'grey', 'gray'):
+            msg = 'Invalid colorspace "{0}"'.format(colorspace)
+            raise IOError(msg)
+        elif colorspace == 'rgb' and num_comps < 3:
+            msg = 'RGB colorspace requires at least 3 components.'
+            raise IOError(msg)
+        else:
+            colorspace = _cspace_map[colorspace]
+
+    dtype = np.dtype(dtype)
+    if dtype == np.uint8:
+        comp_prec = 8
+    elif dtype == np.uint16:
+        comp_prec = 16
+    else:
+        raise RuntimeError("unhandled datatype")
+
+    comptparms = (opj2._image_comptparm_t * num_comps)()
+    for j in range(num_comps):
+        comptparms[j].dx = cparams.subsampling_dx
+        comptparms[j].dy = cparams.subsampling_dy
+        comptparms[j].w = numcols
+        comptparms[j].h = numrows
+        comptparms[j].x0 = cparams.image_offset_x0
+        comptparms[j].y0 = cparams.image_offset_y0
+        comptparms[j].prec = comp_prec
+        comptparms[j].bpp = comp_prec
+        comptparms[j].sgnd = 0
+
+    return comptparms, colorspace
+
+
+def _set_image_grid(image, numrows, numcols, cparams):
+    """Place the image on the reference grid and pick the component transform.
+
+    Parameters
+    ----------
+    image : _image_t pointer
+        Image created from the component parameters.
+    numrows, numcols : int
+        Image dimensions.
+    cparams : _cparameters_t
+        Compression parameters, the multi-component transform is set here.
+    """
+    image.contents.x0 = cparams.image_offset_x0
+    image.contents.y0 = cparams.image_offset_y0
+    image.contents.x1 = (image.contents.x0 +
+                         (numcols - 1) * cparams.subsampling_dx + 1)
+    image.contents.y1 = (image.contents.y0 +
+                         (numrows - 1) * cparams.subsampling_dy + 1)
+
+    # set multi-component transform?
+    if image.contents.numcomps == 3:
+        cparams.tcp_mct = 1
+    else:
+        cparams.tcp_mct = 0
+
+
+def _create_image(data, cparams, codec_fmt, colorspace=None, source=None):
+    """Stage image data into an OpenJPEG image structure.
+
+    Parameters
+    ----------
+    data : array
+        Image data, either 2D or 3D.
+    cparams : _cparameters_t
+        Compression parameters, the multi-component transform is set here.
+    codec_fmt : int
+        Either opj2._CODEC_J2K or opj2._CODEC_JP2.
+    colorspace : str, optional
+        Either 'rgb' or 'gray'.
+    source : str, optional
+        Names the output in traced spans.
+
+    Returns
+    -------
+    image : _image_t pointer
+        The staged image, to be destroyed by the caller.
+
+    Raises
+    ------
+    IOError, RuntimeError
+        If the image data or colorspace is invalid.
+    """
+    comptparms, colorspace = _component_parameters(data.shape, data.dtype,
+                                                   cparams, codec_fmt,
+                                                   colorspace)
+    if data.ndim == 2:
+        numrows, numcols = data.shape
+        data = data.reshape(numrows, numcols, 1)
+    numrows, numcols, num_comps = data.shape
+
+    with span('stage', source, data.nbytes):
+        image = opj2._image_create(comptparms, colorspace)
+        _set_image_grid(image, numrows, numcols, cparams)
+
+        # Stage the image data directly into the openjpeg component buffers,
+        # converting to int32 on the way in a single pass.
+        for k in range(0, num_comps):
+            np.copyto(_component_array(image.contents.comps[k]),
+                      data[:, :, k])
+
+    return image
+
+
+def _create_encoder(codec_fmt, verbose=False):
+    """Create a compression codec with glymur's message handlers.
+
+    Parameters
+    ----------
+    codec_fmt : int
+        Either opj2._CODEC_J2K or opj2._CODEC_JP2.
+    verbose : bool, optional
+        Print informational messages produced by the OpenJPEG library.
+
+    Returns
+    -------
+    codec : _codec_t_p
+        The compression codec, to be destroyed by the caller.
+    """
+    codec = opj2._create_compress(codec_fmt)
+    _set_handlers(codec, verbose)
+    return codec
+
+
+def _compress(image, cparams, codec_fmt, stream, verbose=False,
+              num_threads=None, source=None):
+    """Encode a staged image into an OpenJPEG stream.
+
+    Parameters
+    ----------
+    image : _image_t pointer
+        The staged image.
+    cparams : _cparameters_t
+        Compression parameters.
+    codec_fmt : int
+        Either opj2._CODEC_J2K or opj2._CODEC_JP2.
+    stream : _stream_t_p
+        Output stream.
+    verbose : bool, optional
+        Print informational messages produced by the OpenJPEG library.
+    num_threads : int, optional
+        Number of threads used by the codec.
+    source : str, optional
+        Names the output in traced spans.
+    """
+    start = timeit.default_timer()
+    with ExitStack() as stack:
+        with span('codec_setup', source):
+            codec = _create_encoder(codec_fmt, verbose)
+            stack.callback(opj2._destroy_codec, codec)
+            opj2._setup_encoder(codec, cparams, image)
+            _set_codec_threads(codec, num_threads)
+        with span('encode', source):
+            opj2._start_compress(codec, image, stream)
+            opj2._encode(codec, stream)
+            opj2._end_compress(codec, stream)
+
+    component = image.contents.comps[0]
+    _record_encode(start, component.w * component.h)
+
 
 class Jp2k(Jp2kBox):
     """JPEG 2000 file.
 
     Attributes
     ----------
-    filename : str
-        The path to the JPEG 2000 file.
+    filename : str or None
+        The path to the JPEG 2000 file, or None if the image was supplied in
+        memory.
     mode : str
         The mode used to open the file.
     box : sequence
         List of top-level boxes in the file.  Each box may in turn contain
         its own list of boxes.  Will be empty if the file consists only of a
         raw codestream.
+
+    Notes
+    -----
+    Pickling a Jp2k produces a lightweight handle carrying only the source,
+    the main codestream header and the tile index, rather than the whole box
+    tree.  An unpickled handle does no I/O until an image is read or the
+    boxes are accessed.  If the file changed since it was parsed, it is
+    parsed again on first use.
     """
 
     def __init__(self, filename, mode='rb'):
@@ -70,21 +841,221 @@ class Jp2k(Jp2kBox):
         Parameters
         ----------
         filename : str or file
-            The path to JPEG 2000 file.
+            The path to JPEG 2000 file, or a file-like object open for
+            reading, whose contents are then parsed and decoded in memory.
         mode : str, optional
             The mode used to open the file.
+
+        Raises
+        ------
+        IOError
+            If a file-like object is given with a mode other than 'rb'.
         """
+        if hasattr(filename, 'read'):
+            if mode != 'rb':
+                msg = "File-like objects can only be read."
+                raise IOError(msg)
+            data = filename.read()
+            filename = None
+            self._source = ('buffer', data)
+        else:
+            self._source = ('file', filename)
         self.filename = filename
         self.mode = mode
         self.box = []
         self.offset = 0
+        self._tile_index = None
+        self._header = None
+        self._jp2c_offset = None
+        self._parsed_stat = None
+        self._verify_stat = False
 
         # Parse the file for JP2/JPX contents only if we are reading it.
         if mode == 'rb':
+            metrics.FILES_OPENED.inc()
+            cache = get_header_cache()
+            if cache is not None and self._source[0] == 'file':
+                self._parse_cached(cache)
+            else:
+                self._parse()
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Open a JPEG 2000 image held in memory.
+
+        Parsing and decoding work directly on the buffer through custom
+        OpenJPEG streams, without any filesystem round-trip.
+
+        Parameters
+        ----------
+        data : bytes-like
+            The JP2 or J2K file contents.  Any object supporting the buffer
+            protocol may be used.  It must not change while in use.
+
+        Returns
+        -------
+        jp2 : Jp2k
+            The image, with filename set to None.
+
+        Examples
+        --------
+        >>> import glymur
+        >>> import pkg_resources as pkg
+        >>> jfile = pkg.resource_filename(glymur.__name__, "data/nemo.jp2")
+        >>> with open(jfile, 'rb') as f:
+        ...     jp2 = glymur.Jp2k.from_bytes(f.read())
+        >>> jp2.shape
+        (1456, 2592, 3)
+        """
+        jp2 = cls.__new__(cls)
+        jp2._source = ('buffer', data)
+        jp2.filename = None
+        jp2.mode = 'rb'
+        jp2.box = []
+        jp2.offset = 0
+        jp2._tile_index = None
+        jp2._header = None
+        jp2._jp2c_offset = None
+        jp2._parsed_stat = None
+        jp2._verify_stat = False
+        metrics.FILES_OPENED.inc()
+        jp2._parse()
+        return jp2
+
+    def __reduce__(self):
+        """Pickle a lightweight handle rather than the parsed box tree."""
+        if not hasattr(self, '_codec_format'):
+            # Nothing has been parsed yet, e.g. a file about to be written.
+            return (Jp2k, (self.filename, self.mode))
+
+        kind, obj = self._source
+        if kind == 'buffer' and not isinstance(obj, bytes):
+            obj = bytes(obj)
+        source = (kind, obj)
+        try:
+            state = self._handle_state(source=source)
+        except RuntimeError:
+            # No single codestream, leave it to the unpickled handle to fail
+            # when it is read.
+            state = self._handle_state(header=False)
+        state['source'] = source
+        return (_rebuild_jp2k, (state,))
+
+    def _handle_state(self, header=True, source=None):
+        """Collect what is needed to read the image without parsing it.
+
+        Parameters
+        ----------
+        header : bool, optional
+            If false, leave out the main codestream header.
+        source : tuple, optional
+            If given, the header reads its tile-parts from this source rather
+            than from the one it was parsed from, so that the state does not
+            refer to the original buffer of an in-memory image.
+
+        Returns
+        -------
+        state : dict
+            Everything but the source, see _restore_state.
+
+        Raises
+        ------
+        RuntimeError
+            If a JP2 file does not have exactly one codestream box.
+        """
+        codestream = self.get_codestream() if header else None
+        if (source is not None and codestream is not None and
+                codestream._tile_source is not None):
+            codestream = copy.copy(codestream)
+            codestream._tile_source = (source, codestream._tile_source[1])
+        return {'mode': self.mode,
+                'length': self.length,
+                'stat': self._parsed_stat,
+                'codec_format': self._codec_format,
+                'jp2c_offset': self._jp2c_offset,
+                'header': codestream,
+                'tile_index': self._tile_index}
+
+    def _restore_state(self, source, state):
+        """Restore a parse from the state collected by _handle_state.
+
+        Nothing is read from the source.  The boxes are only parsed if they
+        are asked for.
+        """
+        self._source = source
+        kind, obj = source
+        self.filename = obj if kind == 'file' else None
+        self.mode = state['mode']
+        self.offset = 0
+        self.length = self._file_size = state['length']
+        self._codec_format = state['codec_format']
+        self._jp2c_offset = state['jp2c_offset']
+        self._header = state['header']
+        self._tile_index = state['tile_index']
+        self._parsed_stat = state['stat']
+        self._verify_stat = False
+        self.box = None
+
+    def _parse_cached(self, cache):
+        """Restore the parse from the header cache, or parse and store it.
+
+        Parameters
+        ----------
+        cache : HeaderCache
+            The persistent header cache.
+        """
+        path = os.path.abspath(self.filename)
+        state = cache.get(path, _file_stat(self.filename))
+        if state is not None:
+            try:
+                self._restore_state(self._source, state)
+                return
+            except (AttributeError, KeyError, TypeError):
+                # The entry does not have the layout this version expects.
+                cache.discard(path)
+        self._parse()
+        self._store_header()
+
+    def _store_header(self):
+        """Save the parse of a file in the header cache, if enabled."""
+        cache = get_header_cache()
+        if cache is None or self._source[0] != 'file' or self.mode != 'rb':
+            return
+        try:
+            state = self._handle_state()
+        except (IOError, RuntimeError, struct.error):
+            # Leave problems with the codestream for reading to report.
+            return
+        cache.put(os.path.abspath(self.filename), self._parsed_stat, state)
+
+    @property
+    def box(self):
+        """List of top-level boxes, parsed on first use by handles that
+        were unpickled."""
+        if self._box is None:
             self._parse()
+        return self._box
+
+    @box.setter
+    def box(self, box):
+        self._box = box
+
+    def _verify_handle(self):
+        """Parse an unpickled handle again if its file has since changed."""
+        if self._verify_stat:
+            self._verify_stat = False
+            if _file_stat(self.filename) != self._parsed_stat:
+                self._parse()
+
+    def _describe_source(self):
+        """Name the file for messages."""
+        if self.filename is None:
+            return '<memory>'
+        return self.filename
 
     def __str__(self):
-        metadata = ['File:  ' + os.path.basename(self.filename)]
+        name = self._describe_source()
+        metadata = ['File:  ' + os.path.basename(name)]
         if len(self.box) > 0:
             for box in self.box:
                 metadata.append(box.__str__())
@@ -93,6 +1064,179 @@ class Jp2k(Jp2kBox):
             metadata.append(c.__str__())
         return '\n'.join(metadata)
 
+    def __getitem__(self, index):
+        """Slice the image with NumPy semantics.
+
+        Row and column slices are mapped onto the decoding area, and equal
+        power-of-two steps are mapped onto the resolution reduction, so only
+        the pixels and resolution needed are decoded.  Other steps fall back
+        to decoding the area at full resolution and subsampling it.  Note that
+        a reduced resolution is a wavelet approximation, not a decimation.
+
+        Examples
+        --------
+        >>> import glymur
+        >>> import pkg_resources as pkg
+        >>> jfile = pkg.resource_filename(glymur.__name__, "data/nemo.jp2")
+        >>> jp = glymur.Jp2k(jfile)
+        >>> jp[::4, ::4].shape
+        (364, 648, 3)
+        >>> jp[100:200, 300:500, 0].shape
+        (100, 200)
+        """
+        codestream = self.get_codestream(header_only=True)
+        shape = self.shape
+
+        if not isinstance(index, tuple):
+            index = (index,)
+        if any(x is Ellipsis for x in index):
+            k = [j for j, x in enumerate(index) if x is Ellipsis][0]
+            fill = (slice(None),) * (len(shape) - len(index) + 1)
+            index = index[:k] + fill + index[k + 1:]
+        if len(index) > len(shape):
+            raise IndexError("Too many indices for the image.")
+        index = index + (slice(None),) * (len(shape) - len(index))
+
+        # Turn integer row and column indices into slices, remembering to
+        # drop those dimensions afterwards.
+        spatial = []
+        squeeze = []
+        for axis in range(2):
+            idx = index[axis]
+            if isinstance(idx, slice):
+                spatial.append(idx.indices(shape[axis]))
+                continue
+            idx = int(idx)
+            if idx < 0:
+                idx += shape[axis]
+            if idx < 0 or idx >= shape[axis]:
+                msg = "Index {0} is out of bounds for axis {1} with size {2}."
+                raise IndexError(msg.format(index[axis], axis, shape[axis]))
+            spatial.append((idx, idx + 1, 1))
+            squeeze.append(axis)
+
+        ranges = [range(*x) for x in spatial]
+        if len(ranges[0]) == 0 or len(ranges[1]) == 0:
+            empty_shape = (len(ranges[0]), len(ranges[1])) + shape[2:]
+            data = np.zeros(empty_shape, dtype=self.dtype)
+        else:
+            data = self._read_slices(codestream, spatial, ranges)
+
+        if len(shape) == 3:
+            data = data[:, :, index[2]]
+
+        if len(squeeze) > 0:
+            data = data[tuple(0 if axis in squeeze else slice(None)
+                              for axis in range(2))]
+        return data
+
+    def _read_slices(self, codestream, spatial, ranges):
+        """Decode the rows and columns selected by __getitem__.
+
+        Parameters
+        ----------
+        codestream : Codestream
+            Main header of the codestream.
+        spatial : list
+            (start, stop, step) of the row and column slices.
+        ranges : list
+            The corresponding non-empty row and column ranges.
+        """
+        siz = codestream.segment[1]
+
+        # Image origin on the component grid.
+        dy, dx = siz.YRsiz[0], siz.XRsiz[0]
+        row0 = _ceildiv(siz.YOsiz, dy)
+        col0 = _ceildiv(siz.XOsiz, dx)
+
+        # Decide the reduction level from the step sizes.
+        row_step, col_step = spatial[0][2], spatial[1][2]
+        reduce = 0
+        if row_step == col_step and row_step > 1:
+            if row_step & (row_step - 1) == 0:
+                reduce = min(int(math.log(row_step, 2)),
+                             int(codestream.segment[2].SPcod[4]))
+        if reduce > 0:
+            # The decoder rounds the area outwards to the reduced grid, whose
+            # samples only line up with the requested rows and columns if
+            # the slices start on a multiple of the scale.  Otherwise decode
+            # at full resolution and subsample.
+            scale = 1 << reduce
+            if ((row0 + spatial[0][0]) % scale or
+                    (col0 + spatial[1][0]) % scale):
+                reduce = 0
+
+        # Decode the bounding area, in reference grid coordinates.
+        lo_row, hi_row = min(ranges[0]), max(ranges[0]) + 1
+        lo_col, hi_col = min(ranges[1]), max(ranges[1]) + 1
+        if reduce > 0:
+            # Let the decoder round the extent at the reduced resolution.
+            hi_row, hi_col = spatial[0][1], spatial[1][1]
+        area = ((row0 + lo_row) * dy, (col0 + lo_col) * dx,
+                min((row0 + hi_row) * dy, siz.Ysiz),
+                min((col0 + hi_col) * dx, siz.Xsiz))
+        data = self.read(reduce=reduce, area=area)
+
+        if reduce > 0:
+            scale = 1 << reduce
+            data = data[::row_step // scale, ::col_step // scale]
+        else:
+            data = data[(spatial[0][0] - lo_row)::row_step,
+                        (spatial[1][0] - lo_col)::col_step]
+        return data
+
+    def __array__(self, dtype=None, copy=None):
+        """Decode the full image when converted with np.asarray."""
+        data = self.read()
+        if dtype is not None:
+            data = data.astype(dtype)
+        return data
+
+    @property
+    def shape(self):
+        """Image dimensions as returned by read, from the SIZ segment."""
+        siz = self.get_codestream(header_only=True).segment[1]
+        shape = _image_shape(siz)
+        if shape[2] == 1:
+            shape = shape[0:2]
+        return shape
+
+    @property
+    def tile_index(self):
+        """Table of tile-part offsets and lengths, see Codestream.tile_index.
+
+        The table is computed only once per file.
+
+        Examples
+        --------
+        >>> import glymur
+        >>> import pkg_resources as pkg
+        >>> jfile = pkg.resource_filename(glymur.__name__, "data/nemo.jp2")
+        >>> jp = glymur.Jp2k(jfile)
+        >>> print(jp.tile_index[1])
+        (1, 0, 81850, 78737)
+        """
+        if self._tile_index is None:
+            self._tile_index = self.get_codestream().tile_index
+            self._store_header()
+        return self._tile_index
+
+    @property
+    def ndim(self):
+        """Number of image dimensions as returned by read."""
+        return len(self.shape)
+
+    @property
+    def dtype(self):
+        """Image datatype as returned by read, from the SIZ segment."""
+        siz = self.get_codestream(header_only=True).segment[1]
+        bitdepth = max(siz._bitdepth)
+        signed = (siz.Ssiz[0] & 0x80) > 0
+        if bitdepth <= 8:
+            return np.dtype(np.int8 if signed else np.uint8)
+        else:
+            return np.dtype(np.int16 if signed else np.uint16)
+
     def _parse(self):
         """Parses the JPEG 2000 file.
 
@@ -101,11 +1245,19 @@ class Jp2k(Jp2kBox):
         IOError
             The file was not JPEG 2000.
         """
-        stat = os.stat(self.filename)
-        self.length = stat.st_size
-        self._file_size = stat.st_size
+        # Anything derived from a previous parse is stale.
+        self._tile_index = None
+        self._header = None
+        self._jp2c_offset = None
+        self._verify_stat = False
+        self._box = []
+
+        if self._source[0] == 'file':
+            self._parsed_stat = _file_stat(self.filename)
 
-        with open(self.filename, 'rb') as f:
+        with open_source(self._source) as f:
+            self.length = f.size
+            self._file_size = f.size
 
             # Make sure we have a JPEG2000 file.  It could be either JP2 or
             # J2C.  Check for J2C first, single box in that case.
@@ -113,6 +1265,7 @@ class Jp2k(Jp2kBox):
             signature, = struct.unpack('>H', buffer)
             if signature == 0xff4f:
                 self._codec_format = opj2._CODEC_J2K
+                self._jp2c_offset = 0
                 # That's it, we're done.  The codestream object is only
                 # produced upon explicit request.
                 return
@@ -130,7 +1283,8 @@ class Jp2k(Jp2kBox):
             T = values[1]
             signature = values[2:]
             if L != 12 or T != b'jP  ' or signature != (13, 10, 135, 10):
-                msg = '{0} is not a JPEG 2000 file.'.format(self.filename)
+                msg = '{0} is not a JPEG 2000 file.'
+                msg = msg.format(self._describe_source())
                 raise IOError(msg)
 
             # Back up and start again, we know we have a superbox (box of
@@ -141,12 +1295,12 @@ class Jp2k(Jp2kBox):
     def write(self, data, cratios=None, eph=False, psnr=None, numres=None,
               cbsize=None, psizes=None, grid_offset=None, sop=False,
               subsam=None, tilesize=None, prog=None, modesw=None,
-              colorspace=None, verbose=False):
+              colorspace=None, verbose=False, num_threads=None):
         """Write image data to a JP2/JPX/J2k file.  Intended usage of the
         various parameters follows that of OpenJPEG's opj_compress utility.
 
         This method can only be used to create JPEG 2000 images that can fit
-        in memory.
+        in memory.  Use write_tiles for larger images.
 
         Parameters
         ----------
@@ -177,6 +1331,11 @@ class Jp2k(Jp2kBox):
                 32 = SEGMARK(SEGSYM)
         numres : int, optional
             Number of resolutions.
+        num_threads : int, optional
+            Number of threads used inside the codec, defaults to the value of
+            glymur.get_num_threads.  Requires a version of the OpenJPEG
+            library that supports multithreaded encoding, otherwise a single
+            thread is used.
         prog : str, optional
             Progression order, one of "LRCP" "RLCP", "RPCL", "PCRL", "CPRL".
         psnr : list, optional
@@ -207,200 +1366,371 @@ class Jp2k(Jp2kBox):
         >>> j.write(data.astype(np.uint8))
         """
 
-        cparams = opj2._set_default_encoder_parameters()
+        if self.filename[-4:].lower() == '.jp2':
+            codec_fmt = opj2._CODEC_JP2
+        else:
+            codec_fmt = opj2._CODEC_J2K
+
+        cparams = _encoder_parameters(codec_fmt, cratios=cratios, eph=eph,
+                                      psnr=psnr, numres=numres,
+                                      cbsize=cbsize, psizes=psizes,
+                                      grid_offset=grid_offset, sop=sop,
+                                      subsam=subsam, tilesize=tilesize,
+                                      prog=prog, modesw=modesw)
 
         outfile = self.filename.encode()
         n = opj2._PATH_LEN - len(outfile)
         outfile += b'0' * n
         cparams.outfile = outfile
 
+        image = _create_image(data, cparams, codec_fmt, colorspace,
+                              self.filename)
+        try:
+            strm = opj2._stream_create_default_file_stream_v3(self.filename,
+                                                              False)
+            try:
+                _compress(image, cparams, codec_fmt, strm, verbose,
+                          num_threads, self.filename)
+            finally:
+                opj2._stream_destroy_v3(strm)
+        finally:
+            opj2._image_destroy(image)
+
+        self._parse()
+
+    def write_tiles(self, shape, dtype, tilesize, tile_source,
+                    colorspace=None, verbose=False, num_threads=None,
+                    **kwargs):
+        """Write an image to a JP2/J2K file one tile at a time.
+
+        Only one tile is ever held in memory, so this can create images far
+        larger than the available memory, such as gigapixel mosaics.  Tiles
+        are requested and encoded in raster order.
+
+        Parameters
+        ----------
+        shape : tuple
+            Image dimensions, (rows, columns) or (rows, columns, components).
+        dtype : numpy datatype
+            Image datatype, either uint8 or uint16.
+        tilesize : tuple
+            Tile size in terms of (numrows, numcols).
+        tile_source : array, callable or iterable
+            Provides the tiles.  An array, such as a numpy.memmap, is sliced
+            into tiles.  A callable is invoked as tile_source(tidx, (r0, c0,
+            r1, c1)) and must return the image data between rows r0:r1 and
+            columns c0:c1.  Any other iterable, such as a generator, must
+            yield the tiles in raster order.  Edge tiles are smaller than
+            tilesize where the image does not divide evenly.
+        colorspace : str, optional
+            Either 'rgb' or 'gray'.
+        verbose : bool, optional
+            Print informational messages produced by the OpenJPEG library.
+        num_threads : int, optional
+            Number of threads used inside the codec, defaults to the value of
+            glymur.get_num_threads.
+        kwargs : optional
+            Any of the remaining encoding parameters of Jp2k.write, except
+            for subsam.
+
+        Raises
+        ------
+        IOError
+            If a tile has the wrong shape, if tile_source runs out of tiles,
+            or if subsampling is requested.  The partially written file is
+            removed.
+
+        Examples
+        --------
+        >>> import glymur
+        >>> import numpy as np
+        >>> from tempfile import NamedTemporaryFile
+        >>> tfile = NamedTemporaryFile(suffix='.jp2', delete=False)
+        >>> def tile_source(tidx, bounds):
+        ...     r0, c0, r1, c1 = bounds
+        ...     return np.full((r1 - r0, c1 - c0), tidx, dtype=np.uint8)
+        >>> j = glymur.Jp2k(tfile.name, mode='wb')
+        >>> j.write_tiles((600, 800), np.uint8, (256, 256), tile_source)
+        """
+        if kwargs.get('subsam') is not None:
+            msg = "Subsampling is not supported when writing tiles."
+            raise IOError(msg)
+
         if self.filename[-4:].lower() == '.jp2':
             codec_fmt = opj2._CODEC_JP2
         else:
             codec_fmt = opj2._CODEC_J2K
 
-        cparams.cod_format = codec_fmt
-
-        # Set defaults to lossless to begin.
-        cparams.tcp_rates[0] = 0
-        cparams.tcp_numlayers = 1
-        cparams.cp_disto_alloc = 1
+        cparams = _encoder_parameters(codec_fmt, tilesize=tilesize, **kwargs)
 
-        if cbsize is not None:
-            w = cbsize[1]
-            h = cbsize[0]
-            if h * w > 4096 or h < 4 or w < 4:
-                msg = "Code block area cannot exceed 4096.  "
-                msg += "Code block height and width must be larger than 4."
-                raise RuntimeError(msg)
-            if ((math.log(h, 2) != math.floor(math.log(h, 2)) or
-                 math.log(w, 2) != math.floor(math.log(w, 2)))):
-                msg = "Bad code block size ({0}, {1}), "
-                msg += "must be powers of 2."
-                raise IOError(msg.format(h, w))
-            cparams.cblockw_init = w
-            cparams.cblockh_init = h
-
-        if cratios is not None:
-            cparams.tcp_numlayers = len(cratios)
-            for j, cratio in enumerate(cratios):
-                cparams.tcp_rates[j] = cratio
-            cparams.cp_disto_alloc = 1
-
-        if eph:
-            cparams.csty |= 0x04
-
-        if grid_offset is not None:
-            cparams.image_offset_x0 = grid_offset[1]
-            cparams.image_offset_y0 = grid_offset[0]
-
-        if modesw is not None:
-            for x in range(6):
-                if modesw & (1 << x):
-                    cparams.mode |= (1 << x)
-
-        if numres is not None:
-            cparams.numresolution = numres
-
-        if prog is not None:
-            prog = prog.upper()
-            cparams.prog_order = progression_order[prog]
-
-        if psnr is not None:
-            cparams.tcp_numlayers = len(psnr)
-            for j, snr_layer in enumerate(psnr):
-                cparams.tcp_distoratio[j] = snr_layer
-            cparams.cp_fixed_quality = 1
-
-        if psizes is not None:
-            for j, (prch, prcw) in enumerate(psizes):
-                if j == 0 and cbsize is not None:
-                    cblkh, cblkw = cbsize
-                    if cblkh * 2 > prch or cblkw * 2 > prcw:
-                        msg = "Highest Resolution precinct size must be at "
-                        msg += "least twice that of the code block dimensions."
-                        raise IOError(msg)
-                if ((math.log(prch, 2) != math.floor(math.log(prch, 2)) or
-                     math.log(prcw, 2) != math.floor(math.log(prcw, 2)))):
-                    msg = "Bad precinct sizes ({0}, {1}), "
-                    msg += "must be powers of 2."
-                    raise IOError(msg.format(prch, prcw))
-
-                cparams.prcw_init[j] = prcw
-                cparams.prch_init[j] = prch
-            cparams.csty |= 0x01
-            cparams.res_spec = len(psizes)
-
-        if sop:
-            cparams.csty |= 0x02
-
-        if subsam is not None:
-            cparams.subsampling_dy = subsam[0]
-            cparams.subsampling_dx = subsam[1]
-
-        if tilesize is not None:
-            cparams.cp_tdx = tilesize[1]
-            cparams.cp_tdy = tilesize[0]
-            cparams.tile_size_on = opj2._TRUE
-
-        if cratios is not None and psnr is not None:
-            msg = "Cannot specify cratios and psnr together."
-            raise RuntimeError(msg)
+        outfile = self.filename.encode()
+        n = opj2._PATH_LEN - len(outfile)
+        outfile += b'0' * n
+        cparams.outfile = outfile
 
-        if data.ndim == 2:
-            numrows, numcols = data.shape
-            data = data.reshape(numrows, numcols, 1)
-        elif data.ndim == 3:
-            pass
+        dtype = np.dtype(dtype)
+        comptparms, clrspc = _component_parameters(shape, dtype, cparams,
+                                                   codec_fmt, colorspace)
+        numrows, numcols = shape[0], shape[1]
+        num_comps = len(comptparms)
+
+        # Tile bounds on the reference grid, the tile grid starts at the
+        # origin.
+        grid = _TileGrid(Xsiz=cparams.image_offset_x0 + numcols,
+                         Ysiz=cparams.image_offset_y0 + numrows,
+                         XOsiz=cparams.image_offset_x0,
+                         YOsiz=cparams.image_offset_y0,
+                         XTsiz=tilesize[1], YTsiz=tilesize[0],
+                         XTOsiz=0, YTOsiz=0)
+        num_tiles = (_ceildiv(grid.Xsiz, grid.XTsiz) *
+                     _ceildiv(grid.Ysiz, grid.YTsiz))
+
+        if isinstance(tile_source, np.ndarray):
+            def get_tile(tidx, bounds):
+                r0, c0, r1, c1 = bounds
+                return tile_source[r0:r1, c0:c1]
+        elif callable(tile_source):
+            get_tile = tile_source
         else:
-            msg = "{0}D imagery is not allowed.".format(data.ndim)
-            raise IOError(msg)
+            tile_iterator = iter(tile_source)
 
-        numrows, numcols, num_comps = data.shape
+            def get_tile(tidx, bounds):
+                try:
+                    return next(tile_iterator)
+                except StopIteration:
+                    msg = "tile_source ended after {0} of {1} tiles."
+                    raise IOError(msg.format(tidx, num_tiles))
 
-        if colorspace is None:
-            if data.shape[2] == 1 or data.shape[2] == 2:
-                colorspace = opj2._CLRSPC_GRAY
-            else:
-                # No YCC unless specifically told to do so.
-                colorspace = opj2._CLRSPC_SRGB
-        else:
-            if codec_fmt == opj2._CODEC_J2K:
-                raise IOError('Do not specify a colorspace with J2K.')
-            colorspace = colorspace.lower()
-            if colorspace not in ('rgb', 'grey', 'gray'):
-                msg = 'Invalid colorspace "{0}"'.format(colorspace)
-                raise IOError(msg)
-            elif colorspace == 'rgb' and data.shape[2] < 3:
-                msg = 'RGB colorspace requires at least 3 components.'
-                raise IOError(msg)
-            else:
-                colorspace = _cspace_map[colorspace]
+        def remove_on_error(exc_type, exc_value, traceback):
+            # Do not leave a truncated file behind.
+            if exc_type is not None and os.path.exists(self.filename):
+                os.remove(self.filename)
 
-        if data.dtype == np.uint8:
-            comp_prec = 8
-        elif data.dtype == np.uint16:
-            comp_prec = 16
+        start = timeit.default_timer()
+        with ExitStack() as stack:
+            # Registered first, so the file is removed once it is closed.
+            stack.push(remove_on_error)
+            image = opj2._image_tile_create(comptparms, clrspc)
+            stack.callback(opj2._image_destroy, image)
+            _set_image_grid(image, numrows, numcols, cparams)
+
+            with span('codec_setup', self.filename):
+                codec = _create_encoder(codec_fmt, verbose)
+                stack.callback(opj2._destroy_codec, codec)
+                opj2._setup_encoder(codec, cparams, image)
+                _set_codec_threads(codec, num_threads)
+
+                strm = opj2._stream_create_default_file_stream_v3(
+                    self.filename, False)
+                stack.callback(opj2._stream_destroy_v3, strm)
+
+                opj2._start_compress(codec, image, strm)
+
+            for tidx in range(num_tiles):
+                y0, x0, y1, x1 = _tile_bounds(grid, tidx)
+                bounds = (y0 - grid.YOsiz, x0 - grid.XOsiz,
+                          y1 - grid.YOsiz, x1 - grid.XOsiz)
+                with span('stage', self.filename) as stage_span:
+                    tile = _planar_tile(get_tile(tidx, bounds), bounds,
+                                        num_comps, dtype)
+                    stage_span.nbytes = tile.nbytes
+                with span('encode_tile', self.filename, tile.nbytes):
+                    opj2._write_tile(codec, tidx, tile, tile.nbytes, strm)
+
+            with span('encode', self.filename):
+                opj2._end_compress(codec, strm)
+
+        _record_encode(start, numrows * numcols)
+        self._parse()
+
+    def read(self, reduce=0, layer=0, area=None, tile=None, verbose=False,
+             workers=1, out=None, num_threads=None):
+        """Read a JPEG 2000 image.
+
+        Parameters
+        ----------
+        layer : int, optional
+            Number of quality layer to decode.
+        reduce : int, optional
+            Factor by which to reduce output resolution.  Use -1 to get the
+            lowest resolution thumbnail.
+        area : tuple, optional
+            Specifies decoding image area,
+            (first_row, first_col, last_row, last_col)
+        tile : int, optional
+            Number of tile to decode.
+        verbose : bool, optional
+            Print informational messages produced by the OpenJPEG library.
+        workers : int, optional
+            Number of threads used to decode the image.  If more than one,
+            the tiles intersecting the requested area are decoded in parallel,
+            each with its own codec and stream.  Ignored if a tile is given.
+            If the tile cache is enabled (see glymur.set_tile_cache) and the
+            image was opened from a file, the result is assembled from cached
+            tiles and only the missing tiles are decoded.
+        out : array, optional
+            Preallocated array into which the image is decoded, e.g. a view
+            into a larger mosaic.  It must have the shape of the result and a
+            datatype to which the image datatype can be safely cast.
+        num_threads : int, optional
+            Number of threads used inside each codec, defaults to the value
+            of glymur.get_num_threads.  Unlike workers, this also speeds up
+            decoding a single tile, but requires a version of the OpenJPEG
+            library that supports multithreading.  Otherwise a single thread
+            is used.
+
+        Returns
+        -------
+        result : array
+            The image data.  If out was supplied, it is returned.
+
+        Raises
+        ------
+        IOError
+            If the image has differing subsample factors, or if out does not
+            match the image.
+
+        Examples
+        --------
+        >>> import glymur
+        >>> import pkg_resources as pkg
+        >>> jfile = pkg.resource_filename(glymur.__name__, "data/nemo.jp2")
+        >>> jp = glymur.Jp2k(jfile)
+        >>> image = jp.read()
+        >>> image.shape
+        (1456, 2592, 3)
+
+        Read the lowest resolution thumbnail.
+
+        >>> thumbnail = jp.read(reduce=-1)
+        >>> thumbnail.shape
+        (46, 81, 3)
+        """
+        self._check_subsampling()
+
+        out3d = out
+        if out is not None and out.ndim == 2:
+            out3d = out[:, :, np.newaxis]
+
+        if get_tile_cache() is not None and self.filename is not None:
+            data = self._read_cached(reduce=reduce,
+                                     layer=layer,
+                                     area=area,
+                                     tile=tile,
+                                     verbose=verbose,
+                                     workers=workers,
+                                     out=out3d,
+                                     num_threads=num_threads)
+        elif workers > 1 and tile is None:
+            data = self._read_threaded(reduce=reduce,
+                                       layer=layer,
+                                       area=area,
+                                       verbose=verbose,
+                                       workers=workers,
+                                       out=out3d,
+                                       num_threads=num_threads)
         else:
-            raise RuntimeError("unhandled datatype")
-
-        comptparms = (opj2._image_comptparm_t * num_comps)()
-        for j in range(num_comps):
-            comptparms[j].dx = cparams.subsampling_dx
-            comptparms[j].dy = cparams.subsampling_dy
-            comptparms[j].w = numcols
-            comptparms[j].h = numrows
-            comptparms[j].x0 = cparams.image_offset_x0
-            comptparms[j].y0 = cparams.image_offset_y0
-            comptparms[j].prec = comp_prec
-            comptparms[j].bpp = comp_prec
-            comptparms[j].sgnd = 0
+            data = self._read_common(reduce=reduce,
+                                     layer=layer,
+                                     area=area,
+                                     tile=tile,
+                                     verbose=verbose,
+                                     as_bands=False,
+                                     out=out3d,
+                                     num_threads=num_threads)
+
+        if out is not None:
+            return out
 
-        image = opj2._image_create(comptparms, colorspace)
+        if data.shape[2] == 1:
+            data = data.view()
+            data.shape = data.shape[0:2]
 
-        # set image offset and reference grid
-        image.contents.x0 = cparams.image_offset_x0
-        image.contents.y0 = cparams.image_offset_y0
-        image.contents.x1 = (image.contents.x0 +
-                             (numcols - 1) * cparams.subsampling_dx + 1)
-        image.contents.y1 = (image.contents.y0 +
-                             (numrows - 1) * cparams.subsampling_dy + 1)
+        return data
 
-        # Stage the image data to the openjpeg data structure.
-        for k in range(0, num_comps):
-            layer = np.ascontiguousarray(data[:, :, k], dtype=np.int32)
-            dest = image.contents.comps[k].data
-            src = layer.ctypes.data
-            ctypes.memmove(dest, src, layer.nbytes)
-
-        # set multi-component transform?
-        if image.contents.numcomps == 3:
-            cparams.tcp_mct = 1
-        else:
-            cparams.tcp_mct = 0
+    def _read_threaded(self, reduce=0, layer=0, area=None, verbose=False,
+                       workers=2, out=None, num_threads=None):
+        """Read a JPEG 2000 image by decoding its tiles in parallel.
 
-        codec = opj2._create_compress(codec_fmt)
+        The requested area is split along the tile grid given by the SIZ
+        segment.  Each piece is decoded by a worker thread with its own codec
+        and stream (the OpenJPEG calls release the GIL), and the result is
+        written into a single output array.
 
-        if verbose:
-            opj2._set_info_handler(codec, _info_callback)
-        else:
-            opj2._set_info_handler(codec, None)
-
-        opj2._set_warning_handler(codec, _warning_callback)
-        opj2._set_error_handler(codec, _error_callback)
-        opj2._setup_encoder(codec, cparams, image)
-        strm = opj2._stream_create_default_file_stream_v3(self.filename, False)
-        opj2._start_compress(codec, image, strm)
-        opj2._encode(codec, strm)
-        opj2._end_compress(codec, strm)
-        opj2._stream_destroy_v3(strm)
-        opj2._destroy_codec(codec)
-        opj2._image_destroy(image)
+        Parameters
+        ----------
+        layer : int, optional
+            Number of quality layer to decode.
+        reduce : int, optional
+            Factor by which to reduce output resolution.  Use -1 to get the
+            lowest resolution thumbnail.
+        area : tuple, optional
+            Specifies decoding image area,
+            (first_row, first_col, last_row, last_col)
+        verbose : bool, optional
+            Print informational messages produced by the OpenJPEG library.
+        workers : int, optional
+            Number of decoding threads.
+        out : array, optional
+            Preallocated 3D destination array.
+        num_threads : int, optional
+            Number of threads used inside each codec.
 
-        self._parse()
+        Returns
+        -------
+        data : array
+            The image data, always 3D.
 
-    def read(self, reduce=0, layer=0, area=None, tile=None, verbose=False):
-        """Read a JPEG 2000 image.
+        Raises
+        ------
+        IOError
+            If the area parameter is invalid.
+        """
+        codestream = self.get_codestream(header_only=True)
+        if reduce == -1:
+            reduce = int(codestream.segment[2].SPcod[4])
+        grid = _AreaPartition(codestream.segment[1], area, reduce)
+        pieces = [piece for _, piece in grid.pieces]
+
+        if out is None:
+            # The number of components and datatype are only known for
+            # certain after decoding (palettes expand them), so decode the
+            # first piece on its own before allocating the output.
+            data = self._read_common(reduce=reduce, layer=layer,
+                                     area=pieces[0], verbose=verbose,
+                                     num_threads=num_threads)
+            out = grid.allocate(data)
+            out[grid.output_slice(pieces[0])] = data
+            pieces = pieces[1:]
+        else:
+            grid.check_output(out)
+
+        def decode_piece(piece):
+            view = out[grid.output_slice(piece)]
+            self._read_common(reduce=reduce, layer=layer, area=piece,
+                              verbose=verbose, out=view,
+                              num_threads=num_threads)
+
+        if len(pieces) > 0:
+            # Imported here as it is slow to import.
+            from multiprocessing.pool import ThreadPool
+            pool = ThreadPool(min(workers, len(pieces)))
+            try:
+                pool.map(decode_piece, pieces)
+            finally:
+                pool.close()
+                pool.join()
+
+        return out
+
+    def _read_cached(self, reduce=0, layer=0, area=None, tile=None,
+                     verbose=False, workers=1, out=None, num_threads=None):
+        """Read a JPEG 2000 image through the decoded tile cache.
+
+        The requested area is assembled from whole decoded tiles.  Tiles
+        found in the cache are reused, and only the missing tiles are
+        decoded (in parallel if more than one worker is requested) and then
+        added to the cache.
 
         Parameters
         ----------
@@ -416,34 +1746,79 @@ class Jp2k(Jp2kBox):
             Number of tile to decode.
         verbose : bool, optional
             Print informational messages produced by the OpenJPEG library.
+        workers : int, optional
+            Number of threads used to decode missing tiles.
+        out : array, optional
+            Preallocated 3D destination array.
+        num_threads : int, optional
+            Number of threads used inside each codec.
 
         Returns
         -------
-        result : array
-            The image data.
+        data : array
+            The image data, always 3D.
+        """
+        cache = get_tile_cache()
+        codestream = self.get_codestream(header_only=True)
+        if reduce == -1:
+            reduce = int(codestream.segment[2].SPcod[4])
+        siz = codestream.segment[1]
+        if tile is not None:
+            area = _tile_bounds(siz, tile)
+        grid = _AreaPartition(siz, area, reduce)
+
+        # Tiles are keyed on the file and its modification time, so that
+        # rewritten files do not pick up stale tiles.
+        path = os.path.abspath(self.filename)
+        mtime = os.stat(self.filename).st_mtime
+
+        def key(tidx):
+            return (path, mtime, tidx, reduce, layer)
+
+        tiles = {}
+        missing = []
+        for tidx, _ in grid.pieces:
+            tiles[tidx] = cache.get(key(tidx))
+            if tiles[tidx] is None:
+                missing.append(tidx)
+
+        def decode_tile(tidx):
+            data = self._read_common(reduce=reduce, layer=layer, tile=tidx,
+                                     verbose=verbose,
+                                     num_threads=num_threads)
+            cache.put(key(tidx), data)
+            return data
+
+        if workers > 1 and len(missing) > 1:
+            from multiprocessing.pool import ThreadPool
+            pool = ThreadPool(min(workers, len(missing)))
+            try:
+                decoded = pool.map(decode_tile, missing)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            decoded = [decode_tile(tidx) for tidx in missing]
+        tiles.update(zip(missing, decoded))
+
+        first = tiles[grid.pieces[0][0]]
+        if out is None:
+            out = grid.allocate(first)
+        else:
+            _validate_output(out, grid.shape + first.shape[2:], first.dtype)
+        for tidx, piece in grid.pieces:
+            out[grid.output_slice(piece)] = tiles[tidx][grid.tile_slice(piece)]
+
+        return out
+
+    def _check_subsampling(self):
+        """Verify that all components share the same subsampling factors.
 
         Raises
         ------
         IOError
             If the image has differing subsample factors.
-
-        Examples
-        --------
-        >>> import glymur
-        >>> import pkg_resources as pkg
-        >>> jfile = pkg.resource_filename(glymur.__name__, "data/nemo.jp2")
-        >>> jp = glymur.Jp2k(jfile)
-        >>> image = jp.read()
-        >>> image.shape
-        (1456, 2592, 3)
-
-        Read the lowest resolution thumbnail.
-
-        >>> thumbnail = jp.read(reduce=-1)
-        >>> thumbnail.shape
-        (46, 81, 3)
         """
-        # Check for differing subsample factors.
         codestream = self.get_codestream(header_only=True)
         dxs = np.array(codestream.segment[1].XRsiz)
         dys = np.array(codestream.segment[1].YRsiz)
@@ -451,52 +1826,48 @@ class Jp2k(Jp2kBox):
             msg = "Components must all have the same subsampling factors."
             raise IOError(msg)
 
-        data = self._read_common(reduce=reduce,
-                                 layer=layer,
-                                 area=area,
-                                 tile=tile,
-                                 verbose=verbose,
-                                 as_bands=False)
-
-        if data.shape[2] == 1:
-            data = data.view()
-            data.shape = data.shape[0:2]
-
-        return data
-
-    def _read_common(self, reduce=0, layer=0, area=None, tile=None,
-                     verbose=False, as_bands=False):
-        """Read a JPEG 2000 image.
+    def _decoder_parameters(self, reduce=0, layer=0, area=None, tile=None,
+                            template=None):
+        """Construct the OpenJPEG decompression parameters.
 
         Parameters
         ----------
         layer : int, optional
             Number of quality layer to decode.
         reduce : int, optional
-            Factor by which to reduce output resolution.
+            Factor by which to reduce output resolution.  Use -1 to get the
+            lowest resolution thumbnail.
         area : tuple, optional
             Specifies decoding image area,
             (first_row, first_col, last_row, last_col)
         tile : int, optional
             Number of tile to decode.
-        verbose : bool, optional
-            Print informational messages produced by the OpenJPEG library.
-        as_bands : bool, optional
-            If true, return the individual 2D components in a list.
+        template : _dparameters_t, optional
+            Previously constructed parameters to start from, which saves
+            setting up the defaults and the input file name again.
 
         Returns
         -------
-        data : list or array
-            The individual image components or a single array.
+        dparam : _dparameters_t
+            Decompression parameters.
+
+        Raises
+        ------
+        IOError
+            If the area parameter is invalid.
         """
-        dparam = opj2._set_default_decoder_parameters()
+        if template is None:
+            dparam = opj2._set_default_decoder_parameters()
 
-        infile = self.filename.encode()
-        nelts = opj2._PATH_LEN - len(infile)
-        infile += b'0' * nelts
-        dparam.infile = infile
+            if self.filename is not None:
+                infile = self.filename.encode()
+                nelts = opj2._PATH_LEN - len(infile)
+                infile += b'0' * nelts
+                dparam.infile = infile
 
-        dparam.decod_format = self._codec_format
+            dparam.decod_format = self._codec_format
+        else:
+            dparam = opj2._dparameters_t.from_buffer_copy(template)
 
         dparam.cp_layer = layer
 
@@ -507,14 +1878,7 @@ class Jp2k(Jp2kBox):
 
         dparam.cp_reduce = reduce
         if area is not None:
-            if area[0] < 0 or area[1] < 0:
-                msg = "Upper left corner coordinates must be nonnegative:  {0}"
-                msg = msg.format(area)
-                raise IOError(msg)
-            if area[2] <= 0 or area[3] <= 0:
-                msg = "Lower right corner coordinates must be positive:  {0}"
-                msg = msg.format(area)
-                raise IOError(msg)
+            _validate_area(area)
             dparam.DA_y0 = area[0]
             dparam.DA_x0 = area[1]
             dparam.DA_y1 = area[2]
@@ -524,83 +1888,196 @@ class Jp2k(Jp2kBox):
             dparam.tile_index = tile
             dparam.nb_tile_to_decode = 1
 
-        with ExitStack() as stack:
-            stream = opj2._stream_create_default_file_stream_v3(self.filename,
-                                                                True)
-            stack.callback(opj2._stream_destroy_v3, stream)
+        return dparam
+
+    def _open_decoder(self, stack, dparam, verbose=False, num_threads=None):
+        """Create a decompression codec and stream and read the image header.
+
+        Parameters
+        ----------
+        stack : ExitStack
+            Resources are released when this stack unwinds.
+        dparam : _dparameters_t
+            Decompression parameters.
+        verbose : bool, optional
+            Print informational messages produced by the OpenJPEG library.
+        num_threads : int, optional
+            Number of threads used by the codec.
+
+        Returns
+        -------
+        codec : _codec_t_p
+            The decompression codec.
+        stream : _stream_t_p
+            The input stream.
+        image : _image_t pointer
+            The image structure initialized by the header.
+        """
+        source = self._describe_source()
+        with span('codec_setup', source):
+            if self._source[0] == 'buffer':
+                memory_stream = MemoryStream(self._source[1])
+                stack.callback(memory_stream.close)
+                stream = memory_stream.stream
+            else:
+                stream = opj2._stream_create_default_file_stream_v3(
+                    self.filename, True)
+                stack.callback(opj2._stream_destroy_v3, stream)
             codec = opj2._create_decompress(self._codec_format)
             stack.callback(opj2._destroy_codec, codec)
 
-            opj2._set_error_handler(codec, _error_callback)
-            opj2._set_warning_handler(codec, _warning_callback)
-            if verbose:
-                opj2._set_info_handler(codec, _info_callback)
-            else:
-                opj2._set_info_handler(codec, None)
+            _set_handlers(codec, verbose)
 
             opj2._setup_decoder(codec, dparam)
+            _set_codec_threads(codec, num_threads)
+
+        with span('read_header', source):
             image = opj2._read_header(stream, codec)
             stack.callback(opj2._image_destroy, image)
 
-            if dparam.nb_tile_to_decode:
-                opj2._get_decoded_tile(codec, stream, image, dparam.tile_index)
-            else:
-                opj2._set_decode_area(codec, image,
-                                      dparam.DA_x0, dparam.DA_y0,
-                                      dparam.DA_x1, dparam.DA_y1)
-                opj2._decode(codec, stream, image)
-                opj2._end_decompress(codec, stream)
+        return codec, stream, image
 
-            component = image.contents.comps[0]
-            if component.sgnd:
-                if component.prec <= 8:
-                    dtype = np.int8
-                elif component.prec <= 16:
-                    dtype = np.int16
-                else:
-                    raise RuntimeError("Unhandled precision, datatype")
-            else:
-                if component.prec <= 8:
-                    dtype = np.uint8
-                elif component.prec <= 16:
-                    dtype = np.uint16
+    def _read_common(self, reduce=0, layer=0, area=None, tile=None,
+                     verbose=False, as_bands=False, out=None,
+                     num_threads=None):
+        """Read a JPEG 2000 image.
+
+        Parameters
+        ----------
+        layer : int, optional
+            Number of quality layer to decode.
+        reduce : int, optional
+            Factor by which to reduce output resolution.
+        area : tuple, optional
+            Specifies decoding image area,
+            (first_row, first_col, last_row, last_col)
+        tile : int, optional
+            Number of tile to decode.
+        verbose : bool, optional
+            Print informational messages produced by the OpenJPEG library.
+        as_bands : bool, optional
+            If true, return the individual 2D components in a list.
+        out : array or sequence of arrays, optional
+            Preallocated destination, a 3D array or, if as_bands is true, a
+            sequence of 2D arrays.  Each component is converted directly into
+            it without an intermediate copy.
+        num_threads : int, optional
+            Number of threads used by the codec.
+
+        Returns
+        -------
+        data : list or array
+            The individual image components or a single array.
+
+        Raises
+        ------
+        IOError
+            If out does not match the shape or datatype of the image.
+        """
+        dparam = self._decoder_parameters(reduce=reduce, layer=layer,
+                                          area=area, tile=tile)
+        return self._decode_image(dparam, verbose=verbose, as_bands=as_bands,
+                                  out=out, num_threads=num_threads)
+
+    def _decode_image(self, dparam, verbose=False, as_bands=False, out=None,
+                      num_threads=None):
+        """Decode an image given fully constructed decompression parameters.
+
+        Parameters
+        ----------
+        dparam : _dparameters_t
+            Decompression parameters.
+        verbose : bool, optional
+            Print informational messages produced by the OpenJPEG library.
+        as_bands : bool, optional
+            If true, return the individual 2D components in a list.
+        out : array or sequence of arrays, optional
+            Preallocated destination.
+        num_threads : int, optional
+            Number of threads used by the codec.
+
+        Returns
+        -------
+        data : list or array
+            The individual image components or a single array.
+        """
+        start = timeit.default_timer()
+        with ExitStack() as stack:
+            codec, stream, image = self._open_decoder(stack, dparam, verbose,
+                                                      num_threads)
+
+            source = self._describe_source()
+            with span('decode', source) as decode_span:
+                if dparam.nb_tile_to_decode:
+                    opj2._get_decoded_tile(codec, stream, image,
+                                           dparam.tile_index)
                 else:
-                    raise RuntimeError("Unhandled precision, datatype")
+                    opj2._set_decode_area(codec, image,
+                                          dparam.DA_x0, dparam.DA_y0,
+                                          dparam.DA_x1, dparam.DA_y1)
+                    opj2._decode(codec, stream, image)
+                    opj2._end_decompress(codec, stream)
+                if decode_span:
+                    # OpenJPEG decodes each component into an int32 buffer.
+                    comps = image.contents.comps
+                    decode_span.nbytes = sum(
+                        4 * comps[k].w * comps[k].h
+                        for k in range(image.contents.numcomps))
+
+            with span('convert', source) as convert_span:
+                dtype = _component2dtype(image.contents.comps[0])
 
-            if as_bands:
-                data = []
-            else:
-                nrows = image.contents.comps[0].h
-                ncols = image.contents.comps[0].w
                 ncomps = image.contents.numcomps
-                data = np.zeros((nrows, ncols, ncomps), dtype)
-
-            for k in range(image.contents.numcomps):
-                component = image.contents.comps[k]
-                nrows = component.h
-                ncols = component.w
-
-                if nrows == 0 or ncols == 0:
-                    # Letting this situation continue would segfault
-                    # Python.
-                    msg = "Component {0} has dimensions {1} x {2}"
-                    msg = msg.format(k, nrows, ncols)
-                    raise IOError(msg)
-
-                addr = ctypes.addressof(component.data.contents)
-                with warnings.catch_warnings():
-                    warnings.simplefilter("ignore")
-                    x = np.ctypeslib.as_array(
-                        (ctypes.c_int32 * nrows * ncols).from_address(addr))
                 if as_bands:
-                    data.append(np.reshape(x.astype(dtype), (nrows, ncols)))
+                    if out is not None and len(out) != ncomps:
+                        msg = "Expected {0} output bands, got {1}."
+                        raise IOError(msg.format(ncomps, len(out)))
+                    data = []
                 else:
-                    data[:, :, k] = np.reshape(x.astype(dtype), (nrows, ncols))
+                    nrows = image.contents.comps[0].h
+                    ncols = image.contents.comps[0].w
+                    if out is None:
+                        data = np.zeros((nrows, ncols, ncomps), dtype)
+                    else:
+                        _validate_output(out, (nrows, ncols, ncomps), dtype)
+                        data = out
+
+                for k in range(image.contents.numcomps):
+                    component = image.contents.comps[k]
+                    nrows = component.h
+                    ncols = component.w
+
+                    if nrows == 0 or ncols == 0:
+                        # Letting this situation continue would segfault
+                        # Python.
+                        msg = "Component {0} has dimensions {1} x {2}"
+                        msg = msg.format(k, nrows, ncols)
+                        raise IOError(msg)
+
+                    x = _component_array(component)
+                    if as_bands:
+                        if out is None:
+                            data.append(x.astype(dtype))
+                        else:
+                            _validate_output(out[k], (nrows, ncols), dtype)
+                            np.copyto(out[k], x, casting='unsafe')
+                            data.append(out[k])
+                    else:
+                        np.copyto(data[:, :, k], x, casting='unsafe')
+                if convert_span:
+                    if as_bands:
+                        convert_span.nbytes = sum(x.nbytes for x in data)
+                    else:
+                        convert_span.nbytes = data.nbytes
+
+            component = image.contents.comps[0]
+            _record_decode(start, dparam.cp_reduce,
+                           component.w * component.h)
 
         return data
 
     def read_bands(self, reduce=0, layer=0, area=None, tile=None,
-                   verbose=False):
+                   verbose=False, out=None, num_threads=None):
         """Read a JPEG 2000 image.
 
         The only time you should use this method is when the image has
@@ -620,11 +2097,18 @@ class Jp2k(Jp2kBox):
             Number of tile to decode.
         verbose : bool, optional
             Print informational messages produced by the OpenJPEG library.
+        out : sequence of arrays, optional
+            Preallocated 2D arrays, one per component, into which the
+            components are decoded.
+        num_threads : int, optional
+            Number of threads used inside the codec, defaults to the value of
+            glymur.get_num_threads.
 
         Returns
         -------
         lst : list
-            The individual image components.
+            The individual image components.  If out was supplied, the list
+            holds its arrays.
 
         See also
         --------
@@ -643,11 +2127,157 @@ class Jp2k(Jp2kBox):
                                 area=area,
                                 tile=tile,
                                 verbose=verbose,
-                                as_bands=True)
+                                as_bands=True,
+                                out=out,
+                                num_threads=num_threads)
 
         return lst
 
-    def get_codestream(self, header_only=True):
+    def decoder(self):
+        """Open a decoding session for repeated reads of the same file.
+
+        The session parses the codestream main header once and reuses it,
+        along with the decompression parameters, for every subsequent read.
+        This lowers the per-call cost of issuing many small area reads.
+
+        Returns
+        -------
+        session : Jp2kDecoder
+            Context manager providing read and read_bands methods.
+
+        Examples
+        --------
+        >>> import glymur
+        >>> import pkg_resources as pkg
+        >>> jfile = pkg.resource_filename(glymur.__name__, "data/nemo.jp2")
+        >>> jp = glymur.Jp2k(jfile)
+        >>> with jp.decoder() as dec:
+        ...     tile1 = dec.read(area=(0, 0, 256, 256))
+        ...     tile2 = dec.read(area=(0, 256, 256, 512), reduce=1)
+        >>> tile2.shape
+        (128, 128, 3)
+        """
+        return Jp2kDecoder(self)
+
+    def iter_tiles(self, reduce=0, layer=0, area=None, verbose=False,
+                   num_threads=None):
+        """Iterate over the tiles of a JPEG 2000 image.
+
+        Tiles are decoded one at a time from a single codec and stream, so
+        memory use is bounded by the size of one tile rather than by the size
+        of the whole image.  If an area is given, only the tiles intersecting
+        that area are decoded, but each such tile is returned in its entirety.
+
+        Parameters
+        ----------
+        layer : int, optional
+            Number of quality layer to decode.
+        reduce : int, optional
+            Factor by which to reduce output resolution.  Use -1 to get the
+            lowest resolution thumbnail.
+        area : tuple, optional
+            Specifies decoding image area,
+            (first_row, first_col, last_row, last_col)
+        verbose : bool, optional
+            Print informational messages produced by the OpenJPEG library.
+        num_threads : int, optional
+            Number of threads used inside the codec, defaults to the value of
+            glymur.get_num_threads.
+
+        Yields
+        ------
+        tile_index : int
+            Index of the decoded tile.
+        extent : tuple
+            Position of the tile within the (possibly reduced) image,
+            (first_row, first_col, last_row, last_col), where the last row
+            and column are exclusive.
+        data : array
+            The tile image data.
+
+        Raises
+        ------
+        IOError
+            If the image has differing subsample factors, or if the decoded
+            tile does not have the expected size.
+
+        Examples
+        --------
+        >>> import glymur
+        >>> import pkg_resources as pkg
+        >>> jfile = pkg.resource_filename(glymur.__name__, "data/nemo.jp2")
+        >>> jp = glymur.Jp2k(jfile)
+        >>> for tidx, extent, tile in jp.iter_tiles(reduce=2):
+        ...     print(tidx, extent, tile.shape)
+        ...     break
+        0 (0, 0, 128, 128) (128, 128, 3)
+        """
+        self._check_subsampling()
+
+        dparam = self._decoder_parameters(reduce=reduce, layer=layer,
+                                          area=area)
+        reduce = dparam.cp_reduce
+
+        with ExitStack() as stack:
+            codec, stream, image = self._open_decoder(stack, dparam, verbose,
+                                                      num_threads)
+            source = self._describe_source()
+            if area is not None:
+                # OpenJPEG skips the tiles outside of the decode area, but
+                # only decodes the part of a tile inside of it.  Widen the
+                # area to whole tiles so that each tile is decoded in full.
+                siz = self.get_codestream(header_only=True).segment[1]
+                y0, x0, y1, x1 = _AreaPartition(siz, area, reduce).tile_area()
+                opj2._set_decode_area(codec, image, x0, y0, x1, y1)
+
+            dtype = _component2dtype(image.contents.comps[0])
+            dx = image.contents.comps[0].dx
+            dy = image.contents.comps[0].dy
+
+            # Origin of the image on the reduced resolution canvas.
+            scale = 1 << reduce
+            img_x0 = _ceildiv(_ceildiv(image.contents.x0, dx), scale)
+            img_y0 = _ceildiv(_ceildiv(image.contents.y0, dy), scale)
+
+            while True:
+                (tidx, data_size, x0, y0, x1, y1,
+                 ncomps, go_on) = opj2._read_tile_header(codec, stream)
+                if not go_on:
+                    break
+
+                # Tile-component bounds on the reduced resolution canvas.
+                col0 = _ceildiv(_ceildiv(x0, dx), scale)
+                row0 = _ceildiv(_ceildiv(y0, dy), scale)
+                col1 = _ceildiv(_ceildiv(x1, dx), scale)
+                row1 = _ceildiv(_ceildiv(y1, dy), scale)
+                nrows = row1 - row0
+                ncols = col1 - col0
+
+                buffer = np.empty(data_size, dtype=np.uint8)
+                start = timeit.default_timer()
+                with span('decode', source, data_size):
+                    opj2._decode_tile_data(codec, tidx, buffer, data_size,
+                                           stream)
+                _record_decode(start, reduce, nrows * ncols)
+
+                tile = buffer.view(dtype)
+                if tile.size != nrows * ncols * ncomps:
+                    msg = "Tile {0} has unexpected size ({1} bytes)."
+                    msg = msg.format(tidx, data_size)
+                    raise IOError(msg)
+
+                # OpenJPEG lays out the tile data component by component.
+                tile = tile.reshape(ncomps, nrows, ncols).transpose(1, 2, 0)
+                if ncomps == 1:
+                    tile = tile[:, :, 0]
+
+                extent = (row0 - img_y0, col0 - img_x0,
+                          row1 - img_y0, col1 - img_x0)
+                yield tidx, extent, tile
+
+            opj2._end_decompress(codec, stream)
+
+    def get_codestream(self, header_only=True, compact=False):
         """Returns a codestream object.
 
         Parameters
@@ -655,6 +2285,10 @@ class Jp2k(Jp2kBox):
         header_only : bool, optional
             If True, only marker segments in the main header are parsed.
             Supplying False may impose a large performance penalty.
+        compact : bool, optional
+            If True, a full parse collects the SOP and EPH packet markers into
+            the codestream's packets table rather than creating a segment
+            object for each one, which is much faster for large codestreams.
 
         Returns
         -------
@@ -683,20 +2317,225 @@ class Jp2k(Jp2kBox):
         IOError
             If the file is JPX with more than one codestream.
         """
-        with open(self.filename, 'rb') as fp:
-            if self._codec_format == opj2._CODEC_J2K:
-                codestream = Codestream(fp, header_only=header_only)
+        self._verify_handle()
+
+        # The main header is parsed once and shared.
+        cache_header = header_only and not compact
+        if cache_header and self._header is not None:
+            return self._header
+
+        name = 'parse_header' if header_only else 'parse_codestream'
+        with span(name, self._describe_source()) as parse_span:
+            with open_source(self._source) as fp:
+                offset = self._codestream_offset(fp)
+                fp.seek(offset)
+                codestream = Codestream(fp, header_only=header_only,
+                                        compact=compact)
+                nbytes = fp.tell() - offset
+                parse_span.nbytes = nbytes
+        metrics.BYTES_PARSED.inc(nbytes, kind='codestream')
+
+        if cache_header:
+            self._header = codestream
+        return codestream
+
+    def _codestream_offset(self, fp):
+        """Locate the start of the codestream, i.e. its SOC marker.
+
+        Parameters
+        ----------
+        fp : BufferFile
+            The opened source.
+
+        Raises
+        ------
+        RuntimeError
+            If a JP2 file does not have exactly one codestream box.
+        """
+        if self._jp2c_offset is None:
+            box = [x for x in self.box if x.id == 'jp2c']
+            if len(box) != 1:
+                msg = "JP2 files must have a single codestream."
+                raise RuntimeError(msg)
+            fp.seek(box[0].offset)
+            buffer = fp.read(8)
+            (L, T) = struct.unpack('>I4s', buffer)
+            if L == 1:
+                # Skip past the XL field.
+                self._jp2c_offset = box[0].offset + 16
             else:
-                box = [x for x in self.box if x.id == 'jp2c']
-                if len(box) != 1:
-                    msg = "JP2 files must have a single codestream."
-                    raise RuntimeError(msg)
-                fp.seek(box[0].offset)
-                buffer = fp.read(8)
-                (L, T) = struct.unpack('>I4s', buffer)
-                if L == 1:
-                    # Seek past the XL field.
-                    buffer = fp.read(8)
-                codestream = Codestream(fp, header_only=header_only)
-
-            return codestream
+                self._jp2c_offset = box[0].offset + 8
+        return self._jp2c_offset
+
+
+def _file_stat(filename):
+    """Modification time and size identifying the version of a file."""
+    st = os.stat(filename)
+    return (st.st_mtime, st.st_size)
+
+
+def _rebuild_jp2k(state):
+    """Unpickle a Jp2k handle without touching the file.
+
+    Parameters
+    ----------
+    state : dict
+        As produced by Jp2k.__reduce__.
+    """
+    jp2 = Jp2k.__new__(Jp2k)
+    jp2._restore_state(state['source'], state)
+    jp2._verify_stat = state['stat'] is not None
+    return jp2
+
+
+class Jp2kDecoder:
+    """Decoding session over a single JPEG 2000 file.
+
+    Obtain one with Jp2k.decoder.  The codestream main header is parsed only
+    once when the session is opened, and the OpenJPEG decompression
+    parameters are built only once, so that each read only needs to create
+    its codec and stream.
+
+    Attributes
+    ----------
+    jp2k : Jp2k
+        The file being decoded.
+    codestream : Codestream
+        Main header of the codestream.
+    shape : tuple
+        Full resolution image dimensions (rows, columns, components).
+    """
+    def __init__(self, jp2k):
+        self.jp2k = jp2k
+        self.codestream = jp2k.get_codestream(header_only=True)
+        siz = self.codestream.segment[1]
+        self.shape = _image_shape(siz)
+
+        dxs = np.array(siz.XRsiz)
+        dys = np.array(siz.YRsiz)
+        self._same_subsampling = not (np.any(dxs - dxs[0]) or
+                                      np.any(dys - dys[0]))
+        self._lowest_reduce = self.codestream.segment[2].SPcod[4]
+        self._dparam = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Release the cached decompression parameters."""
+        self._dparam = None
+
+    def _parameters(self, reduce=0, layer=0, area=None, tile=None):
+        """Build decompression parameters from the cached template."""
+        if self._dparam is None:
+            self._dparam = self.jp2k._decoder_parameters()
+        if reduce == -1:
+            reduce = self._lowest_reduce
+        return self.jp2k._decoder_parameters(reduce=reduce, layer=layer,
+                                             area=area, tile=tile,
+                                             template=self._dparam)
+
+    def read(self, reduce=0, layer=0, area=None, tile=None, verbose=False,
+             out=None, num_threads=None):
+        """Read image data.  See Jp2k.read for the parameters.
+
+        Raises
+        ------
+        IOError
+            If the image has differing subsample factors.
+        """
+        if not self._same_subsampling:
+            msg = "Components must all have the same subsampling factors."
+            raise IOError(msg)
+
+        out3d = out
+        if out is not None and out.ndim == 2:
+            out3d = out[:, :, np.newaxis]
+
+        dparam = self._parameters(reduce=reduce, layer=layer, area=area,
+                                  tile=tile)
+        data = self.jp2k._decode_image(dparam, verbose=verbose, out=out3d,
+                                       num_threads=num_threads)
+
+        if out is not None:
+            return out
+
+        if data.shape[2] == 1:
+            data = data.view()
+            data.shape = data.shape[0:2]
+
+        return data
+
+    def read_bands(self, reduce=0, layer=0, area=None, tile=None,
+                   verbose=False, out=None, num_threads=None):
+        """Read individual image components.  See Jp2k.read_bands for the
+        parameters.
+        """
+        dparam = self._parameters(reduce=reduce, layer=layer, area=area,
+                                  tile=tile)
+        return self.jp2k._decode_image(dparam, verbose=verbose, as_bands=True,
+                                       out=out, num_threads=num_threads)
+
+
+def encode(data, codec='jp2', colorspace=None, verbose=False,
+           num_threads=None, **kwargs):
+    """Encode image data into JPEG 2000 bytes without touching the disk.
+
+    The codestream is written through an OpenJPEG output stream into a
+    growable in-memory buffer.
+
+    Parameters
+    ----------
+    data : array
+        Image data to be encoded.
+    codec : str, optional
+        Either 'jp2' or 'j2k'.
+    colorspace : str, optional
+        Either 'rgb' or 'gray'.  Not allowed with 'j2k'.
+    verbose : bool, optional
+        Print informational messages produced by the OpenJPEG library.
+    num_threads : int, optional
+        Number of threads used inside the codec, defaults to the value of
+        glymur.get_num_threads.
+    kwargs : optional
+        Any of the remaining encoding parameters of Jp2k.write, i.e. cbsize,
+        cratios, eph, grid_offset, modesw, numres, prog, psnr, psizes, sop,
+        subsam or tilesize.
+
+    Returns
+    -------
+    buffer : bytes
+        The encoded JP2 file or J2K codestream.
+
+    Raises
+    ------
+    IOError
+        If the codec is not recognized.
+
+    Examples
+    --------
+    >>> import glymur
+    >>> import numpy as np
+    >>> data = np.zeros((64, 64), dtype=np.uint8)
+    >>> buffer = glymur.encode(data, codec='j2k', cratios=[20])
+    >>> jp = glymur.Jp2k.from_bytes(buffer)
+    """
+    codecs = {'jp2': opj2._CODEC_JP2, 'j2k': opj2._CODEC_J2K}
+    try:
+        codec_fmt = codecs[codec.lower()]
+    except KeyError:
+        msg = 'Invalid codec "{0}", must be one of {1}.'
+        raise IOError(msg.format(codec, sorted(codecs.keys())))
+
+    cparams = _encoder_parameters(codec_fmt, **kwargs)
+    image = _create_image(data, cparams, codec_fmt, colorspace, '<memory>')
+    try:
+        with MemoryStream() as strm:
+            _compress(image, cparams, codec_fmt, strm.stream, verbose,
+                      num_threads, '<memory>')
+            return strm.getvalue()
+    finally:
+        opj2._image_destroy(image)
@@ -1,3 +1,2 @@
 """This package organizes individual libraries employed by glymur."""
 from . import openjp2
-from . import test
@@ -3,15 +3,73 @@ Wraps individual functions in openjp2 library.
 """
 
 import ctypes
+import threading
 
 import numpy as np
 
-from .. import _OPENJP2
+from .. import _config
 from ..core import LRCP, RLCP, RPCL, PCRL, CPRL
 
 
+class _Library:
+    """The OpenJPEG library, loaded on first use.
+
+    Finding and loading the shared library and declaring the argument types
+    of its functions is deferred until a function is first looked up, so
+    that importing glymur stays cheap.
+    """
+    def __init__(self):
+        self._cdll = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Return the library, or None if it could not be loaded."""
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    cdll = _config()
+                    if cdll is not None:
+                        _set_argtypes(cdll)
+                    self._cdll = cdll
+                    self._loaded = True
+        return self._cdll
+
+    def reset(self):
+        """Forget the library, so that the next use loads it again."""
+        with self._lock:
+            self._cdll = None
+            self._loaded = False
+
+    def __getattr__(self, name):
+        cdll = self.load()
+        if cdll is None:
+            msg = "The OpenJPEG library could not be loaded."
+            raise RuntimeError(msg)
+        return getattr(cdll, name)
+
+
+_OPENJP2 = _Library()
+
+
+def _library():
+    """Return the OpenJPEG library, or None if it is not available.
+
+    The library is loaded by the first call.
+    """
+    return _OPENJP2.load()
+
+
+# Error messages from handlers that were not given a codec as their client
+# data.
 _ERROR_MSG_LST = []
 
+# Error messages from handlers that were given a codec as their client data,
+# keyed by the codec, so that concurrent codecs cannot see each other's
+# errors.  Entries live from the creation to the destruction of the codec.
+_CODEC_ERRORS = {}
+_ERROR_LOCK = threading.Lock()
+
 # Map certain atomic OpenJPEG datatypes to the ctypes equivalents.
 _bool_t = ctypes.c_int32
 _codec_t_p = ctypes.c_void_p
@@ -20,6 +78,19 @@ _cinema_mode_t = ctypes.c_int32
 _rsiz_capabilities_t = ctypes.c_int32
 _stream_t_p = ctypes.c_void_p
 
+# Callbacks for user-defined streams.
+_stream_read_fn_t = ctypes.CFUNCTYPE(ctypes.c_size_t, ctypes.c_void_p,
+                                     ctypes.c_size_t, ctypes.c_void_p)
+_stream_write_fn_t = ctypes.CFUNCTYPE(ctypes.c_size_t, ctypes.c_void_p,
+                                      ctypes.c_size_t, ctypes.c_void_p)
+_stream_skip_fn_t = ctypes.CFUNCTYPE(ctypes.c_int64, ctypes.c_int64,
+                                     ctypes.c_void_p)
+_stream_seek_fn_t = ctypes.CFUNCTYPE(_bool_t, ctypes.c_int64,
+                                     ctypes.c_void_p)
+
+# Default buffer size of user-defined streams (OPJ_J2K_STREAM_CHUNK_SIZE).
+_STREAM_CHUNK_SIZE = 0x100000
+
 _PATH_LEN = 4096
 _J2K_MAXRLVLS = 33
 _J2K_MAXBANDS = (3 * _J2K_MAXRLVLS - 2)
@@ -526,57 +597,64 @@ class _codestream_info_v2_t(ctypes.Structure):
         # information regarding tiles inside of image
         ("tile_info",             ctypes.POINTER(_tile_info_v2_t))]
 
-# Restrict the input and output argument types for each function used in the
-# API.
-if _OPENJP2 is not None:
-    _OPENJP2.opj_create_compress.argtypes = [_codec_format_t]
-    _OPENJP2.opj_create_compress.restype = _codec_t_p
 
-    _OPENJP2.opj_create_decompress.argtypes = [_codec_format_t]
-    _OPENJP2.opj_create_decompress.restype = _codec_t_p
+def _set_argtypes(lib):
+    """Restrict the input and output argument types for each function used in
+    the API.
+
+    Parameters
+    ----------
+    lib : ctypes.CDLL
+        The newly loaded library.
+    """
+    lib.opj_create_compress.argtypes = [_codec_format_t]
+    lib.opj_create_compress.restype = _codec_t_p
+
+    lib.opj_create_decompress.argtypes = [_codec_format_t]
+    lib.opj_create_decompress.restype = _codec_t_p
 
     _argtypes = [_codec_t_p, _stream_t_p, ctypes.POINTER(_image_t)]
-    _OPENJP2.opj_decode.argtypes = _argtypes
+    lib.opj_decode.argtypes = _argtypes
 
     _argtypes = [_codec_t_p, ctypes.c_uint32,
                  ctypes.POINTER(ctypes.c_uint8),
                  ctypes.c_uint32,
                  _stream_t_p]
-    _OPENJP2.opj_decode_tile_data.argtypes = _argtypes
+    lib.opj_decode_tile_data.argtypes = _argtypes
 
     _argtypes = [ctypes.POINTER(ctypes.POINTER(_codestream_info_v2_t))]
-    _OPENJP2.opj_destroy_cstr_info.argtypes = _argtypes
-    _OPENJP2.opj_destroy_cstr_info.restype = ctypes.c_void_p
+    lib.opj_destroy_cstr_info.argtypes = _argtypes
+    lib.opj_destroy_cstr_info.restype = ctypes.c_void_p
 
     _argtypes = [_codec_t_p, _stream_t_p]
-    _OPENJP2.opj_encode.argtypes = _argtypes
+    lib.opj_encode.argtypes = _argtypes
 
-    _OPENJP2.opj_get_cstr_info.argtypes = [_codec_t_p]
-    _OPENJP2.opj_get_cstr_info.restype = ctypes.POINTER(_codestream_info_v2_t)
+    lib.opj_get_cstr_info.argtypes = [_codec_t_p]
+    lib.opj_get_cstr_info.restype = ctypes.POINTER(_codestream_info_v2_t)
 
     _argtypes = [_codec_t_p,
                  _stream_t_p,
                  ctypes.POINTER(_image_t),
                  ctypes.c_uint32]
-    _OPENJP2.opj_get_decoded_tile.argtypes = _argtypes
+    lib.opj_get_decoded_tile.argtypes = _argtypes
 
     _argtypes = [ctypes.c_uint32,
                  ctypes.POINTER(_image_comptparm_t),
                  color_space_t]
-    _OPENJP2.opj_image_create.argtypes = _argtypes
-    _OPENJP2.opj_image_create.restype = ctypes.POINTER(_image_t)
+    lib.opj_image_create.argtypes = _argtypes
+    lib.opj_image_create.restype = ctypes.POINTER(_image_t)
 
     _argtypes = [ctypes.c_uint32,
                  ctypes.POINTER(_image_comptparm_t),
                  color_space_t]
-    _OPENJP2.opj_image_tile_create.argtypes = _argtypes
-    _OPENJP2.opj_image_tile_create.restype = ctypes.POINTER(_image_t)
+    lib.opj_image_tile_create.argtypes = _argtypes
+    lib.opj_image_tile_create.restype = ctypes.POINTER(_image_t)
 
-    _OPENJP2.opj_image_destroy.argtypes = [ctypes.POINTER(_image_t)]
+    lib.opj_image_destroy.argtypes = [ctypes.POINTER(_image_t)]
 
     _argtypes = [_stream_t_p, _codec_t_p,
                  ctypes.POINTER(ctypes.POINTER(_image_t))]
-    _OPENJP2.opj_read_header.argtypes = _argtypes
+    lib.opj_read_header.argtypes = _argtypes
 
     _argtypes = [_codec_t_p,
                  _stream_t_p,
@@ -588,69 +666,146 @@ if _OPENJP2 is not None:
                  ctypes.POINTER(ctypes.c_int32),
                  ctypes.POINTER(ctypes.c_uint32),
                  ctypes.POINTER(_bool_t)]
-    _OPENJP2.opj_read_tile_header.argtypes = _argtypes
+    lib.opj_read_tile_header.argtypes = _argtypes
 
     _argtypes = [_codec_t_p, ctypes.POINTER(_image_t), ctypes.c_int32,
                  ctypes.c_int32, ctypes.c_int32, ctypes.c_int32]
-    _OPENJP2.opj_set_decode_area.argtypes = _argtypes
+    lib.opj_set_decode_area.argtypes = _argtypes
 
     _argtypes = [ctypes.POINTER(_cparameters_t)]
-    _OPENJP2.opj_set_default_encoder_parameters.argtypes = _argtypes
+    lib.opj_set_default_encoder_parameters.argtypes = _argtypes
 
     _argtypes = [ctypes.POINTER(_dparameters_t)]
-    _OPENJP2.opj_set_default_decoder_parameters.argtypes = _argtypes
+    lib.opj_set_default_decoder_parameters.argtypes = _argtypes
 
     _argtypes = [_codec_t_p, ctypes.c_void_p, ctypes.c_void_p]
-    _OPENJP2.opj_set_error_handler.argtypes = _argtypes
-    _OPENJP2.opj_set_info_handler.argtypes = _argtypes
-    _OPENJP2.opj_set_warning_handler.argtypes = _argtypes
+    lib.opj_set_error_handler.argtypes = _argtypes
+    lib.opj_set_info_handler.argtypes = _argtypes
+    lib.opj_set_warning_handler.argtypes = _argtypes
 
     _argtypes = [_codec_t_p, ctypes.POINTER(_dparameters_t)]
-    _OPENJP2.opj_setup_decoder.argtypes = _argtypes
+    lib.opj_setup_decoder.argtypes = _argtypes
 
     _argtypes = [_codec_t_p,
                  ctypes.POINTER(_cparameters_t),
                  ctypes.POINTER(_image_t)]
-    _OPENJP2.opj_setup_encoder.argtypes = _argtypes
+    lib.opj_setup_encoder.argtypes = _argtypes
 
     _argtypes = [ctypes.c_char_p, ctypes.c_int32]
-    _OPENJP2.opj_stream_create_default_file_stream_v3.argtypes = _argtypes
-    _OPENJP2.opj_stream_create_default_file_stream_v3.restype = _stream_t_p
+    lib.opj_stream_create_default_file_stream_v3.argtypes = _argtypes
+    lib.opj_stream_create_default_file_stream_v3.restype = _stream_t_p
+
+    _argtypes = [ctypes.c_size_t, _bool_t]
+    lib.opj_stream_create.argtypes = _argtypes
+    lib.opj_stream_create.restype = _stream_t_p
+
+    _argtypes = [_stream_t_p, _stream_read_fn_t]
+    lib.opj_stream_set_read_function.argtypes = _argtypes
+
+    _argtypes = [_stream_t_p, _stream_write_fn_t]
+    lib.opj_stream_set_write_function.argtypes = _argtypes
+
+    _argtypes = [_stream_t_p, _stream_skip_fn_t]
+    lib.opj_stream_set_skip_function.argtypes = _argtypes
+
+    _argtypes = [_stream_t_p, _stream_seek_fn_t]
+    lib.opj_stream_set_seek_function.argtypes = _argtypes
+
+    _argtypes = [_stream_t_p, ctypes.c_uint64]
+    lib.opj_stream_set_user_data_length.argtypes = _argtypes
 
     _argtypes = [_codec_t_p, ctypes.POINTER(_image_t), _stream_t_p]
-    _OPENJP2.opj_start_compress.argtypes = _argtypes
+    lib.opj_start_compress.argtypes = _argtypes
 
-    _OPENJP2.opj_end_compress.argtypes = [_codec_t_p, _stream_t_p]
-    _OPENJP2.opj_end_decompress.argtypes = [_codec_t_p, _stream_t_p]
+    lib.opj_end_compress.argtypes = [_codec_t_p, _stream_t_p]
+    lib.opj_end_decompress.argtypes = [_codec_t_p, _stream_t_p]
 
-    _OPENJP2.opj_stream_destroy_v3.argtypes = [_stream_t_p]
-    _OPENJP2.opj_destroy_codec.argtypes = [_codec_t_p]
+    lib.opj_stream_destroy_v3.argtypes = [_stream_t_p]
+    lib.opj_destroy_codec.argtypes = [_codec_t_p]
 
     _argtypes = [_codec_t_p,
                  ctypes.c_uint32,
                  ctypes.POINTER(ctypes.c_uint8),
                  ctypes.c_uint32,
                  _stream_t_p]
-    _OPENJP2.opj_write_tile.argtypes = _argtypes
+    lib.opj_write_tile.argtypes = _argtypes
+
+    lib.opj_version.restype = ctypes.c_char_p
 
+    # Multithreaded encoding and decoding only came with later versions of
+    # the library, so only use it if the symbol is there.
+    if hasattr(lib, 'opj_codec_set_threads'):
+        lib.opj_codec_set_threads.argtypes = [_codec_t_p, ctypes.c_int]
+        lib.opj_codec_set_threads.restype = _bool_t
 
-def _check_error(status):
-    """Set a generic function as the restype attribute of all OpenJPEG
-    functions that return a _bool_t value.  This way we do not have to check
-    for error status in each wrapping function and an exception will always be
-    appropriately raised.
+    for fcn in _fcns:
+        attr = getattr(lib, fcn)
+        attr.restype = _bool_t
+        attr.errcheck = _errcheck
+
+
+def _pop_error_messages(codec=None):
+    """Remove and return the error messages recorded for a codec.
+
+    Parameters
+    ----------
+    codec : _codec_t_p, optional
+        The codec.  If it is not registered, the messages of handlers without
+        client data are returned instead.
+
+    Returns
+    -------
+    messages : list
+        The messages in the order they were reported.
     """
     global _ERROR_MSG_LST
-    if status != 1:
-        if len(_ERROR_MSG_LST) > 0:
-            # clear out the existing error message so that we don't pick up
-            # a bad one next time around.
-            msg = '\n'.join(_ERROR_MSG_LST)
+    with _ERROR_LOCK:
+        if codec in _CODEC_ERRORS:
+            messages = _CODEC_ERRORS[codec]
+            _CODEC_ERRORS[codec] = []
+        else:
+            messages = _ERROR_MSG_LST
             _ERROR_MSG_LST = []
-            raise IOError(msg)
+    return messages
+
+
+def _check_error(status, codec=None):
+    """Raise an exception if an OpenJPEG function failed.
+
+    The error messages recorded for the codec are consumed, so that they are
+    not picked up by a later failure.
+
+    Parameters
+    ----------
+    status : int
+        Status returned by the library function.
+    codec : _codec_t_p, optional
+        The codec the function operated on.
+
+    Raises
+    ------
+    IOError
+        If the status is not 1.
+    """
+    if status != 1:
+        messages = _pop_error_messages(codec)
+        if len(messages) > 0:
+            raise IOError('\n'.join(messages))
         else:
             raise IOError("OpenJPEG function failure.")
 
+
+# Position of the codec among the arguments of the functions below, if not
+# first.
+_CODEC_ARGUMENT = {'opj_read_header': 1}
+
+
+def _errcheck(status, fcn, arguments):
+    """Check the status of a library function, see _check_error."""
+    codec = arguments[_CODEC_ARGUMENT.get(fcn.__name__, 0)]
+    _check_error(status, codec)
+    return status
+
 # These library functions all return an error status.  Circumvent that and
 # force # them to raise an exception.
 _fcns = ['opj_decode', 'opj_decode_tile_data', 'opj_end_compress',
@@ -660,10 +815,41 @@ _fcns = ['opj_decode', 'opj_decode_tile_data', 'opj_end_compress',
          'opj_set_warning_handler',
          'opj_setup_decoder', 'opj_setup_encoder', 'opj_start_compress',
          'opj_write_tile']
-if _OPENJP2 is not None:
-    for _fcn in _fcns:
-        _attr = getattr(_OPENJP2, _fcn)
-        setattr(_attr, 'restype', _check_error)
+
+
+def _has_thread_support():
+    """Return True if codecs can use several threads.
+
+    Multithreaded encoding and decoding only came with later versions of the
+    library, so only use it if the symbol is there.
+    """
+    lib = _library()
+    return lib is not None and hasattr(lib, 'opj_codec_set_threads')
+
+
+def _codec_set_threads(codec, num_threads):
+    """Wraps openjp2 library function opj_codec_set_threads.
+
+    Sets the number of threads a codec uses internally.  Should be called
+    after setting up the codec and before reading the header or starting
+    compression.
+
+    Parameters
+    ----------
+    codec : _codec_t_p
+        The codec.
+    num_threads : int
+        Number of threads.
+
+    Returns
+    -------
+    success : bool
+        False if the library lacks thread support or the codec does not
+        support multithreading, in which case it stays single-threaded.
+    """
+    if not _has_thread_support():
+        return False
+    return bool(_OPENJP2.opj_codec_set_threads(codec, int(num_threads)))
 
 
 def _create_compress(codec_format):
@@ -681,6 +867,7 @@ def _create_compress(codec_format):
     codec :  Reference to _codec_t_p instance.
     """
     codec = _OPENJP2.opj_create_compress(codec_format)
+    _register_codec(codec)
     return codec
 
 
@@ -753,6 +940,7 @@ def _create_decompress(codec_format):
     codec : Reference to _codec_t_p instance.
     """
     codec = _OPENJP2.opj_create_decompress(codec_format)
+    _register_codec(codec)
     return codec
 
 
@@ -767,6 +955,8 @@ def _destroy_codec(codec):
         Decompressor handle to destroy.
     """
     _OPENJP2.opj_destroy_codec(codec)
+    with _ERROR_LOCK:
+        _CODEC_ERRORS.pop(codec, None)
 
 
 def _encode(codec, stream):
@@ -1242,6 +1432,102 @@ def _start_compress(codec, image, stream):
     _OPENJP2.opj_start_compress(codec, image, stream)
 
 
+def _stream_create(buffer_size, is_input):
+    """Wraps openjp2 library function opj_stream_create.
+
+    Creates a stream without any data source or sink.  The read or write,
+    skip and seek functions must be set before the stream is used.
+
+    Parameters
+    ----------
+    buffer_size : int
+        Size of the internal buffer of the stream.
+    is_input : bool
+        True (read) or False (write)
+
+    Returns
+    -------
+    stream : _stream_t_p
+        An OpenJPEG stream.
+    """
+    tf = 1 if is_input else 0
+    stream = _OPENJP2.opj_stream_create(buffer_size, tf)
+    return stream
+
+
+def _stream_set_read_function(stream, read_function):
+    """Wraps openjp2 library function opj_stream_set_read_function.
+
+    Parameters
+    ----------
+    stream : _stream_t_p
+        The stream.
+    read_function : _stream_read_fn_t
+        Callback that copies up to the requested number of bytes into the
+        given buffer and returns the number copied, or -1 at end of stream.
+        The caller must keep a reference to it for the life of the stream.
+    """
+    _OPENJP2.opj_stream_set_read_function(stream, read_function)
+
+
+def _stream_set_write_function(stream, write_function):
+    """Wraps openjp2 library function opj_stream_set_write_function.
+
+    Parameters
+    ----------
+    stream : _stream_t_p
+        The stream.
+    write_function : _stream_write_fn_t
+        Callback that consumes the given number of bytes from the given
+        buffer and returns the number consumed.  The caller must keep a
+        reference to it for the life of the stream.
+    """
+    _OPENJP2.opj_stream_set_write_function(stream, write_function)
+
+
+def _stream_set_skip_function(stream, skip_function):
+    """Wraps openjp2 library function opj_stream_set_skip_function.
+
+    Parameters
+    ----------
+    stream : _stream_t_p
+        The stream.
+    skip_function : _stream_skip_fn_t
+        Callback that moves the position by the given number of bytes and
+        returns the number of bytes skipped, or -1 upon failure.  The caller
+        must keep a reference to it for the life of the stream.
+    """
+    _OPENJP2.opj_stream_set_skip_function(stream, skip_function)
+
+
+def _stream_set_seek_function(stream, seek_function):
+    """Wraps openjp2 library function opj_stream_set_seek_function.
+
+    Parameters
+    ----------
+    stream : _stream_t_p
+        The stream.
+    seek_function : _stream_seek_fn_t
+        Callback that moves to the given absolute position and returns true
+        upon success.  The caller must keep a reference to it for the life
+        of the stream.
+    """
+    _OPENJP2.opj_stream_set_seek_function(stream, seek_function)
+
+
+def _stream_set_user_data_length(stream, length):
+    """Wraps openjp2 library function opj_stream_set_user_data_length.
+
+    Parameters
+    ----------
+    stream : _stream_t_p
+        The stream.
+    length : int
+        Total number of bytes available from an input stream.
+    """
+    _OPENJP2.opj_stream_set_user_data_length(stream, length)
+
+
 def _stream_create_default_file_stream_v3(fname, a_read_stream):
     """Wraps openjp2 library function opj_stream_create_default_vile_stream_v3.
 
@@ -1278,6 +1564,17 @@ def _stream_destroy_v3(stream):
     _OPENJP2.opj_stream_destroy_v3(stream)
 
 
+def _version():
+    """Wraps openjp2 library function opj_version.
+
+    Returns
+    -------
+    version : str
+        Version of the OpenJPEG library, e.g. '2.0.0'.
+    """
+    return _OPENJP2.opj_version().decode('utf-8')
+
+
 def _write_tile(codec, tile_index, data, data_size, stream):
     """Wraps openjp2 library function opj_write_tile.
 
@@ -1309,7 +1606,26 @@ def _write_tile(codec, tile_index, data, data_size, stream):
                             stream)
 
 
-def _set_error_message(msg):
-    """The openjpeg error handler has recorded an error message."""
-    global _ERROR_MSG_LST
-    _ERROR_MSG_LST.append(msg)
+def _register_codec(codec):
+    """Start recording the error messages of a new codec."""
+    if codec is not None:
+        with _ERROR_LOCK:
+            _CODEC_ERRORS[codec] = []
+
+
+def _set_error_message(msg, codec=None):
+    """The openjpeg error handler has recorded an error message.
+
+    Parameters
+    ----------
+    msg : str
+        The message.
+    codec : _codec_t_p, optional
+        The client data the handler was registered with.  Messages for a
+        registered codec are kept apart from all others.
+    """
+    with _ERROR_LOCK:
+        if codec in _CODEC_ERRORS:
+            _CODEC_ERRORS[codec].append(msg)
+        else:
+            _ERROR_MSG_LST.append(msg)
@@ -43,6 +43,26 @@ class TestOpenJP2(unittest.TestCase):
 
         self.assertEqual(cparams.irreversible, 0)
 
+    def test_error_messages_per_codec(self):
+        # Messages reported with a codec as client data stay with it.
+        opj2 = glymur.lib.openjp2
+        self.addCleanup(opj2._CODEC_ERRORS.clear)
+        opj2._register_codec(1)
+        opj2._register_codec(2)
+        opj2._set_error_message('first', 1)
+        opj2._set_error_message('second', 2)
+        opj2._set_error_message('unknown', None)
+
+        with self.assertRaises(IOError) as cm:
+            opj2._check_error(0, 2)
+        self.assertEqual(str(cm.exception), 'second')
+        with self.assertRaises(IOError) as cm:
+            opj2._check_error(0, 2)
+        self.assertEqual(str(cm.exception), 'OpenJPEG function failure.')
+        self.assertIsNone(opj2._check_error(1, 1))
+        self.assertEqual(opj2._pop_error_messages(1), ['first'])
+        self.assertEqual(opj2._pop_error_messages(), ['unknown'])
+
     def test_set_default_decoder_parameters(self):
         dparams = glymur.lib.openjp2._set_default_decoder_parameters()
 
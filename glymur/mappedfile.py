@@ -0,0 +1,204 @@
+"""Memory-mapped file access for parsing JPEG 2000 boxes and marker segments.
+
+Parsing touches many tiny fields.  Reading them through a memory map turns
+each of those reads into a slice of the mapping rather than a system call,
+and fixed-size fields are unpacked in place with precompiled structs.  Images
+that are already in memory are parsed the same way, directly from their
+buffer.
+
+License:  MIT
+"""
+import mmap
+import os
+
+import numpy as np
+
+
+class BufferFile:
+    """Read-only, file-like view of an in-memory buffer.
+
+    Supports the subset of the file object interface used by the box and
+    codestream parsers, i.e. read, seek, and tell, plus in-place unpacking of
+    precompiled structs.
+
+    Attributes
+    ----------
+    source : tuple
+        Describes where the bytes come from, see open_source.
+    size : int
+        Size of the buffer in bytes.
+    """
+    def __init__(self, data):
+        self.source = ('buffer', data)
+        self.size = len(data)
+        self._map = data
+        self._pos = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Release the buffer."""
+        self._map = b''
+
+    def read(self, n=-1):
+        """Read up to n bytes, or everything remaining if n is negative."""
+        start = self._pos
+        if n is None or n < 0:
+            stop = self.size
+        else:
+            stop = min(start + n, self.size)
+        self._pos = max(start, stop)
+        return bytes(self._map[start:stop])
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        """Change the stream position."""
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += self.size
+        self._pos = offset
+        return self._pos
+
+    def tell(self):
+        """Return the current stream position."""
+        return self._pos
+
+    def unpack(self, fmt):
+        """Unpack a struct at the current position and advance past it.
+
+        Parameters
+        ----------
+        fmt : struct.Struct
+            Precompiled structure.
+
+        Returns
+        -------
+        values : tuple
+            The unpacked values.
+
+        Raises
+        ------
+        struct.error
+            If there are too few bytes remaining.
+        """
+        values = fmt.unpack_from(self._map, self._pos)
+        self._pos += fmt.size
+        return values
+
+    def view(self, n):
+        """View up to n bytes as a uint8 array without copying them.
+
+        The view must be released before the file is closed.
+        """
+        start = self._pos
+        count = max(min(n, self.size - start), 0)
+        self._pos = start + count
+        if count == 0:
+            return np.zeros(0, dtype=np.uint8)
+        return np.frombuffer(self._map, dtype=np.uint8, count=count,
+                             offset=start)
+
+
+class MappedFile(BufferFile):
+    """Read-only, file-like view of a memory-mapped file.
+
+    Attributes
+    ----------
+    name : str
+        Path to the file.
+    source : tuple
+        Describes where the bytes come from, see open_source.
+    size : int
+        Size of the file in bytes.
+    """
+    def __init__(self, filename):
+        self.name = filename
+        self.source = ('file', filename)
+        self._pos = 0
+        with open(filename, 'rb') as f:
+            self.size = os.fstat(f.fileno()).st_size
+            if self.size > 0:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                # Empty files cannot be mapped.
+                self._map = b''
+
+    def close(self):
+        """Unmap the file.
+
+        Views into the mapping may still be alive, e.g. in the traceback of
+        a parsing error.  The mapping is then left for garbage collection to
+        release rather than masking that error.
+        """
+        if isinstance(self._map, mmap.mmap):
+            try:
+                self._map.close()
+            except BufferError:
+                pass
+        self._map = b''
+
+
+def open_source(source):
+    """Open the bytes described by a source for parsing.
+
+    Parameters
+    ----------
+    source : tuple
+        Either ('file', filename) or ('buffer', data), where data is any
+        object supporting the buffer protocol.
+
+    Returns
+    -------
+    f : BufferFile
+        Either a MappedFile or a BufferFile.
+    """
+    kind, obj = source
+    if kind == 'file':
+        return MappedFile(obj)
+    return BufferFile(obj)
+
+
+def read_struct(f, fmt):
+    """Read and unpack a precompiled struct from a file or mapped file.
+
+    Parameters
+    ----------
+    f : file or BufferFile
+        Input positioned at the start of the structure.
+    fmt : struct.Struct
+        Precompiled structure.
+
+    Returns
+    -------
+    values : tuple
+        The unpacked values.
+    """
+    if isinstance(f, BufferFile):
+        return f.unpack(fmt)
+    return fmt.unpack(f.read(fmt.size))
+
+
+def read_array(f, n):
+    """Read up to n bytes from a file or mapped file as a uint8 array.
+
+    Bytes from a mapped file are not copied.
+
+    Parameters
+    ----------
+    f : file or BufferFile
+        Input positioned at the start of the bytes.
+    n : int
+        Number of bytes.
+
+    Returns
+    -------
+    data : ndarray
+        The bytes, possibly fewer than n if the end of file is reached.
+    """
+    if isinstance(f, BufferFile):
+        return f.view(n)
+    return np.frombuffer(f.read(n), dtype=np.uint8)
@@ -0,0 +1,104 @@
+"""OpenJPEG streams over in-memory buffers.
+
+License:  MIT
+"""
+import ctypes
+
+import numpy as np
+
+from .lib import openjp2 as opj2
+
+# Returned by a read callback at the end of the stream, i.e. (OPJ_SIZE_T)-1.
+_END_OF_STREAM = ctypes.c_size_t(-1).value
+
+
+class MemoryStream:
+    """OpenJPEG stream over an in-memory buffer.
+
+    An input stream reads from the caller's buffer without copying it, and an
+    output stream collects the encoded bytes in a growable buffer, so images
+    never go through the filesystem.
+
+    Attributes
+    ----------
+    stream : _stream_t_p
+        The OpenJPEG stream, valid until close is called.
+    """
+    def __init__(self, data=None):
+        """
+        Parameters
+        ----------
+        data : bytes-like, optional
+            Create an input stream over any object supporting the buffer
+            protocol.  It must not change while the stream is in use.  If not
+            given, create an output stream.
+        """
+        self._pos = 0
+        is_input = data is not None
+
+        # The callbacks must stay referenced for the life of the stream.
+        self._skip_fn = opj2._stream_skip_fn_t(self._skip)
+        self._seek_fn = opj2._stream_seek_fn_t(self._seek)
+
+        self.stream = opj2._stream_create(opj2._STREAM_CHUNK_SIZE, is_input)
+        if is_input:
+            self._data = np.frombuffer(data, dtype=np.uint8)
+            self._read_fn = opj2._stream_read_fn_t(self._read)
+            opj2._stream_set_read_function(self.stream, self._read_fn)
+            opj2._stream_set_user_data_length(self.stream, len(self._data))
+        else:
+            self._data = bytearray()
+            self._write_fn = opj2._stream_write_fn_t(self._write)
+            opj2._stream_set_write_function(self.stream, self._write_fn)
+        self._is_input = is_input
+        opj2._stream_set_skip_function(self.stream, self._skip_fn)
+        opj2._stream_set_seek_function(self.stream, self._seek_fn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Destroy the OpenJPEG stream."""
+        if self.stream is not None:
+            opj2._stream_destroy_v3(self.stream)
+            self.stream = None
+
+    def getvalue(self):
+        """Return the bytes written to an output stream."""
+        return bytes(self._data)
+
+    def _read(self, buffer, nbytes, user_data):
+        n = min(nbytes, len(self._data) - self._pos)
+        if n <= 0:
+            return _END_OF_STREAM
+        ctypes.memmove(buffer, self._data.ctypes.data + self._pos, n)
+        self._pos += n
+        return n
+
+    def _write(self, buffer, nbytes, user_data):
+        self._extend(self._pos)
+        self._data[self._pos:self._pos + nbytes] = ctypes.string_at(buffer,
+                                                                    nbytes)
+        self._pos += nbytes
+        return nbytes
+
+    def _extend(self, pos):
+        """Zero-fill an output stream up to pos after seeking past its end."""
+        if pos > len(self._data):
+            self._data.extend(bytearray(pos - len(self._data)))
+
+    def _skip(self, nbytes, user_data):
+        pos = self._pos + nbytes
+        if pos < 0 or (self._is_input and pos > len(self._data)):
+            return -1
+        self._pos = pos
+        return nbytes
+
+    def _seek(self, offset, user_data):
+        if offset < 0 or (self._is_input and offset > len(self._data)):
+            return opj2._FALSE
+        self._pos = offset
+        return opj2._TRUE
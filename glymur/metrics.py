@@ -0,0 +1,223 @@
+"""Process-wide counters and histograms of glymur activity.
+
+Glymur keeps these metrics up to date by itself, e.g. the number of files
+opened, bytes parsed, decodes per reduction level, decode and encode
+latencies, megapixels produced and messages from the OpenJPEG library.
+Take a snapshot with snapshot, or export them for Prometheus with
+prometheus_text.
+
+License:  MIT
+"""
+import bisect
+import threading
+
+# Upper bounds of the latency histogram buckets, in seconds.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0)
+
+_REGISTRY = []
+
+
+class _Metric:
+    """Base class of metrics whose samples are keyed by label values."""
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._samples = {}
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            msg = "{0} expects labels {1}, got {2}."
+            raise ValueError(msg.format(self.name, self.labelnames,
+                                        tuple(sorted(labels))))
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def reset(self):
+        """Drop all samples."""
+        with self._lock:
+            self._samples.clear()
+
+    def samples(self):
+        """Return a list of (labels, value) pairs, labels being a dict."""
+        with self._lock:
+            items = sorted(self._samples.items())
+            return [(dict(zip(self.labelnames, key)), self._export(value))
+                    for key, value in items]
+
+    def _export(self, value):
+        return value
+
+
+class Counter(_Metric):
+    """Monotonically increasing count.
+
+    Attributes
+    ----------
+    name : str
+        Metric name.
+    documentation : str
+        What the metric counts.
+    labelnames : tuple
+        Names of the labels distinguishing samples.
+    """
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        """Increase the count of the sample with the given labels."""
+        key = self._key(labels)
+        with self._lock:
+            self._samples[key] = self._samples.get(key, 0) + amount
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed buckets.
+
+    Attributes
+    ----------
+    name : str
+        Metric name.
+    documentation : str
+        What the metric observes.
+    buckets : tuple
+        Increasing upper bounds of the buckets.  Values above the last bound
+        are only counted in the implicit +Inf bucket.
+    labelnames : tuple
+        Names of the labels distinguishing samples.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets, labelnames=()):
+        _Metric.__init__(self, name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        """Record a value in the sample with the given labels."""
+        key = self._key(labels)
+        k = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            sample = self._samples.get(key)
+            if sample is None:
+                sample = self._samples[key] = [[0] * len(self.buckets), 0, 0]
+            if k < len(self.buckets):
+                sample[0][k] += 1
+            sample[1] += 1
+            sample[2] += value
+
+    def _export(self, value):
+        counts, count, total = value
+        cumulative = []
+        running = 0
+        for bound, n in zip(self.buckets, counts):
+            running += n
+            cumulative.append((bound, running))
+        return {'buckets': cumulative, 'count': count, 'sum': total}
+
+
+FILES_OPENED = Counter('glymur_files_opened_total',
+                       'JPEG 2000 files and buffers opened for reading.')
+BYTES_PARSED = Counter('glymur_bytes_parsed_total',
+                       'Bytes read while parsing boxes and codestreams.',
+                       ['kind'])
+DECODES = Counter('glymur_decodes_total',
+                  'Images, areas and tiles decoded, by reduction level.',
+                  ['reduce'])
+DECODE_SECONDS = Histogram('glymur_decode_seconds',
+                           'Latency of decoding, including codec setup and '
+                           'conversion of the result.',
+                           LATENCY_BUCKETS)
+DECODED_MEGAPIXELS = Counter('glymur_decoded_megapixels_total',
+                             'Megapixels produced by decoding.')
+ENCODES = Counter('glymur_encodes_total', 'Images encoded.')
+ENCODE_SECONDS = Histogram('glymur_encode_seconds',
+                           'Latency of encoding, from codec setup to the '
+                           'end of compression.',
+                           LATENCY_BUCKETS)
+ENCODED_MEGAPIXELS = Counter('glymur_encoded_megapixels_total',
+                             'Megapixels encoded.')
+OPENJPEG_MESSAGES = Counter('glymur_openjpeg_messages_total',
+                            'Warnings and errors reported by the OpenJPEG '
+                            'library.',
+                            ['level'])
+
+
+def snapshot():
+    """Return the current value of every metric.
+
+    Returns
+    -------
+    metrics : dict
+        Maps each metric name onto a list of (labels, value) pairs.  Counter
+        values are numbers, histogram values are dictionaries with the
+        cumulative bucket counts, the number of observations and their sum.
+
+    Examples
+    --------
+    >>> import glymur
+    >>> import pkg_resources as pkg
+    >>> glymur.metrics.reset()
+    >>> jfile = pkg.resource_filename(glymur.__name__, "data/nemo.jp2")
+    >>> jp2 = glymur.Jp2k(jfile)
+    >>> glymur.metrics.snapshot()['glymur_files_opened_total']
+    [({}, 1)]
+    """
+    return dict((metric.name, metric.samples()) for metric in _REGISTRY)
+
+
+def reset():
+    """Reset every metric."""
+    for metric in _REGISTRY:
+        metric.reset()
+
+
+def _format_labels(labels, extra=None):
+    pairs = sorted(labels.items())
+    if extra is not None:
+        pairs.append(extra)
+    if len(pairs) == 0:
+        return ''
+    text = ','.join('{0}="{1}"'.format(name, value) for name, value in pairs)
+    return '{' + text + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def prometheus_text():
+    """Export every metric in the Prometheus text exposition format.
+
+    Returns
+    -------
+    text : str
+        Suitable for serving on a metrics endpoint or for the node exporter
+        textfile collector.
+    """
+    lines = []
+    for metric in _REGISTRY:
+        lines.append('# HELP {0} {1}'.format(metric.name,
+                                             metric.documentation))
+        lines.append('# TYPE {0} {1}'.format(metric.name, metric.kind))
+        for labels, value in metric.samples():
+            if metric.kind == 'counter':
+                lines.append('{0}{1} {2}'.format(metric.name,
+                                                 _format_labels(labels),
+                                                 _format_value(value)))
+                continue
+            buckets = value['buckets'] + [(float('inf'), value['count'])]
+            for bound, count in buckets:
+                le = ('le', _format_value(float(bound)))
+                lines.append('{0}_bucket{1} {2}'.format(
+                    metric.name, _format_labels(labels, le), count))
+            lines.append('{0}_sum{1} {2}'.format(
+                metric.name, _format_labels(labels),
+                _format_value(float(value['sum']))))
+            lines.append('{0}_count{1} {2}'.format(
+                metric.name, _format_labels(labels), value['count']))
+    return '\n'.join(lines) + '\n'
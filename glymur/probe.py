@@ -0,0 +1,186 @@
+"""Quick look at the essential properties of a JPEG 2000 image.
+
+License:  MIT
+"""
+import collections
+import os
+import struct
+
+from .codestream import _COD_PARAMS, _SIZ
+from .core import _progression_order_display
+
+_BOX_HEADER = struct.Struct('>I4s')
+_MARKER = struct.Struct('>HH')
+_XL = struct.Struct('>Q')
+
+_JP2_SIGNATURE = b'\x00\x00\x00\x0cjP  \r\n\x87\n'
+
+
+class ImageInfo(collections.namedtuple('ImageInfo',
+                                       ['codec', 'height', 'width',
+                                        'num_components', 'bitdepth',
+                                        'signed', 'tile_size',
+                                        'num_resolutions', 'num_layers',
+                                        'progression_order'])):
+    """Essential properties of a JPEG 2000 image.
+
+    Attributes
+    ----------
+    codec : str
+        Either 'jp2' or 'j2k'.
+    height, width : int
+        Image dimensions, as returned by Jp2k.read.
+    num_components : int
+        Number of components.
+    bitdepth : tuple
+        Bit depth of each component.
+    signed : tuple
+        Signedness of each component.
+    tile_size : tuple
+        Nominal tile size, (rows, columns).
+    num_resolutions : int
+        Number of resolution levels, i.e. one more than the number of wavelet
+        decomposition levels.
+    num_layers : int
+        Number of quality layers.
+    progression_order : str
+        One of 'LRCP', 'RLCP', 'RPCL', 'PCRL' or 'CPRL'.
+    """
+    __slots__ = ()
+
+
+def _read_exactly(f, n):
+    """Read exactly n bytes, failing at the end of the file."""
+    buffer = f.read(n)
+    if len(buffer) != n:
+        raise IOError("Unexpected end of file.")
+    return buffer
+
+
+def _find_codestream(f):
+    """Position a file at the start of its codestream.
+
+    The image starts at the current file position.  Only the headers of the
+    top-level boxes are read on the way to the contiguous codestream box.
+
+    Returns
+    -------
+    codec : str
+        Either 'jp2' or 'j2k'.
+    """
+    base = f.tell()
+    buffer = f.read(12)
+    if buffer[0:2] == b'\xff\x4f':
+        f.seek(-len(buffer), os.SEEK_CUR)
+        return 'j2k'
+    if buffer != _JP2_SIGNATURE:
+        raise IOError("Not a JPEG 2000 file.")
+
+    offset = 12
+    while True:
+        buffer = f.read(8)
+        if len(buffer) < 8:
+            raise IOError("No codestream box was found.")
+        L, T = _BOX_HEADER.unpack(buffer)
+        header_length = 8
+        if L == 1:
+            L, = _XL.unpack(_read_exactly(f, 8))
+            header_length = 16
+        if T == b'jp2c':
+            return 'jp2'
+        if L == 0:
+            # Only the last box may extend to the end of the file.
+            raise IOError("No codestream box was found.")
+        if L < header_length:
+            msg = "Invalid length {0} for box '{1}' at byte offset {2}."
+            raise IOError(msg.format(L, T.decode('latin-1'), offset))
+        offset += L
+        f.seek(base + offset)
+
+
+def _probe_codestream(f, codec):
+    """Read the SIZ and COD segments of the codestream main header."""
+    marker, = struct.unpack('>H', _read_exactly(f, 2))
+    if marker != 0xff4f:
+        raise IOError("The codestream does not start with SOC.")
+
+    marker, = struct.unpack('>H', _read_exactly(f, 2))
+    if marker != 0xff51:
+        raise IOError("The SIZ segment does not follow SOC.")
+    siz = _SIZ.unpack(_read_exactly(f, _SIZ.size))
+    Xsiz, Ysiz, XOsiz, YOsiz, XTsiz, YTsiz = siz[2:8]
+    num_components = siz[10]
+    comps = bytearray(_read_exactly(f, num_components * 3))
+    Ssiz, XRsiz, YRsiz = comps[0::3], comps[1::3], comps[2::3]
+    if 0 in XRsiz[0:1] + YRsiz[0:1]:
+        raise IOError("Invalid subsampling value for component 0.")
+
+    # Scan the rest of the main header for the COD segment.
+    while True:
+        marker, length = _MARKER.unpack(_read_exactly(f, 4))
+        if marker == 0xff52:
+            break
+        if marker == 0xff90 or length < 2:
+            raise IOError("No COD segment in the main header.")
+        f.seek(length - 2, os.SEEK_CUR)
+    cod = _COD_PARAMS.unpack(_read_exactly(f, 1 + _COD_PARAMS.size)[1:])
+
+    def extent(size, origin, step):
+        return -(-size // step) - -(-origin // step)
+
+    return ImageInfo(codec=codec,
+                     height=extent(Ysiz, YOsiz, YRsiz[0]),
+                     width=extent(Xsiz, XOsiz, XRsiz[0]),
+                     num_components=num_components,
+                     bitdepth=tuple((x & 0x7f) + 1 for x in Ssiz),
+                     signed=tuple((x & 0x80) > 0 for x in Ssiz),
+                     tile_size=(YTsiz, XTsiz),
+                     num_resolutions=cod[3] + 1,
+                     num_layers=cod[1],
+                     progression_order=_progression_order_display.get(
+                         cod[0], str(cod[0])))
+
+
+def probe(path):
+    """Read the essential properties of a JPEG 2000 image.
+
+    Only the box headers leading up to the codestream and the SIZ and COD
+    segments of its main header are read, typically well under a few
+    kilobytes.  Nothing else is parsed, which makes this much cheaper than
+    constructing a Jp2k when cataloguing many files.
+
+    Parameters
+    ----------
+    path : str or file
+        Path to a JP2 or J2K file, or a seekable binary file object
+        positioned at the start of the image, e.g. one embedded in a larger
+        file.
+
+    Returns
+    -------
+    info : ImageInfo
+        The image properties.
+
+    Raises
+    ------
+    IOError
+        If the file is not JPEG 2000 or its headers are invalid.
+
+    Examples
+    --------
+    >>> import glymur
+    >>> import pkg_resources as pkg
+    >>> jfile = pkg.resource_filename(glymur.__name__, "data/nemo.jp2")
+    >>> info = glymur.probe(jfile)
+    >>> info.height, info.width, info.num_components
+    (1456, 2592, 3)
+    >>> info.tile_size, info.num_resolutions, info.progression_order
+    ((512, 512), 6, 'LRCP')
+    """
+    if hasattr(path, 'read'):
+        codec = _find_codestream(path)
+        return _probe_codestream(path, codec)
+
+    with open(path, 'rb') as f:
+        codec = _find_codestream(f)
+        return _probe_codestream(f, codec)
@@ -5,3 +5,4 @@ from .test_printing import TestPrinting as printing
 from .test_opj_suite import TestSuite as suite
 from .test_opj_suite_write import TestSuiteWrite as suitew
 from .test_opj_suite_neg import TestSuiteNegative as suiteneg
+from .test_cache import TestTileCache as cache
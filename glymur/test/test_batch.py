@@ -0,0 +1,190 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+if sys.hexversion <= 0x03030000:
+    from mock import patch
+else:
+    from unittest.mock import patch
+
+import numpy as np
+import pkg_resources
+
+from glymur import Jp2k
+from glymur import batch
+from glymur.batch import _share, _unshare, _release
+from glymur.lib import openjp2 as opj2
+import glymur
+
+
+def _fake_read_task(task):
+    # Stands in for decoding, so that the batch machinery can run without
+    # the library.
+    index, path, kwargs, name = task
+    data = np.full((32, 48), index, dtype=np.uint8)
+    if name is None:
+        return index, path, ('array', data), None
+    return index, path, _share(data, name), None
+
+
+def _fake_write_task(task):
+    # Stands in for encoding by checking the staged image.
+    index, path, descriptor, kwargs = task
+    shm, data = batch._attach(descriptor)
+    try:
+        ok = (data == index).all()
+    finally:
+        del data
+        if shm is not None:
+            shm.close()
+    return index, path, None, None if ok else RuntimeError(path)
+
+
+# Runs a batch in a fresh interpreter, whose resource trackers report to its
+# standard error.
+_SHARED_MEMORY_SCRIPT = """
+import numpy as np
+from glymur import batch
+from glymur.test import test_batch
+
+batch._read_task = test_batch._fake_read_task
+batch._write_task = test_batch._fake_write_task
+for r in batch.read_many(['a', 'b', 'c', 'd', 'e'], workers=2):
+    assert r.error is None and (r.data == r.index).all()
+items = [(str(j), np.full((32, 48), j, dtype=np.uint8)) for j in range(5)]
+for r in batch.write_many(items, workers=2):
+    assert r.error is None
+print('ok')
+"""
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.jp2file = pkg_resources.resource_filename(glymur.__name__,
+                                                       "data/nemo.jp2")
+        self.tdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tdir)
+
+    def test_share_roundtrip(self):
+        data = np.arange(24, dtype=np.uint16).reshape(2, 3, 4)
+        descriptor = _share(data)
+        np.testing.assert_array_equal(_unshare(descriptor), data)
+
+        # Released blocks cannot be attached again.
+        descriptor = _share(data)
+        _release(descriptor)
+        if descriptor[0] == 'shm':
+            with self.assertRaises(Exception):
+                _unshare(descriptor)
+
+    def test_errors_are_captured(self):
+        # A bad file should not abort the rest of the batch.
+        paths = [os.path.join(self.tdir, 'missing{0}.jp2'.format(j))
+                 for j in range(5)]
+        for workers in [1, 2]:
+            results = list(glymur.read_many(paths, workers=workers,
+                                            chunksize=2))
+            self.assertEqual([r.index for r in results], list(range(5)))
+            self.assertEqual([r.path for r in results], paths)
+            for result in results:
+                self.assertIsNone(result.data)
+                self.assertIsInstance(result.error, IOError)
+
+    def test_unordered(self):
+        paths = [os.path.join(self.tdir, 'missing{0}.jp2'.format(j))
+                 for j in range(6)]
+        results = glymur.read_many(iter(paths), workers=3, ordered=False)
+        self.assertEqual(sorted(r.index for r in results), list(range(6)))
+
+    @unittest.skipIf(batch._shared_memory() is None, "Needs shared memory")
+    def test_shared_memory_workers(self):
+        # Workers must share the resource tracker of the parent, or their
+        # own trackers complain about, or unlink, blocks at exit.
+        root = os.path.dirname(os.path.dirname(glymur.__file__))
+        proc = subprocess.Popen([sys.executable, '-c', _SHARED_MEMORY_SCRIPT],
+                                cwd=root, stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE)
+        stdout, stderr = proc.communicate()
+        self.assertEqual(stdout.decode().strip(), 'ok', stderr.decode())
+        self.assertNotIn('resource_tracker', stderr.decode())
+        self.assertNotIn('leaked', stderr.decode())
+
+    @unittest.skipIf(not os.path.isdir('/dev/shm'), "Needs /dev/shm")
+    def test_read_many_stopped_early(self):
+        # Images the caller never picked up must not stay in shared memory.
+        before = set(os.listdir('/dev/shm'))
+        paths = ['{0}.jp2'.format(j) for j in range(40)]
+        with patch.object(batch, '_read_task', _fake_read_task):
+            results = glymur.read_many(paths, workers=2, chunksize=1)
+            self.assertEqual(next(results).index, 0)
+            results.close()
+        self.assertEqual(set(os.listdir('/dev/shm')) - before, set())
+
+    def test_write_many_bounds_staging(self):
+        # Images are only staged a few chunks ahead of the encoders.
+        produced = []
+        outstanding = []
+
+        def items():
+            for j in range(40):
+                produced.append(j)
+                yield (str(j), np.full((8, 8), j, dtype=np.uint8))
+
+        with patch.object(batch, '_write_task', _fake_write_task):
+            for result in glymur.write_many(items(), workers=2, chunksize=1):
+                self.assertIsNone(result.error)
+                outstanding.append(len(produced) - result.index)
+        self.assertEqual(len(produced), 40)
+        # Two chunks per worker, plus the item read before blocking.
+        self.assertLessEqual(max(outstanding), 2 * 2 * 1 + 1)
+
+    def test_write_many_default_staging(self):
+        # By default, the number of staged images does not grow with the
+        # number of items.
+        live = []
+        peak = []
+
+        def share(data):
+            live.append(True)
+            peak.append(len(live))
+            return _share(data)
+
+        def release(descriptor):
+            live.pop()
+            _release(descriptor)
+
+        items = [(str(j), np.full((8, 8), j, dtype=np.uint8))
+                 for j in range(200)]
+        with patch.multiple(batch, _write_task=_fake_write_task,
+                            _share=share, _release=release):
+            results = list(glymur.write_many(items, workers=2))
+        self.assertEqual(len(results), 200)
+        self.assertEqual(len(live), 0)
+        self.assertLessEqual(max(peak), 2 * 2 + 1)
+
+    @unittest.skipIf(opj2._library() is None, "Needs openjp2 library")
+    def test_write_then_read_many(self):
+        expdata = Jp2k(self.jp2file).read(reduce=3)
+        items = [(os.path.join(self.tdir, '{0}.jp2'.format(j)),
+                  expdata[:, :, j]) for j in range(3)]
+        items.append((os.path.join(self.tdir, 'bad.jp2'), expdata,
+                      {'cbsize': (3, 3)}))
+        results = list(glymur.write_many(items, workers=2))
+        self.assertEqual([r.error is None for r in results],
+                         [True, True, True, False])
+
+        paths = [item[0] for item in items[:3]]
+        for result in glymur.read_many(paths, workers=2, area=(0, 0, 50, 60)):
+            self.assertIsNone(result.error)
+            np.testing.assert_array_equal(result.data,
+                                          expdata[:50, :60, result.index])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import sys
+import unittest
+
+if sys.hexversion <= 0x03030000:
+    from mock import patch
+else:
+    from unittest.mock import patch
+
+import numpy as np
+
+from glymur.benchmarks import bench_parse, corpus, runner
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_discover(self):
+        names = [name for name, _, _ in runner.discover()]
+        for name in ['Import.time_import', 'Parse.time_open',
+                     'Parse.time_probe', 'Read.time_read',
+                     'Read.peakmem_read', 'ReadBands.time_read_bands',
+                     'Write.time_write']:
+            self.assertIn(name, names)
+        names = [name for name, _, _ in runner.discover('^Parse')]
+        self.assertTrue(all(name.startswith('Parse.') for name in names))
+
+    def test_run_on_shipped_image(self):
+        # Only the packaged image, since building the rest of the corpus
+        # encodes it whenever the library is available.
+        with patch.object(bench_parse.Parse, 'params', [['nemo']]):
+            results = runner.run(pattern='Parse.time_main_header', repeat=1,
+                                 stream=None)
+        self.assertEqual([r.params for r in results], [('nemo',)])
+        result = results[0]
+        self.assertIsNone(result.error)
+        self.assertGreater(result.seconds, 0)
+
+    def test_make_image(self):
+        data = corpus.make_image((64, 48, 3), np.uint16)
+        self.assertEqual(data.shape, (64, 48, 3))
+        self.assertEqual(data.dtype, np.uint16)
+        self.assertGreater(data.std(), 0)
+        self.assertEqual(corpus.make_image((64, 48), np.uint8).shape,
+                         (64, 48))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import sys
+import unittest
+if sys.hexversion <= 0x03030000:
+    from mock import patch
+else:
+    from unittest.mock import patch
+
+import numpy as np
+import pkg_resources
+
+from glymur import Jp2k
+from glymur.cache import TileCache
+from glymur.lib import openjp2 as opj2
+import glymur
+
+
+class TestTileCache(unittest.TestCase):
+
+    def setUp(self):
+        self.jp2file = pkg_resources.resource_filename(glymur.__name__,
+                                                       "data/nemo.jp2")
+
+    def tearDown(self):
+        glymur.set_tile_cache(None)
+
+    def test_lru_eviction(self):
+        # The least recently used tile is evicted first.
+        cache = TileCache(max_bytes=300)
+        for j in range(3):
+            cache.put(j, np.zeros(100, dtype=np.uint8))
+        self.assertIsNotNone(cache.get(0))
+        cache.put(3, np.zeros(100, dtype=np.uint8))
+        self.assertIsNone(cache.get(1))
+        self.assertIsNotNone(cache.get(0))
+        self.assertEqual(len(cache), 3)
+        self.assertEqual(cache.nbytes, 300)
+        self.assertEqual(cache.hits, 2)
+        self.assertEqual(cache.misses, 1)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_oversized_tile(self):
+        # A tile larger than the budget is never stored.
+        cache = TileCache(max_bytes=10)
+        cache.put(0, np.zeros(100, dtype=np.uint8))
+        self.assertEqual(len(cache), 0)
+
+    def test_tiles_are_read_only(self):
+        cache = TileCache()
+        cache.put(0, np.zeros(10, dtype=np.uint8))
+        with self.assertRaises(ValueError):
+            cache.get(0)[0] = 1
+
+    def test_set_tile_cache(self):
+        cache = glymur.set_tile_cache(1024)
+        self.assertIs(glymur.get_tile_cache(), cache)
+        glymur.set_tile_cache(0)
+        self.assertIsNone(glymur.get_tile_cache())
+
+    def test_area_assembled_from_tiles(self):
+        # Only the tiles missing from the cache should be decoded.
+        image = np.arange(1456 * 2592 * 3, dtype=np.uint32)
+        image = image.reshape(1456, 2592, 3) % 251
+
+        def fake_read_common(reduce=0, tile=None, **kwargs):
+            # Emulate decoding a tile at full resolution.
+            r, c = divmod(tile, 6)
+            return image[r * 512:(r + 1) * 512, c * 512:(c + 1) * 512, :]
+
+        cache = glymur.set_tile_cache(64 * 1024 * 1024)
+        j = Jp2k(self.jp2file)
+        with patch.object(Jp2k, '_read_common',
+                          side_effect=fake_read_common) as mock:
+            data = j.read(area=(100, 300, 600, 700))
+            np.testing.assert_array_equal(data, image[100:600, 300:700, :])
+            self.assertEqual(mock.call_count, 4)
+            self.assertEqual(cache.misses, 4)
+
+            # Tiles 0, 1, 6 and 7 are cached, only 2 and 8 are missing.
+            data = j.read(area=(0, 0, 1000, 1500), workers=2)
+            np.testing.assert_array_equal(data, image[0:1000, 0:1500, :])
+            self.assertEqual(mock.call_count, 6)
+            self.assertEqual(cache.hits, 4)
+
+            data = j.read(tile=7)
+            np.testing.assert_array_equal(data, image[512:1024, 512:1024, :])
+            self.assertEqual(mock.call_count, 6)
+
+    def test_output_validated(self):
+        # The output array is checked against the decoded tiles.
+        def fake_read_common(reduce=0, tile=None, **kwargs):
+            return np.zeros((512, 512, 3), dtype=np.uint16)
+
+        glymur.set_tile_cache(64 * 1024 * 1024)
+        j = Jp2k(self.jp2file)
+        with patch.object(Jp2k, '_read_common',
+                          side_effect=fake_read_common):
+            with self.assertRaises(IOError):
+                j.read(tile=0, out=np.zeros((512, 512, 3), dtype=np.uint8))
+            with self.assertRaises(IOError):
+                j.read(tile=0, out=np.zeros((512, 512, 2), dtype=np.uint16))
+            out = np.ones((512, 512, 3), dtype=np.uint32)
+            self.assertIs(j.read(tile=0, out=out), out)
+            self.assertEqual(out.sum(), 0)
+
+    def test_memory_images_not_cached(self):
+        # Tiles of images in memory could never be looked up again.
+        with open(self.jp2file, 'rb') as f:
+            j = Jp2k.from_bytes(f.read())
+        cache = glymur.set_tile_cache(64 * 1024 * 1024)
+        with patch.object(Jp2k, '_read_common') as mock:
+            mock.return_value = np.zeros((512, 512, 3), dtype=np.uint8)
+            j.read(tile=0)
+        self.assertEqual(len(cache), 0)
+
+    @unittest.skipIf(opj2._library() is None, "Needs openjp2 library")
+    def test_cached_read(self):
+        # Cached reads should match uncached reads.
+        j = Jp2k(self.jp2file)
+        expdata = j.read(reduce=1, area=(100, 300, 1100, 1400))
+        glymur.set_tile_cache(64 * 1024 * 1024)
+        for _ in range(2):
+            actdata = j.read(reduce=1, area=(100, 300, 1100, 1400))
+            np.testing.assert_array_equal(actdata, expdata)
+        self.assertEqual(glymur.get_tile_cache().hits, 9)
+
+
+if __name__ == "__main__":
+    unittest.main()
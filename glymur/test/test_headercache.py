@@ -0,0 +1,115 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+if sys.hexversion <= 0x03030000:
+    from mock import patch
+else:
+    from unittest.mock import patch
+
+import numpy as np
+import pkg_resources
+
+from glymur import Jp2k
+from glymur.lib import openjp2 as opj2
+import glymur
+
+
+class TestHeaderCache(unittest.TestCase):
+
+    def setUp(self):
+        self.jp2file = pkg_resources.resource_filename(glymur.__name__,
+                                                       "data/nemo.jp2")
+        self.tdir = tempfile.mkdtemp()
+        self.dbfile = os.path.join(self.tdir, 'headers.db')
+
+    def tearDown(self):
+        glymur.set_header_cache(None)
+        shutil.rmtree(self.tdir)
+
+    def test_hydrate(self):
+        # The second open should not parse the file.
+        cache = glymur.set_header_cache(self.dbfile)
+        j = Jp2k(self.jp2file)
+        index = j.tile_index
+        self.assertEqual(cache.misses, 1)
+
+        with patch('glymur.jp2k.open_source') as mock:
+            j2 = Jp2k(self.jp2file)
+            self.assertEqual(j2.shape, (1456, 2592, 3))
+            np.testing.assert_array_equal(j2.tile_index, index)
+            self.assertEqual(mock.call_count, 0)
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual([box.id for box in j2.box],
+                         [box.id for box in j.box])
+
+        # Another process sees the same entries.
+        glymur.set_header_cache(self.dbfile)
+        Jp2k(self.jp2file)
+        self.assertEqual(glymur.get_header_cache().hits, 1)
+
+    def test_stale(self):
+        # A changed file is parsed again and its entry replaced.
+        cache = glymur.set_header_cache(self.dbfile)
+        jfile = os.path.join(self.tdir, 'nemo.jp2')
+        shutil.copyfile(self.jp2file, jfile)
+        j = Jp2k(jfile)
+        jp2c = [box for box in j.box if box.id == 'jp2c'][0]
+        with open(self.jp2file, 'rb') as ifile:
+            ifile.seek(jp2c.offset + 8)
+            codestream = ifile.read(jp2c.length - 8)
+        with open(jfile, 'wb') as ofile:
+            ofile.write(codestream)
+
+        j = Jp2k(jfile)
+        self.assertEqual(cache.stale, 1)
+        self.assertEqual(j._codec_format, opj2._CODEC_J2K)
+        self.assertEqual(j.box, [])
+        j = Jp2k(jfile)
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(j.shape, (1456, 2592, 3))
+
+    def test_other_version(self):
+        # Entries stored by another version of glymur are parsed again.
+        cache = glymur.set_header_cache(self.dbfile)
+        with patch('glymur.headercache._VERSION', 'other'):
+            Jp2k(self.jp2file)
+        j = Jp2k(self.jp2file)
+        self.assertEqual(cache.stale, 1)
+        self.assertEqual(j.shape, (1456, 2592, 3))
+        Jp2k(self.jp2file)
+        self.assertEqual(cache.hits, 1)
+
+    def test_unusable_entries(self):
+        # Entries that cannot be unpickled or restored are parsed again.
+        cache = glymur.set_header_cache(self.dbfile)
+        path = os.path.abspath(self.jp2file)
+        stat = glymur.jp2k._file_stat(self.jp2file)
+        cache.put(path, stat, {'mode': 'rb'})
+        conn = cache._connect()
+        conn.execute('UPDATE headers SET state = ? WHERE path = ?',
+                     (b'garbage', path))
+        conn.commit()
+        j = Jp2k(self.jp2file)
+        self.assertEqual((cache.hits, cache.stale), (0, 1))
+        self.assertEqual(j.shape, (1456, 2592, 3))
+
+        cache.put(path, stat, {'mode': 'rb'})
+        j = Jp2k(self.jp2file)
+        self.assertEqual((cache.hits, cache.stale), (0, 2))
+        self.assertEqual(j.shape, (1456, 2592, 3))
+        Jp2k(self.jp2file)
+        self.assertEqual(cache.hits, 1)
+
+    def test_default_location(self):
+        confdir = os.path.join(self.tdir, 'config')
+        with patch.dict('os.environ', {'GLYMURCONFIGDIR': confdir}):
+            cache = glymur.set_header_cache(True)
+        self.assertEqual(cache.filename, os.path.join(confdir, 'headers.db'))
+        Jp2k(self.jp2file)
+        self.assertTrue(os.path.exists(cache.filename))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+import warnings
+
+import numpy as np
+import pkg_resources
+
+from glymur import Jp2k
+from glymur import jp2k
+from glymur import metrics
+from glymur.lib import openjp2 as opj2
+import glymur
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.jp2file = pkg_resources.resource_filename(glymur.__name__,
+                                                       "data/nemo.jp2")
+        metrics.reset()
+
+    def tearDown(self):
+        metrics.reset()
+
+    def test_counter(self):
+        counter = metrics.Counter('test_total', 'Test.', ['kind'])
+        self.addCleanup(metrics._REGISTRY.remove, counter)
+        counter.inc(kind='a')
+        counter.inc(2, kind='a')
+        counter.inc(kind='b')
+        self.assertEqual(counter.samples(),
+                         [({'kind': 'a'}, 3), ({'kind': 'b'}, 1)])
+        with self.assertRaises(ValueError):
+            counter.inc()
+
+    def test_histogram(self):
+        histogram = metrics.Histogram('test_seconds', 'Test.', [0.1, 1.0])
+        self.addCleanup(metrics._REGISTRY.remove, histogram)
+        for value in (0.05, 0.1, 0.5, 5.0):
+            histogram.observe(value)
+        labels, value = histogram.samples()[0]
+        self.assertEqual(value['buckets'], [(0.1, 2), (1.0, 3)])
+        self.assertEqual(value['count'], 4)
+        self.assertAlmostEqual(value['sum'], 5.65)
+
+        text = metrics.prometheus_text()
+        self.assertIn('# TYPE test_seconds histogram\n', text)
+        self.assertIn('test_seconds_bucket{le="0.1"} 2\n', text)
+        self.assertIn('test_seconds_bucket{le="+Inf"} 4\n', text)
+        self.assertIn('test_seconds_count 4\n', text)
+
+    def test_parse(self):
+        j = Jp2k(self.jp2file)
+        j.get_codestream()
+        with open(self.jp2file, 'rb') as f:
+            Jp2k.from_bytes(f.read())
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['glymur_files_opened_total'], [({}, 2)])
+        parsed = dict((labels['kind'], value) for labels, value
+                      in snapshot['glymur_bytes_parsed_total'])
+        # The signature, file type and header boxes, and only the headers of
+        # the deferred UUID boxes and of the codestream box.
+        self.assertEqual(parsed['boxes'], 2 * 101)
+        self.assertGreater(parsed['codestream'], 0)
+
+        text = metrics.prometheus_text()
+        self.assertIn('glymur_files_opened_total 2\n', text)
+        self.assertIn('glymur_bytes_parsed_total{kind="boxes"} 202\n', text)
+
+        # Deferred payloads count once they are loaded.
+        j.box[3].uuid
+        parsed = dict((labels['kind'], value) for labels, value
+                      in metrics.snapshot()['glymur_bytes_parsed_total'])
+        self.assertEqual(parsed['boxes'], 2 * 101 + 630)
+
+    def test_openjpeg_messages(self):
+        with warnings.catch_warnings(record=True):
+            warnings.simplefilter('always')
+            jp2k._default_warning_handler(b'be careful\n', None)
+        samples = metrics.OPENJPEG_MESSAGES.samples()
+        self.assertEqual(samples, [({'level': 'warning'}, 1)])
+
+    @unittest.skipIf(opj2._library() is None, "Needs openjp2 library")
+    def test_decode_encode(self):
+        j = Jp2k(self.jp2file)
+        j.read(reduce=3)
+        j.read(reduce=3)
+        glymur.encode(np.zeros((100, 100), dtype=np.uint8))
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['glymur_decodes_total'],
+                         [({'reduce': '3'}, 2)])
+        labels, value = snapshot['glymur_decode_seconds'][0]
+        self.assertEqual(value['count'], 2)
+        self.assertEqual(snapshot['glymur_encodes_total'], [({}, 1)])
+        self.assertEqual(snapshot['glymur_encoded_megapixels_total'],
+                         [({}, 0.01)])
+
+
+if __name__ == "__main__":
+    unittest.main()
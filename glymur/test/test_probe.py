@@ -0,0 +1,76 @@
+import io
+import unittest
+
+import pkg_resources
+
+from glymur import Jp2k
+import glymur
+
+
+class CountingFile(io.BytesIO):
+    """Keeps track of how many bytes are read."""
+    def __init__(self, data):
+        io.BytesIO.__init__(self, data)
+        self.nbytes = 0
+
+    def read(self, n=-1):
+        buffer = io.BytesIO.read(self, n)
+        self.nbytes += len(buffer)
+        return buffer
+
+
+class TestProbe(unittest.TestCase):
+
+    def setUp(self):
+        self.jp2file = pkg_resources.resource_filename(glymur.__name__,
+                                                       "data/nemo.jp2")
+        with open(self.jp2file, 'rb') as f:
+            self.data = f.read()
+
+    def test_agrees_with_jp2k(self):
+        info = glymur.probe(self.jp2file)
+        j = Jp2k(self.jp2file)
+        siz = j.get_codestream().segment[1]
+        cod = j.get_codestream().segment[2]
+        self.assertEqual(info.codec, 'jp2')
+        self.assertEqual((info.height, info.width, info.num_components),
+                         j.shape)
+        self.assertEqual(info.bitdepth, siz._bitdepth)
+        self.assertEqual(info.signed, (False, False, False))
+        self.assertEqual(info.tile_size, (siz.YTsiz, siz.XTsiz))
+        self.assertEqual(info.num_resolutions, 6)
+        self.assertEqual(info.num_layers, cod._layers)
+        self.assertEqual(info.progression_order, 'LRCP')
+        with self.assertRaises(AttributeError):
+            info.height = 0
+
+    def test_reads_little(self):
+        f = CountingFile(self.data)
+        glymur.probe(f)
+        self.assertLess(f.nbytes, 4096)
+
+    def test_raw_codestream(self):
+        j = Jp2k(self.jp2file)
+        jp2c = [box for box in j.box if box.id == 'jp2c'][0]
+        f = CountingFile(self.data[jp2c.offset + 8:])
+        info = glymur.probe(f)
+        self.assertEqual(info.codec, 'j2k')
+        self.assertEqual(info.width, 2592)
+
+    def test_embedded(self):
+        # The image need not start at the beginning of the file.
+        f = io.BytesIO(b'\0' * 100 + self.data)
+        f.seek(100)
+        info = glymur.probe(f)
+        self.assertEqual(info, glymur.probe(self.jp2file))
+
+    def test_not_jpeg2000(self):
+        with self.assertRaises(IOError):
+            glymur.probe(io.BytesIO(b'not a JPEG 2000 file'))
+        with self.assertRaises(IOError):
+            # Truncated right after the signature box.
+            glymur.probe(io.BytesIO(self.data[0:20]))
+
+
+if __name__ == "__main__":
+    unittest.main()
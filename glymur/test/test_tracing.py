@@ -0,0 +1,70 @@
+import unittest
+
+import numpy as np
+import pkg_resources
+
+from glymur import Jp2k
+from glymur.lib import openjp2 as opj2
+from glymur import tracing
+import glymur
+
+
+class TestTracing(unittest.TestCase):
+
+    def setUp(self):
+        self.jp2file = pkg_resources.resource_filename(glymur.__name__,
+                                                       "data/nemo.jp2")
+
+    def tearDown(self):
+        glymur.set_tracer(None)
+
+    def test_disabled(self):
+        # Nothing is allocated or recorded while tracing is off.
+        self.assertIsNone(glymur.get_tracer())
+        with tracing.span('decode') as span:
+            span.nbytes = 10
+        self.assertIs(span, tracing._NULL_SPAN)
+        self.assertFalse(span)
+
+    def test_parse_spans(self):
+        with tracing.collect() as spans:
+            j = Jp2k(self.jp2file)
+            j.get_codestream(header_only=True)
+            j.get_codestream(header_only=False)
+        self.assertIsNone(glymur.get_tracer())
+        self.assertEqual([s.name for s in spans],
+                         ['parse_header', 'parse_codestream'])
+        for span in spans:
+            self.assertEqual(span.source, self.jp2file)
+            self.assertGreater(span.duration, 0)
+            self.assertFalse(span.failed)
+        self.assertGreater(spans[1].nbytes, spans[0].nbytes)
+
+    def test_failed_span(self):
+        spans = []
+        self.assertIsNone(glymur.set_tracer(spans.append))
+        with self.assertRaises(RuntimeError):
+            with tracing.span('decode', 'x.jp2', 100):
+                raise RuntimeError('failed')
+        self.assertEqual(glymur.set_tracer(None), spans.append)
+        self.assertTrue(spans[0].failed)
+        self.assertEqual(spans[0].nbytes, 100)
+
+    @unittest.skipIf(opj2._library() is None, "Needs openjp2 library")
+    def test_read_spans(self):
+        j = Jp2k(self.jp2file)
+        with tracing.collect() as spans:
+            data = j.read(reduce=3)
+        names = [s.name for s in spans]
+        self.assertEqual(names[-4:], ['codec_setup', 'read_header', 'decode',
+                                      'convert'])
+        self.assertEqual(spans[-1].nbytes, data.nbytes)
+
+        with tracing.collect() as spans:
+            glymur.encode(np.zeros((64, 64), dtype=np.uint8))
+        self.assertEqual([s.name for s in spans],
+                         ['stage', 'codec_setup', 'encode'])
+
+
+if __name__ == "__main__":
+    unittest.main()
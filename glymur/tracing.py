@@ -0,0 +1,173 @@
+"""Timing of the phases of reading and writing.
+
+Tracing is off by default.  Once a tracer is registered with set_tracer,
+each phase of a read or write, e.g. parsing the codestream header, setting
+up the codec, decoding and converting the components, is reported to it as
+a Span as soon as the phase ends.  While no tracer is registered, phases
+are not timed at all.
+
+License:  MIT
+"""
+import contextlib
+import threading
+import timeit
+
+_TRACER = None
+
+
+class Span:
+    """One timed phase of a read or write.
+
+    Attributes
+    ----------
+    name : str
+        The phase, one of 'parse_header', 'parse_codestream', 'codec_setup',
+        'read_header', 'decode', 'convert', 'stage', 'encode' or
+        'encode_tile'.
+    source : str or None
+        The file, '<memory>' for images in memory, or None if not known.
+    start : float
+        Start of the phase, from timeit.default_timer.
+    duration : float
+        Duration of the phase in seconds.
+    nbytes : int or None
+        Number of bytes read, decoded, converted or staged by the phase,
+        where known.
+    failed : bool
+        True if the phase ended with an exception.
+    thread : int
+        Identifier of the thread that ran the phase.
+    """
+    __slots__ = ('_tracer', 'name', 'source', 'start', 'duration', 'nbytes',
+                 'failed', 'thread')
+
+    def __init__(self, tracer, name, source=None, nbytes=None):
+        self._tracer = tracer
+        self.name = name
+        self.source = source
+        self.nbytes = nbytes
+        self.start = None
+        self.duration = None
+        self.failed = False
+        self.thread = None
+
+    def __repr__(self):
+        msg = 'Span({0!r}, source={1!r}, duration={2!r}, nbytes={3!r})'
+        return msg.format(self.name, self.source, self.duration, self.nbytes)
+
+    def __enter__(self):
+        self.thread = threading.current_thread().ident
+        self.start = timeit.default_timer()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.duration = timeit.default_timer() - self.start
+        self.failed = exc_type is not None
+        self._tracer(self)
+
+
+class _NullSpan:
+    """Stands in for a Span while tracing is off, recording nothing.
+
+    It is false, so that callers can skip work that only feeds the span.
+    """
+    __slots__ = ()
+
+    def __bool__(self):
+        return False
+
+    __nonzero__ = __bool__
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name, source=None, nbytes=None):
+    """Time a phase if tracing is on.
+
+    Parameters
+    ----------
+    name : str
+        The phase.
+    source : str, optional
+        The file.
+    nbytes : int, optional
+        Number of bytes touched, which may also be set on the span before
+        the phase ends.
+
+    Returns
+    -------
+    span : context manager
+        A Span reported to the tracer on exit, or a shared do-nothing
+        stand-in if tracing is off.
+    """
+    tracer = _TRACER
+    if tracer is None:
+        return _NULL_SPAN
+    return Span(tracer, name, source, nbytes)
+
+
+def set_tracer(tracer):
+    """Register the process-wide tracer.
+
+    Parameters
+    ----------
+    tracer : callable or None
+        Called with a Span as each phase ends, from the thread that ran the
+        phase.  Use None to turn tracing off.
+
+    Returns
+    -------
+    previous : callable or None
+        The tracer that was replaced.
+
+    Examples
+    --------
+    >>> import glymur
+    >>> spans = []
+    >>> previous = glymur.set_tracer(spans.append)
+    >>> _ = glymur.set_tracer(previous)
+    """
+    global _TRACER
+    previous = _TRACER
+    _TRACER = tracer
+    return previous
+
+
+def get_tracer():
+    """Return the process-wide tracer, or None if tracing is off."""
+    return _TRACER
+
+
+@contextlib.contextmanager
+def collect():
+    """Collect the spans of the enclosed reads and writes in a list.
+
+    The current tracer is replaced for the duration.
+
+    Examples
+    --------
+    >>> import glymur
+    >>> import pkg_resources as pkg
+    >>> jfile = pkg.resource_filename(glymur.__name__, "data/nemo.jp2")
+    >>> with glymur.tracing.collect() as spans:
+    ...     jp2 = glymur.Jp2k(jfile)
+    ...     shape = jp2.shape
+    >>> [s.name for s in spans]
+    ['parse_header']
+    """
+    spans = []
+    previous = set_tracer(spans.append)
+    try:
+        yield spans
+    finally:
+        set_tracer(previous)
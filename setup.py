@@ -7,8 +7,8 @@ kwargs = {'name': 'Glymur',
           'author': 'John Evans',
           'author_email': 'johnevans938 at gmail dot com',
           'url': 'https://github.com/quintusdias/glymur',
-          'packages': ['glymur', 'glymur.test', 'glymur.lib',
-                       'glymur.lib.test'],
+          'packages': ['glymur', 'glymur.benchmarks', 'glymur.test',
+                       'glymur.lib', 'glymur.lib.test'],
           'package_data': {'glymur': ['data/*.jp2']},
           'scripts': ['bin/jp2dump'],
           'license': 'LICENSE.txt',